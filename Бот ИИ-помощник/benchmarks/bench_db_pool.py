@@ -0,0 +1,86 @@
+"""Бенчмарк пула чтения: пропускная способность чтений в зависимости от размера пула.
+
+Запуск: python benchmarks/bench_db_pool.py [--users 2000] [--ops 4000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.storage import Database, User  # noqa: E402
+
+
+async def seed(path: str, users: int) -> None:
+    """Наполняет базу пользователями, записями, настроением и помодоро."""
+    database = Database(path, pool_size=0)
+    await database.connect()
+    conn = database._connection
+    now = datetime.now()
+    for tg_id in range(1, users + 1):
+        await database.upsert_user(User(tg_id=tg_id, created_at=now))
+        for day in range(14):
+            day_str = (now - timedelta(days=day)).date().isoformat()
+            await conn.execute(
+                "INSERT INTO entries (tg_id, date, type, data) VALUES (?, ?, 'morning', '{}')",
+                (tg_id, day_str),
+            )
+            await conn.execute(
+                "INSERT INTO mood (tg_id, date, energy, mood, note) VALUES (?, ?, ?, ?, '')",
+                (tg_id, day_str, random.randint(1, 10), random.randint(1, 10)),
+            )
+            await conn.execute(
+                "INSERT INTO pomodoro (tg_id, started_at, finished_at, duration, status) "
+                "VALUES (?, ?, ?, 25, 'done')",
+                (tg_id, now - timedelta(days=day), now - timedelta(days=day)),
+            )
+    await conn.commit()
+    await database.close()
+
+
+async def run(path: str, pool_size: int, users: int, ops: int, concurrency: int) -> float:
+    """Выполняет смесь get_user/week_stats и возвращает операций в секунду."""
+    database = Database(path, pool_size=pool_size)
+    await database.connect()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            tg_id = random.randint(1, users)
+            if i % 4 == 0:
+                await database.week_stats(tg_id)
+            else:
+                await database.get_user(tg_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    elapsed = time.perf_counter() - start
+    await database.close()
+    return ops / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await seed(path, args.users)
+        print(f"{'readers':>8} | {'ops/s':>10}")
+        for pool_size in (0, 1, 2, 4, 8):
+            rate = await run(path, pool_size, args.users, args.ops, args.concurrency)
+            print(f"{pool_size:>8} | {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""Бенчмарк словарного анализа эмоций: trie против перебора словаря.
+
+Словарь из 10k+ шаблонов (слова и фразы), заметки от коротких до очень
+длинных. Старый алгоритм - проверка `слово in текст` для каждой записи
+словаря; новый - EmotionService.score_text на LexiconMatcher.
+
+Запуск: python benchmarks/bench_emotion_lexicon.py [--lexicon 12000] [--notes 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.services.emotion import EmotionService  # noqa: E402
+
+SYLLABLES = ["ка", "ро", "ми", "на", "ле", "то", "ви", "са", "ду", "ре", "по", "лу", "ни", "ма", "зо", "бе"]
+FILLER = ["сегодня", "день", "был", "и", "я", "на", "работе", "потом", "дома", "вечером", "снова", "очень"]
+
+
+def pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+
+
+def big_lexicons(size: int):
+    """Три словаря общим размером size: исходные записи, псевдослова и фразы."""
+    rng = random.Random(1)
+    positive = dict(EmotionService.POSITIVE_WORDS)
+    negative = dict(EmotionService.NEGATIVE_WORDS)
+    stress = dict(EmotionService.STRESS_INDICATORS)
+    while len(positive) + len(negative) + len(stress) < size:
+        pattern = pseudo_word(rng) if rng.random() < 0.8 else f"{pseudo_word(rng)} {pseudo_word(rng)}"
+        target = rng.choice([positive, negative, stress])
+        target[pattern] = rng.choice([1, 2, 3]) * (-1 if target is negative else 1)
+    return positive, negative, stress
+
+
+def legacy_score(text: str, positive, negative, stress):
+    """Прежний score_text: подстрока для каждой записи словаря."""
+    text_lower = text.lower()
+    polarity = sum(weight for word, weight in positive.items() if word in text_lower)
+    polarity += sum(weight for word, weight in negative.items() if word in text_lower)
+    stress_score = sum(weight for word, weight in stress.items() if word in text_lower)
+    return max(-5, min(5, polarity)), max(0, min(10, stress_score))
+
+
+def note(rng: random.Random, words: int, vocabulary) -> str:
+    return " ".join(rng.choice(vocabulary) if rng.random() < 0.1 else rng.choice(FILLER) for _ in range(words))
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lexicon", type=int, default=12000)
+    parser.add_argument("--notes", type=int, default=1000)
+    args = parser.parse_args()
+
+    positive, negative, stress = big_lexicons(args.lexicon)
+
+    class BigLexicon(EmotionService):
+        POSITIVE_WORDS = positive
+        NEGATIVE_WORDS = negative
+        STRESS_INDICATORS = stress
+        _matcher = None
+
+    started = time.perf_counter()
+    BigLexicon.matcher()
+    print(f"lexicon {BigLexicon.matcher().size} patterns | compile {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = random.Random(2)
+    vocabulary = [pattern for lexicon in (positive, negative, stress) for pattern in lexicon]
+    for words in (30, 300, 3000):
+        text = note(rng, words, vocabulary)
+        repeat = max(3, 3000 // words)
+        legacy = timed(lambda: legacy_score(text, positive, negative, stress), max(1, repeat // 10))
+        trie = timed(lambda: BigLexicon.score_text(text), repeat)
+        print(
+            f"note {len(text):>6} chars | legacy {legacy * 1000:8.2f} ms | trie {trie * 1000:7.3f} ms | "
+            f"x{legacy / trie:,.0f}"
+        )
+
+    texts = [note(rng, rng.randint(5, 40), vocabulary) for _ in range(args.notes)]
+    texts += texts[: args.notes // 5]  # повторы, как у пустых и типовых заметок
+    started = time.perf_counter()
+    BigLexicon.score_many(texts)
+    batch = time.perf_counter() - started
+    print(f"score_many {len(texts)} notes | {len(texts) / batch:,.0f} notes/s")
+
+    # Ложные совпадения подстрок: эти слова не из словаря
+    sample = "отрада быстрорастворимый многоэтажка слишкомный"
+    legacy = legacy_score(
+        sample, EmotionService.POSITIVE_WORDS, EmotionService.NEGATIVE_WORDS, EmotionService.STRESS_INDICATORS
+    )
+    trie = EmotionService.score_text(sample)
+    print(f"false hits on '{sample}' | legacy (polarity, stress) {legacy} | trie {trie['keywords']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Бенчмарк полнотекстового поиска по истории (FTS5) против LIKE.
+
+Несколько пользователей с годами данных: ежедневные утренние и вечерние
+записи, заметки к настроению и память. Слова текстов распределены по
+Ципфу: 30 частых слов и длинный хвост редких. Сравниваются search_history
+(FTS5, страница из 5 результатов) для обычных запросов, для самых частых
+слов (худший случай: совпадает заметная часть истории) и сканирование LIKE.
+
+Запуск: python benchmarks/bench_fts_search.py [--users 20] [--years 3] [--queries 300]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.storage import Database  # noqa: E402
+
+WORDS = [
+    "работа", "проект", "отчет", "начальник", "сон", "спорт", "пробежка", "зал", "семья", "мама",
+    "друзья", "деньги", "ремонт", "учеба", "экзамен", "английский", "книга", "стресс", "тревога", "отпуск",
+    "встреча", "презентация", "дедлайн", "кофе", "прогулка", "медитация", "бассейн", "дача", "кино", "врач",
+]
+SYLLABLES = ["ка", "ро", "ми", "на", "ле", "то", "ви", "са", "ду", "ре", "по", "лу", "ни", "ма", "зо", "бе"]
+
+
+def vocabulary(size: int) -> list:
+    """Частые слова и хвост редких псевдослов."""
+    rng = random.Random(1)
+    tail = {"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4))) for _ in range(size)}
+    return WORDS + sorted(tail)
+
+
+VOCABULARY = vocabulary(3000)
+# Частота слова обратно пропорциональна его рангу (закон Ципфа)
+ZIPF = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, weights=ZIPF, k=words))
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def seed(database: Database, users: int, years: int) -> int:
+    """Заполняет историю; вставки идут через триггеры FTS, как в работе бота."""
+    rng = random.Random(5)
+    conn = database._connection
+    today = date.today()
+    rows = 0
+    for tg_id in range(1, users + 1):
+        await conn.execute("INSERT INTO users (tg_id) VALUES (?)", (tg_id,))
+        entries, moods, memories = [], [], []
+        for offset in range(365 * years):
+            day = (today - timedelta(days=offset)).isoformat()
+            morning = {"goal": text(rng, 4), "top3": [text(rng, 2) for _ in range(3)], "energy": 5}
+            evening = {"done": [text(rng, 2)], "not_done": [text(rng, 2)], "learning": text(rng, 6)}
+            entries += [(tg_id, day, "morning", json.dumps(morning)), (tg_id, day, "evening", json.dumps(evening))]
+            moods.append((tg_id, day, rng.randint(1, 10), rng.randint(1, 10), text(rng, 5)))
+            memories += [(tg_id, kind, text(rng, 8), f"{day} 12:00:00") for kind in ("morning", "evening", "reflect")]
+        await conn.executemany("INSERT INTO entries (tg_id, date, type, data) VALUES (?, ?, ?, ?)", entries)
+        await conn.executemany("INSERT INTO mood (tg_id, date, energy, mood, note) VALUES (?, ?, ?, ?, ?)", moods)
+        await conn.executemany("INSERT INTO memories (tg_id, kind, content, ts) VALUES (?, ?, ?, ?)", memories)
+        rows += len(entries) + len(moods) + len(memories)
+    await conn.commit()
+    return rows
+
+
+async def like_search(database: Database, tg_id: int, word: str) -> int:
+    """Поиск без индекса: LIKE по трем таблицам (JSON entries.data хранит \\uXXXX)."""
+    pattern = f"%{word}%"
+    found = 0
+    async with database.read() as conn:
+        for sql in (
+            "SELECT COUNT(*) FROM memories WHERE tg_id = ? AND content LIKE ?",
+            "SELECT COUNT(*) FROM entries WHERE tg_id = ? AND data LIKE ?",
+            "SELECT COUNT(*) FROM mood WHERE tg_id = ? AND note LIKE ?",
+        ):
+            async with conn.execute(sql, (tg_id, pattern)) as cursor:
+                found += (await cursor.fetchone())[0]
+    return found
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database = Database(path, pool_size=2)
+    await database.connect()
+    started = time.perf_counter()
+    rows = await seed(database, args.users, args.years)
+    print(f"seeded {rows} rows ({rows // args.users} per user) in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(9)
+
+    async def measure(words: list, search) -> list:
+        latencies = []
+        for _ in range(args.queries):
+            tg_id = rng.randint(1, args.users)
+            query = " ".join(rng.sample(words, rng.choice([1, 2])))
+            started = time.perf_counter()
+            await search(tg_id, query, rng.randint(0, 3))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    typical = await measure(VOCABULARY[len(WORDS):], lambda tg_id, q, page: database.search_history(tg_id, q, 6, page * 5))
+    common = await measure(WORDS, lambda tg_id, q, page: database.search_history(tg_id, q, 6, page * 5))
+    like = await measure(VOCABULARY, lambda tg_id, q, page: like_search(database, tg_id, q.split()[0]))
+
+    for label, latencies in (("FTS5 typical words", typical), ("FTS5 top-30 words", common), ("LIKE scan", like)):
+        print(
+            f"{label:<20} | p50 {percentile(latencies, 0.5) * 1000:7.2f} ms | "
+            f"p95 {percentile(latencies, 0.95) * 1000:7.2f} ms | max {max(latencies) * 1000:7.2f} ms"
+        )
+
+    word = WORDS[5]
+    print(
+        f"matches for '{word}' (user 1) | FTS5 {len(await database.search_history(1, word, 10 ** 6))} | "
+        f"LIKE {await like_search(database, 1, word)} (JSON entries are not found)"
+    )
+    await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Бенчмарк кэша ответов GPT на локальном фейковом клиенте OpenAI.
+
+Запуск: python benchmarks/bench_gpt_cache.py [--requests 2000] [--prompts 300] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from src.services.gpt import GPTService  # noqa: E402
+from src.services.gpt_cache import ResponseCache  # noqa: E402
+
+
+def workload(requests: int, prompts: int):
+    """Запросы с распределением Ципфа: популярные промпты повторяются чаще."""
+    random.seed(7)
+    weights = [1 / (rank + 1) for rank in range(prompts)]
+    for prompt_id in random.choices(range(prompts), weights=weights, k=requests):
+        metrics = {"entries_count": prompt_id, "avg_energy": prompt_id % 10, "focus_minutes": 0}
+        yield metrics
+
+
+async def run(label: str, service: GPTService, items) -> None:
+    start = time.perf_counter()
+    for metrics in items:
+        await service.weekly_report(metrics, "mentor")
+    elapsed = time.perf_counter() - start
+    stats = service.cache.stats()
+    print(
+        f"{label:<22} | upstream {service.client.calls:>5} | hit_rate {stats['hit_rate']:>5.2f} | "
+        f"saved {stats['saved_latency_s']:>7.2f}s | wall {elapsed:>7.2f}s"
+    )
+    await service.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--prompts", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    items = list(workload(args.requests, args.prompts))
+
+    no_cache = GPTService(client=FakeOpenAI(args.latency))
+    no_cache.cache = ResponseCache(maxsize=0)
+    await run("no cache", no_cache, items)
+
+    await run("memory LRU", GPTService(client=FakeOpenAI(args.latency)), items)
+
+    small = GPTService(client=FakeOpenAI(args.latency))
+    small.cache = ResponseCache(maxsize=args.prompts // 10)
+    await run(f"memory LRU ({args.prompts // 10})", small, items)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gpt_cache.db")
+        warm = GPTService(client=FakeOpenAI(args.latency))
+        warm.cache = ResponseCache(path=path)
+        await run("sqlite (cold)", warm, items)
+
+        # Новый процесс: память пуста, ответы берутся из SQLite
+        restarted = GPTService(client=FakeOpenAI(args.latency))
+        restarted.cache = ResponseCache(path=path)
+        await run("sqlite (after restart)", restarted, items)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
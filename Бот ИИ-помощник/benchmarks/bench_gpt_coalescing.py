@@ -0,0 +1,59 @@
+"""Бенчмарк single-flight: одновременные одинаковые запросы к GPT.
+
+Запуск: python benchmarks/bench_gpt_coalescing.py [--users 1000] [--prompts 20] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from src.services.gpt import GPTService  # noqa: E402
+from src.services.gpt_cache import ResponseCache  # noqa: E402
+
+
+class _NeverShared(dict):
+    """Реестр in-flight запросов, в котором ничего не находится."""
+
+    def get(self, key, default=None):
+        return default
+
+
+async def wave(service: GPTService, users: int, prompts: int) -> float:
+    """Волна недельных отчетов: у неактивных пользователей одинаковые метрики."""
+    random.seed(3)
+    metrics = [{"entries_count": random.randrange(prompts), "avg_energy": 0, "focus_minutes": 0}
+               for _ in range(users)]
+    start = time.perf_counter()
+    await asyncio.gather(*(service.weekly_report(m, "mentor") for m in metrics))
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    for label, coalesce in (("without single-flight", False), ("with single-flight", True)):
+        service = GPTService(client=FakeOpenAI(args.latency))
+        service.cache = ResponseCache(maxsize=0)
+        if not coalesce:
+            # Ключи не совпадают - каждый вызов идет в OpenAI
+            service._in_flight = _NeverShared()
+        elapsed = await wave(service, args.users, args.prompts)
+        print(
+            f"{label:<22} | upstream {service.client.calls:>5} | coalesced {service.coalesced:>5} | "
+            f"wall {elapsed:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
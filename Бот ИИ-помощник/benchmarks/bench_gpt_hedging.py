@@ -0,0 +1,84 @@
+"""Бенчмарк дублирования запросов и бюджетов времени: хвост задержек GPT.
+
+Фейковый OpenAI отвечает быстро, но часть ответов зависает (тяжелый хвост).
+Сравниваются: без дублей, с дублем после p95 и с дублем плюс бюджет.
+
+Запуск: python benchmarks/bench_gpt_hedging.py [--requests 400] [--slow-share 0.05] [--budget 2.0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from src.config import config  # noqa: E402
+from src.services.gpt import GPTService, UNAVAILABLE_TEXT  # noqa: E402
+from src.services.gpt_cache import ResponseCache  # noqa: E402
+from src.services.gpt_scheduler import GPTScheduler  # noqa: E402
+
+
+def tail_latency(slow_share: float):
+    """Обычно 0.2-0.4 с, но slow_share ответов зависает на 3-8 с."""
+    def latency() -> float:
+        if random.random() < slow_share:
+            return random.uniform(3.0, 8.0)
+        return random.uniform(0.2, 0.4)
+    return latency
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(label: str, args, hedge: bool, budget) -> None:
+    random.seed(11)
+    config.gpt_hedge_enabled = hedge
+    service = GPTService(client=FakeOpenAI(tail_latency(args.slow_share)))
+    service.cache = ResponseCache(maxsize=0)
+    service.scheduler = GPTScheduler(max_concurrency=10 ** 6, reserved_interactive=0)
+
+    # Прогрев: набираем замеры задержки для порога p95
+    await asyncio.gather(*(service.reflect_dialog(f"прогрев {i}", {}, "mentor", [], {})
+                           for i in range(config.gpt_hedge_min_samples)))
+    calls_before = service.client.calls
+
+    async def one(index: int):
+        # Пользователи приходят не одновременно
+        await asyncio.sleep(index * args.spacing)
+        started = time.perf_counter()
+        text = await service.reflect_dialog(f"вопрос {index}", {}, "mentor", [], {}, budget=budget)
+        return time.perf_counter() - started, text == UNAVAILABLE_TEXT
+
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, unavailable in results if unavailable)
+    upstream = service.client.calls - calls_before
+    print(
+        f"{label:<20} | p50 {percentile(latencies, 0.5):5.2f}s | p95 {percentile(latencies, 0.95):5.2f}s | "
+        f"p99 {percentile(latencies, 0.99):5.2f}s | max {max(latencies):5.2f}s | "
+        f"upstream x{upstream / args.requests:.2f} | hedge wins {service.hedge_wins:>3} | unavailable {failed}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--slow-share", type=float, default=0.05)
+    parser.add_argument("--spacing", type=float, default=0.01)
+    parser.add_argument("--budget", type=float, default=2.0)
+    args = parser.parse_args()
+
+    await run("no hedging", args, hedge=False, budget=None)
+    await run("hedge at p95", args, hedge=True, budget=None)
+    await run(f"hedge + {args.budget}s budget", args, hedge=True, budget=args.budget)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""Бенчмарк приоритетов GPT: задержка интерактивных запросов во время волны отчетов.
+
+Запуск: python benchmarks/bench_gpt_priority.py [--batch 400] [--interactive 40] [--latency 0.2] [--capacity 16]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from src.services.gpt import GPTService  # noqa: E402
+from src.services.gpt_cache import ResponseCache  # noqa: E402
+from src.services.gpt_scheduler import GPTScheduler, PRIORITY_BATCH  # noqa: E402
+
+
+async def run(label: str, scheduler: GPTScheduler, args) -> None:
+    service = GPTService(client=FakeOpenAI(args.latency, capacity=args.capacity))
+    service.cache = ResponseCache(maxsize=0)
+    service.scheduler = scheduler
+
+    start = time.perf_counter()
+    batch = asyncio.gather(*(
+        service.weekly_report({"entries_count": i}, "mentor", priority=PRIORITY_BATCH)
+        for i in range(args.batch)
+    ))
+
+    latencies = []
+
+    async def interactive(i: int) -> None:
+        t0 = time.perf_counter()
+        await service.reflect_dialog(f"вопрос {i}", {}, "mentor", [], {})
+        latencies.append(time.perf_counter() - t0)
+
+    probes = []
+    for i in range(args.interactive):
+        probes.append(asyncio.create_task(interactive(i)))
+        await asyncio.sleep(args.latency / 2)
+    await asyncio.gather(*probes)
+    await batch
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(
+        f"{label:<26} | interactive p50 {latencies[len(latencies) // 2] * 1000:7.0f}ms "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.0f}ms | batch wave {elapsed:6.2f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--capacity", type=int, default=16, help="одновременных запросов у фейкового сервера")
+    args = parser.parse_args()
+
+    # Без лимитера все запросы сразу уходят в сервер и ждут там в общей очереди
+    await run("no limiter (FIFO upstream)", GPTScheduler(max_concurrency=10 ** 6, reserved_interactive=0), args)
+    await run("priority limiter", GPTScheduler(max_concurrency=args.capacity, reserved_interactive=2), args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
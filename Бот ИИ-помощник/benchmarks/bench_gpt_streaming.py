@@ -0,0 +1,92 @@
+"""Бенчмарк потоковых ответов: время до первого видимого текста.
+
+Сравнивает обычный запрос (текст появляется целиком после генерации)
+и потоковый с постепенной правкой сообщения.
+
+Запуск: python benchmarks/bench_gpt_streaming.py [--users 50] [--latency 3.0] [--interval 1.0]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from src.services.gpt import GPTService  # noqa: E402
+from src.services.gpt_cache import ResponseCache  # noqa: E402
+from src.services.gpt_scheduler import GPTScheduler  # noqa: E402
+from src.services.stream_render import render_stream  # noqa: E402
+
+
+class FakeMessage:
+    """Сообщение Telegram: запоминает, когда пользователь увидел первый текст."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.message_id = 1
+        self.first_text: float = 0.0
+        self.edits = 0
+
+    async def answer(self, text: str, **kwargs) -> "FakeMessage":
+        return self
+
+    async def edit_text(self, text: str, **kwargs) -> None:
+        self.edits += 1
+        if not self.first_text:
+            self.first_text = time.perf_counter() - self.started
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def make_service(latency: float) -> GPTService:
+    service = GPTService(client=FakeOpenAI(latency))
+    service.cache = ResponseCache(maxsize=0)
+    # Сравниваем только форму ответа, без очереди лимитера
+    service.scheduler = GPTScheduler(max_concurrency=10 ** 6, reserved_interactive=0)
+    return service
+
+
+async def blocking_user(service: GPTService, index: int) -> float:
+    started = time.perf_counter()
+    await service.reflect_dialog(f"вопрос {index}", {}, "mentor", [], {})
+    return time.perf_counter() - started
+
+
+async def streaming_user(service: GPTService, index: int, interval: float) -> FakeMessage:
+    message = FakeMessage(time.perf_counter())
+    chunks = service.stream_reflect_dialog(f"вопрос {index}", {}, "mentor", [], {})
+    await render_stream(message, chunks, interval=interval)
+    return message
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=3.0)
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    service = make_service(args.latency)
+    blocking = await asyncio.gather(*(blocking_user(service, i) for i in range(args.users)))
+
+    service = make_service(args.latency)
+    messages = await asyncio.gather(*(streaming_user(service, i, args.interval) for i in range(args.users)))
+    visible = [m.first_text for m in messages]
+    ttfb = service.stats()["ttfb"]["stream"]
+
+    print(f"blocking  | first text p50 {percentile(blocking, 0.5):5.2f}s | p95 {percentile(blocking, 0.95):5.2f}s")
+    print(
+        f"streaming | first text p50 {percentile(visible, 0.5):5.2f}s | p95 {percentile(visible, 0.95):5.2f}s | "
+        f"first token p50 {ttfb['p50_ms'] / 1000:5.2f}s | edits/message {sum(m.edits for m in messages) / len(messages):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,203 @@
+"""Бенчмарк аналитики настроения: NumPy против EmotionService.analyze_mood_pattern.
+
+Две части. В памяти: одна история длиной от месяца до нескольких лет.
+Прежний analyze_mood_pattern считает только средние, тренд по трем
+крайним записям и размах, поэтому кроме него есть тот же набор метрик,
+что у NumPy (EWMA, волатильность окна, сезонность, аномалии), на
+списках Python. С базой: ночной пересчет всех пользователей - запрос и
+разбор на каждого против analyze_all, читающего пользователей пачками.
+
+Запуск: python benchmarks/bench_mood_analytics.py [--users 2000] [--days 730]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.services.emotion import EmotionService  # noqa: E402
+from src.services import mood_analytics as analytics  # noqa: E402
+from src.storage import db  # noqa: E402
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def history(rng: random.Random, days: int) -> list:
+    """Записи (время, mood, energy): недельный цикл, медленный дрейф и редкие провалы."""
+    start = datetime(2020, 1, 1, 18)
+    records = []
+    level = 6.0
+    for offset in range(days):
+        level = min(9.0, max(2.0, level + rng.gauss(0, 0.2)))
+        moment = start + timedelta(days=offset, hours=rng.randint(-10, 4))
+        mood = level + (1 if moment.weekday() >= 5 else 0) + rng.gauss(0, 0.8)
+        if rng.random() < 0.02:
+            mood -= 5
+        mood = int(min(10, max(1, round(mood))))
+        energy = int(min(10, max(1, mood + rng.randint(-2, 2))))
+        records.append((moment, mood, energy))
+    return records
+
+
+def legacy_rows(records) -> list:
+    """Строки, как их читает get_mood_trend: (date, energy, mood)."""
+    return [(moment.date().isoformat(), energy, mood) for moment, mood, energy in records]
+
+
+def number_rows(records) -> list:
+    """Строки, как их читает mood_history: (day, seconds, mood, energy)."""
+    return [
+        ((moment - EPOCH).days, int((moment - EPOCH).total_seconds()), mood, energy)
+        for moment, mood, energy in records
+    ]
+
+
+def legacy_analyze(rows) -> dict:
+    mood_history = [{"date": row[0], "energy": row[1], "mood": row[2]} for row in rows]
+    return EmotionService.analyze_mood_pattern(mood_history)
+
+
+def numpy_analyze(rows) -> dict:
+    data = analytics.to_arrays(rows)
+    return analytics.analyze(data[:, 0], data[:, 2], data[:, 3], data[:, 1])
+
+
+def python_analyze(rows) -> dict:
+    """Метрики analyze на списках Python, запись за записью."""
+    window = analytics.WINDOW
+    smoothed_mood = smoothed_energy = None
+    recent = deque(maxlen=window)
+    weekday_sums, weekday_counts = [0.0] * 7, [0] * 7
+    hour_sums, hour_counts = [0.0] * 24, [0] * 24
+    anomalies, smoothed_history = [], []
+    mood_total = energy_total = 0.0
+    std = 0.0
+    for day, seconds, mood, energy in rows:
+        if len(recent) == window:
+            mean = sum(recent) / window
+            spread = max((sum(v * v for v in recent) / window - mean * mean) ** 0.5, analytics.MIN_STD)
+            if abs(mood - mean) / spread >= analytics.ANOMALY_Z:
+                anomalies.append(day)
+        recent.append(mood)
+        mean = sum(recent) / len(recent)
+        std = max(sum(v * v for v in recent) / len(recent) - mean * mean, 0.0) ** 0.5
+        alpha = analytics.ALPHA
+        smoothed_mood = mood if smoothed_mood is None else alpha * mood + (1 - alpha) * smoothed_mood
+        smoothed_energy = energy if smoothed_energy is None else alpha * energy + (1 - alpha) * smoothed_energy
+        smoothed_history.append(smoothed_mood)
+        weekday_sums[(day + 3) % 7] += mood
+        weekday_counts[(day + 3) % 7] += 1
+        if seconds is not None:
+            hour_sums[seconds // 3600 % 24] += mood
+            hour_counts[seconds // 3600 % 24] += 1
+        mood_total += mood
+        energy_total += energy
+    change = smoothed_history[-1] - smoothed_history[max(0, len(rows) - 1 - window)]
+    return {
+        "trend": "improving" if change > 1 else "declining" if change < -1 else "stable",
+        "average_mood": mood_total / len(rows),
+        "average_energy": energy_total / len(rows),
+        "ewma_mood": smoothed_mood,
+        "ewma_energy": smoothed_energy,
+        "volatility": std,
+        "weekday_mood": [s / c if c else None for s, c in zip(weekday_sums, weekday_counts)],
+        "hour_mood": [s / c if c else None for s, c in zip(hour_sums, hour_counts)],
+        "anomalies": anomalies[-analytics.MAX_ANOMALIES:],
+    }
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def in_memory() -> None:
+    rng = random.Random(1)
+    for days in (30, 365, 3 * 365):
+        records = history(rng, days)
+        old_rows, new_rows = legacy_rows(records), number_rows(records)
+        repeat = max(20, 20000 // days)
+        old = timed(lambda: legacy_analyze(old_rows), repeat)
+        same = timed(lambda: python_analyze(new_rows), repeat)
+        new = timed(lambda: numpy_analyze(new_rows), repeat)
+        print(
+            f"history {days:>5} rows | legacy {old * 1000:6.3f} ms | python, same metrics {same * 1000:7.3f} ms | "
+            f"numpy {new * 1000:6.3f} ms | x{same / new:.1f} vs python"
+        )
+
+    result = numpy_analyze(number_rows(history(random.Random(2), 365)))
+    print(
+        f"sample: trend {result['trend']}, ewma {result['ewma_mood']}, volatility {result['volatility']}, "
+        f"{result['anomaly_count']} anomalies, weekday {result['weekday_mood']}"
+    )
+
+
+async def with_database(users: int, days: int) -> None:
+    db.db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await db.connect()
+    conn = db._connection
+    rng = random.Random(3)
+    for tg_id in range(1, users + 1):
+        await conn.execute("INSERT INTO users (tg_id, tz) VALUES (?, ?)", (tg_id, "Europe/Moscow"))
+        await conn.executemany(
+            "INSERT INTO mood (tg_id, date, ts, mood, energy, note) VALUES (?, ?, ?, ?, ?, '')",
+            [
+                (tg_id, moment.date().isoformat(), moment.strftime("%Y-%m-%d %H:%M:%S"), mood, energy)
+                for moment, mood, energy in history(rng, rng.randint(days // 4, days))
+            ]
+        )
+    await conn.commit()
+
+    async def legacy_all():
+        for tg_id in range(1, users + 1):
+            async with db.read() as read_conn, read_conn.execute(
+                "SELECT date, energy, mood FROM mood WHERE tg_id = ? ORDER BY date ASC", (tg_id,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            legacy_analyze(rows)
+
+    async def python_all():
+        for tg_id in range(1, users + 1):
+            python_analyze(await db.mood_history(tg_id))
+
+    started = time.perf_counter()
+    await legacy_all()
+    old = time.perf_counter() - started
+    started = time.perf_counter()
+    await python_all()
+    same = time.perf_counter() - started
+
+    service = analytics.MoodAnalytics()
+    started = time.perf_counter()
+    await service.analyze_all()
+    new = time.perf_counter() - started
+    print(
+        f"all {users} users ({service.last_run['rows']} rows) | legacy per-user {old:.2f}s | "
+        f"python per-user, same metrics {same:.2f}s | analyze_all {new:.2f}s | x{same / new:.1f} vs python"
+    )
+    await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+
+    in_memory()
+    asyncio.run(with_database(args.users, args.days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Бенчмарк задержки цикла событий при пачке PDF отчетов.
+
+Пока рендерится пачка PDF, тикер каждые --tick мс замеряет, насколько
+позже срока он проснулся: это задержка, которую видят все остальные
+хендлеры бота. Варианты: рендеринг прямо в цикле, в потоке
+(asyncio.to_thread, прежняя реализация; reportlab держит GIL) и в пуле
+процессов PDFService.
+
+Запуск: python benchmarks/bench_pdf_offload.py [--pdfs 100] [--workers 2] [--tick 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.services.pdf import PDFService, PDFQueueFull  # noqa: E402
+from src.services.pdf_render import render_weekly_pdf  # noqa: E402
+
+
+def sample_report(index: int) -> dict:
+    """Данные как у PDFService.generate_weekly_pdf: простые типы."""
+    return {
+        "user_name": f"user {index}",
+        "metrics": {
+            "entries_count": 21, "avg_energy": 5.8, "daily_activity": 3.0, "focus_minutes": 240,
+            "habits_count": 8, "avg_mood": 6.5, "active_days": 6, "mood_baseline": 6.1, "mood_spread": 1.4,
+            "week_start": "2026-10-12", "week_end": "2026-10-18",
+        },
+        "habits": [{"name": f"Привычка {i}", "streak": i * 2, "last_tick": "2026-10-18"} for i in range(8)],
+        "mood_trend": [
+            {"date": f"2026-10-{day:02d}", "energy": 4 + day % 5, "mood": f"mood {day % 4}",
+             "note": "Спокойный день, много дел, но справилась со всем запланированным"}
+            for day in range(1, 15)
+        ],
+        "productivity": {"total_score": 72, "activity_score": 80},
+    }
+
+
+async def ticker(tick: float, lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        expected = time.perf_counter() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+def percentile(ordered: list, share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def measure(name: str, burst, tick: float) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(ticker(tick, lags, stop))
+    await asyncio.sleep(tick * 3)
+    lags.clear()
+
+    started = time.perf_counter()
+    sizes = await burst()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+
+    ordered = sorted(lags) or [0.0]
+    print(
+        f"{name:<14} | {len(sizes)} PDFs in {elapsed:6.2f}s | loop lag p50 {percentile(ordered, 0.5) * 1000:7.1f} ms "
+        f"p99 {percentile(ordered, 0.99) * 1000:7.1f} ms max {ordered[-1] * 1000:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--tick", type=float, default=5.0, help="интервал тикера в мс")
+    args = parser.parse_args()
+    tick = args.tick / 1000
+    reports = [sample_report(i) for i in range(args.pdfs)]
+
+    async def inline():
+        return [render_weekly_pdf(report) for report in reports]
+
+    async def thread():
+        return await asyncio.gather(*(asyncio.to_thread(render_weekly_pdf, report) for report in reports))
+
+    service = PDFService(workers=args.workers, queue_limit=args.pdfs)
+    # Поднимаем процессы заранее, чтобы не мерить импорт reportlab в воркерах
+    await asyncio.gather(*(service.render(report) for report in reports[: args.workers]))
+
+    async def process_pool():
+        return await asyncio.gather(*(service.render(report, wait=True) for report in reports))
+
+    await measure("inline", inline, tick)
+    await measure("to_thread", thread, tick)
+    await measure(f"processes x{args.workers}", process_pool, tick)
+
+    # Ограничение очереди: интерактивные запросы сверх лимита сразу получают отказ
+    limited = PDFService(workers=args.workers, queue_limit=8)
+    results = await asyncio.gather(*(limited.render(report) for report in reports), return_exceptions=True)
+    rejected = sum(isinstance(result, PDFQueueFull) for result in results)
+    print(f"queue limit 8  | {len(results) - rejected} rendered, {rejected} rejected with PDFQueueFull")
+
+    service.close()
+    limited.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""Бенчмарк локального индекса релевантности памяти.
+
+Один пользователь с большой памятью: время построения индекса, задержка
+поиска, поиск сразу после add_memory и доля найденных давних записей
+(в последних N записях их нет никогда).
+
+Запуск: python benchmarks/bench_relevance_index.py [--memories 10000] [--queries 300]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src import storage  # noqa: E402
+from src.services.memories import memory_service  # noqa: E402
+from src.services.relevance import RelevanceIndex  # noqa: E402
+from src.services import memories, relevance  # noqa: E402
+
+TG_ID = 1
+
+TOPICS = [
+    "работа", "проект", "отчет", "начальник", "сон", "спорт", "бег", "зал", "семья", "мама",
+    "друзья", "деньги", "ремонт", "учеба", "экзамен", "английский", "книга", "стресс", "тревога", "отпуск",
+]
+VERBS = ["закончил", "начал", "отложил", "обсудил", "планирую", "переживаю за", "радуюсь", "устал от"]
+FILLER = ["сегодня", "вчера", "утром", "вечером", "снова", "наконец", "немного", "очень"]
+
+# Редкие темы, которые встречаются только в давних записях
+PLANTED = [
+    ("Записался на курсы гончарного мастерства", "как дела с гончарным мастерством?"),
+    ("Поссорился с соседом из-за парковки во дворе", "что делать с соседом и парковкой"),
+    ("Решил выучить испанский к поездке в Барселону", "как продвигается испанский для Барселоны"),
+    ("Болит колено после марафона", "колено после марафона все еще болит"),
+    ("Хочу сменить профессию на дизайнера интерфейсов", "стоит ли уходить в дизайн интерфейсов"),
+]
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(FILLER), rng.choice(VERBS), rng.choice(TOPICS), "и", rng.choice(TOPICS)]
+    return " ".join(words).capitalize()
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def seed(database: storage.Database, count: int) -> None:
+    rng = random.Random(7)
+    conn = database._connection
+    await conn.execute("INSERT INTO users (tg_id) VALUES (?)", (TG_ID,))
+    start = datetime.utcnow() - timedelta(days=365)
+    planted_at = {rng.randrange(count // 10) for _ in range(len(PLANTED))}
+    planted = iter(PLANTED)
+    for i in range(count):
+        content = next(planted)[0] if i in planted_at else sentence(rng)
+        ts = (start + timedelta(minutes=i * 50)).strftime("%Y-%m-%d %H:%M:%S")
+        await conn.execute(
+            "INSERT INTO memories (tg_id, kind, content, ts) VALUES (?, ?, ?, ?)",
+            (TG_ID, rng.choice(["morning", "evening", "reflect"]), content, ts),
+        )
+        if i % 20 == 0:
+            await conn.execute(
+                "INSERT INTO mood (tg_id, date, energy, mood, note) VALUES (?, ?, ?, ?, ?)",
+                (TG_ID, ts[:10], rng.randint(1, 10), rng.randint(1, 10), sentence(rng)),
+            )
+    await conn.commit()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memories", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database = storage.Database(path, pool_size=2)
+    await database.connect()
+    await seed(database, args.memories)
+    # Сервисы работают с глобальной БД - подменяем ее на тестовую
+    storage.db = relevance.db = memories.db = database
+    index = relevance.relevance_index = memories.relevance_index = RelevanceIndex()
+
+    rng = random.Random(3)
+    started = time.perf_counter()
+    await index.search(TG_ID, "прогрев")
+    build = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(args.queries):
+        query = f"{rng.choice(VERBS)} {rng.choice(TOPICS)}"
+        started = time.perf_counter()
+        await index.search(TG_ID, query)
+        latencies.append(time.perf_counter() - started)
+
+    recent_started = time.perf_counter()
+    for _ in range(args.queries):
+        await database.recent_memories(TG_ID, 5)
+    recent = (time.perf_counter() - recent_started) / args.queries
+
+    # Свежая запись должна находиться сразу, без перестроения индекса
+    add_latencies = []
+    found_new = 0
+    for i in range(50):
+        started = time.perf_counter()
+        await memory_service.add_memory(TG_ID, "reflect", f"Новая идея номер {i}: автополив для фикусов")
+        results = await index.search(TG_ID, f"идея {i} автополив фикусов")
+        add_latencies.append(time.perf_counter() - started)
+        found_new += any(f"номер {i}:" in r["content"] for r in results)
+
+    found_old = 0
+    recent_contents = {m["content"] for m in await database.recent_memories(TG_ID, 5)}
+    for content, query in PLANTED:
+        results = await index.search(TG_ID, query)
+        found_old += any(r["content"] == content for r in results)
+    found_recent = sum(content in recent_contents for content, _ in PLANTED)
+
+    print(f"documents        | {index.stats()['documents']} (memories {args.memories} + mood notes)")
+    print(f"index build      | {build * 1000:8.1f} ms")
+    print(
+        f"search           | p50 {percentile(latencies, 0.5) * 1000:6.2f} ms | "
+        f"p95 {percentile(latencies, 0.95) * 1000:6.2f} ms | max {max(latencies) * 1000:6.2f} ms"
+    )
+    print(f"recent_memories  | avg {recent * 1000:6.2f} ms (baseline, no relevance)")
+    print(f"add + search     | p50 {percentile(add_latencies, 0.5) * 1000:6.2f} ms | fresh found {found_new}/50")
+    print(f"old topics found | index {found_old}/{len(PLANTED)} | recent_memories {found_recent}/{len(PLANTED)}")
+    await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
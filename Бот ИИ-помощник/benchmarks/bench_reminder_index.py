@@ -0,0 +1,100 @@
+"""Бенчмарк индекса напоминаний: память и задержка тика на 100k и 1M пользователей.
+
+Запуск: python benchmarks/bench_reminder_index.py [--users 100000 1000000] [--apscheduler]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.services.reminders import ReminderIndex  # noqa: E402
+
+ZONES = [tz for tz in pytz.common_timezones if "/" in tz]
+
+
+def build_index(users: int) -> ReminderIndex:
+    random.seed(1)
+    index = ReminderIndex()
+    for user_id in range(users):
+        index.add(user_id, random.choice(ZONES), random.randint(6, 10), random.randint(19, 23))
+    return index
+
+
+def bench_index(users: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = build_index(users)
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Тик на каждую минуту суток (включая воскресенье для weekly)
+    base = datetime(2024, 1, 7, tzinfo=pytz.utc)
+    latencies = []
+    due_total = 0
+    for minute in range(24 * 60):
+        now = base + timedelta(minutes=minute)
+        t0 = time.perf_counter()
+        due = index.due(now, 6, 18)
+        latencies.append(time.perf_counter() - t0)
+        due_total += sum(len(v) for v in due.values())
+
+    latencies.sort()
+    print(
+        f"{users:>9} users | build {build_time:6.2f}s | {memory / 1024 / 1024:8.1f} MiB "
+        f"({memory / users:5.0f} B/user) | tick p50 {latencies[len(latencies) // 2] * 1000:6.2f}ms "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f}ms max {latencies[-1] * 1000:7.2f}ms "
+        f"| due/day {due_total}"
+    )
+
+
+def bench_apscheduler(users: int) -> None:
+    """Память прежней схемы: три DateTrigger-задачи на пользователя."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.date import DateTrigger
+
+    def noop(user_id):
+        pass
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    scheduler = BackgroundScheduler()
+    run_date = datetime.now(pytz.utc) + timedelta(days=1)
+    for user_id in range(users):
+        for prefix in ("morning", "evening", "weekly"):
+            scheduler.add_job(noop, DateTrigger(run_date=run_date), args=[user_id], id=f"{prefix}_{user_id}")
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(
+        f"{users:>9} users | APScheduler 3 jobs/user | build {build_time:6.2f}s | "
+        f"{memory / 1024 / 1024:8.1f} MiB ({memory / users:5.0f} B/user)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--apscheduler", action="store_true", help="сравнить с задачами APScheduler")
+    args = parser.parse_args()
+
+    for users in args.users:
+        bench_index(users)
+        if args.apscheduler:
+            bench_apscheduler(users)
+
+
+if __name__ == "__main__":
+    main()
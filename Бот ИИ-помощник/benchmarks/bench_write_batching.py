@@ -0,0 +1,64 @@
+"""Бенчмарк group commit: вставок в секунду с группировкой записи и без нее.
+
+Запуск: python benchmarks/bench_write_batching.py [--users 1000] [--writes 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.config import config  # noqa: E402
+from src.storage import Database  # noqa: E402
+
+
+async def run(path: str, batch_size: int, users: int, writes: int) -> float:
+    """Симулирует users одновременных пользователей и возвращает вставок в секунду."""
+    database = Database(path, pool_size=0, write_batch_size=batch_size)
+    await database.connect()
+
+    async def user(tg_id: int) -> None:
+        for i in range(writes):
+            await asyncio.sleep(random.random() / 100)
+            if i % 3 == 0:
+                await database.save_mood(tg_id, random.randint(1, 10), random.randint(1, 10), "note")
+            elif i % 3 == 1:
+                await database.add_memory(tg_id, "morning", f"memory {i}")
+            else:
+                now = datetime.now()
+                await database.log_pomodoro(tg_id, now, now, 25, "done")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(tg_id) for tg_id in range(1, users + 1)))
+    elapsed = time.perf_counter() - start
+
+    batches = database._batcher.batches if database._batcher else users * writes
+    await database.close()
+    print(f"{batch_size:>10} | {users * writes / elapsed:>10.0f} | {batches:>8}")
+    return users * writes / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=5)
+    parser.add_argument("--synchronous", default="FULL")
+    args = parser.parse_args()
+    config.db_synchronous = args.synchronous.upper()
+
+    print(f"{'batch_size':>10} | {'inserts/s':>10} | {'commits':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (1, 16, 64, 256):
+            path = os.path.join(tmp, f"bench_{batch_size}.db")
+            await run(path, batch_size, args.users, args.writes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Локальный фейковый клиент OpenAI для бенчмарков.
+
+Повторяет интерфейс client.chat.completions.create, отвечает с заданной
+задержкой и может имитировать ошибки. С stream=True первый фрагмент
+приходит через first_token_share от полной задержки, остальные - равномерно.
+"""
+import asyncio
+import itertools
+import random
+from types import SimpleNamespace
+from typing import Callable, Optional, Union
+
+
+class FakeCompletions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    async def create(self, model: str, messages: list, max_tokens: int = 500,
+                     temperature: float = 0.7, timeout: Optional[float] = None,
+                     stream: bool = False, **kwargs):
+        owner = self.owner
+        owner.calls += 1
+        if stream:
+            return await self._stream(messages)
+        if owner.capacity:
+            # Сервер с ограниченной пропускной способностью: лишние запросы ждут в FIFO
+            async with owner.capacity:
+                return await self._respond(messages, timeout)
+        return await self._respond(messages, timeout)
+
+    async def _stream(self, messages: list):
+        owner = self.owner
+        delay = owner.latency() if callable(owner.latency) else owner.latency
+        await asyncio.sleep(delay * owner.first_token_share)
+        if owner.error_rate and random.random() < owner.error_rate:
+            owner.errors += 1
+            raise RuntimeError("fake upstream error")
+
+        content = f"ответ #{next(owner._counter)} на: {messages[-1]['content'][:40]} " + "слово " * 60
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        step = delay * (1 - owner.first_token_share) / max(1, len(pieces) - 1)
+
+        async def chunks():
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(step)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+
+        return chunks()
+
+    async def _respond(self, messages: list, timeout: Optional[float]):
+        owner = self.owner
+        owner.in_flight += 1
+        owner.max_in_flight = max(owner.max_in_flight, owner.in_flight)
+        try:
+            delay = owner.latency() if callable(owner.latency) else owner.latency
+            if timeout is not None and delay > timeout:
+                await asyncio.sleep(timeout)
+                raise asyncio.TimeoutError(f"fake timeout after {timeout}s")
+            await asyncio.sleep(delay)
+            if owner.error_rate and random.random() < owner.error_rate:
+                owner.errors += 1
+                raise RuntimeError("fake upstream error")
+
+            # Уникальный текст, чтобы не срабатывала дедупликация ответов
+            content = f"ответ #{next(owner._counter)} на: {messages[-1]['content'][:40]}"
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=SimpleNamespace(prompt_tokens=len(str(messages)) // 4,
+                                      completion_tokens=len(content) // 4)
+            )
+        finally:
+            owner.in_flight -= 1
+
+
+class FakeOpenAI:
+    """Фейковый AsyncOpenAI: latency - секунды или функция без аргументов.
+
+    capacity ограничивает число одновременно обслуживаемых запросов.
+    """
+
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0.05, error_rate: float = 0.0,
+                 capacity: int = 0, first_token_share: float = 0.15):
+        self.latency = latency
+        self.first_token_share = first_token_share
+        self.error_rate = error_rate
+        self.capacity = asyncio.Semaphore(capacity) if capacity else None
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._counter = itertools.count(1)
+        self.chat = SimpleNamespace(completions=FakeCompletions(self))
@@ -15,6 +15,7 @@ python -m pip install fastapi==0.119.1
 python -m pip install uvicorn==0.38.0
 python -m pip install reportlab==4.4.4
 python -m pip install pytz==2025.2
+python -m pip install numpy==2.4.6
 
 echo.
 echo 🎉 Установка завершена!
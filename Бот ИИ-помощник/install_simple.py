@@ -15,7 +15,8 @@ def install_packages():
         'fastapi==0.119.1',
         'uvicorn==0.38.0',
         'reportlab==4.4.4',
-        'pytz==2025.2'
+        'pytz==2025.2',
+        'numpy==2.4.6'
     ]
     
     print("🔧 Установка зависимостей...")
@@ -1,4 +1,7 @@
-"""Главный файл приложения."""
+"""Сборка приложения: FastAPI, бот, планировщик и их жизненный цикл.
+
+Запускается из main.py.
+"""
 import asyncio
 import signal
 import sys
@@ -11,11 +14,19 @@ from src.config import config
 from src.logger import get_logger
 from src.storage import db
 from src.scheduler import scheduler_service
+from src.services.delivery import delivery_queue
+from src.services.weekly_pipeline import weekly_pipeline
 from src.middlewares.subscription_gate import SubscriptionGateMiddleware
 from src.payments.tribute import tribute_service
+from src.services.gpt import gpt_service
+from src.services.memories import memory_service
+from src.services.mood_analytics import mood_analytics
+from src.services.pdf import pdf_service
+from src.services.relevance import relevance_index
+from src.services.stemmer import stem
 
 # Импорты обработчиков
-from src.handlers import start, menu, morning, evening, focus, habits, mood, reflect, weekly, settings, billing, common, profile, abstinence
+from src.handlers import start, menu, morning, evening, focus, habits, mood, reflect, weekly, settings, billing, common, profile, abstinence, search
 
 logger = get_logger("main")
 
@@ -23,6 +34,17 @@ logger = get_logger("main")
 bot = None
 
 
+async def periodic_alive_log():
+    """Периодически логирует 'alive' для мониторинга."""
+    while True:
+        try:
+            await asyncio.sleep(300)  # Каждые 5 минут
+            logger.info("Bot alive - all systems operational")
+        except Exception as e:
+            logger.error(f"Periodic log error: {e}")
+            await asyncio.sleep(60)  # При ошибке ждем минуту
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения."""
@@ -34,13 +56,15 @@ async def lifespan(app: FastAPI):
         await db.connect()
         logger.info("Database connected")
         
+        # Проверяем OpenAI API
+        await gpt_service.health_check()
+        
         # Запускаем планировщик
         await scheduler_service.start()
         logger.info("Scheduler started")
         
-        # Планируем задачи для всех пользователей
-        await scheduler_service.reschedule_all_users()
-        logger.info("User tasks scheduled")
+        # Запускаем периодический лог "alive"
+        asyncio.create_task(periodic_alive_log())
         
         logger.info("Application started successfully")
         yield
@@ -62,6 +86,9 @@ async def lifespan(app: FastAPI):
             await db.close()
             logger.info("Database disconnected")
             
+            await gpt_service.close()
+            pdf_service.close()
+            
             logger.info("Application stopped")
             
         except Exception as e:
@@ -106,9 +133,16 @@ async def setup_bot():
         dp.include_router(reflect.router)
         dp.include_router(weekly.router)
         dp.include_router(abstinence.router)
+        dp.include_router(search.router)
         dp.include_router(settings.router)
         dp.include_router(billing.router)
         
+        # Исходящие рассылки идут через очередь с лимитами Telegram
+        delivery_queue.start(bot)
+        
+        # Расписания пользователей загружаются в фоне после старта polling
+        dp.startup.register(scheduler_service.start_background_reschedule)
+        
         # Запускаем бота
         await dp.start_polling(bot)
         
@@ -159,7 +193,39 @@ async def tribute_webhook(request: Request):
 @app.get("/health")
 async def health_check():
     """Проверка здоровья приложения."""
-    return {"status": "ok", "timestamp": str(asyncio.get_event_loop().time())}
+    try:
+        import time
+        
+        # Проверяем доступность базы данных
+        db_status = "ok" if db._connection else "error"
+        
+        # Состояние GPT по circuit breaker
+        gpt_status = {"closed": "ok", "half_open": "recovering", "open": "offline"}[gpt_service.breaker.state]
+        
+        return {
+            "status": "ok",
+            "timestamp": time.time(),
+            "database": db_status,
+            "gpt": gpt_status,
+            "user_cache": db.user_cache.stats(),
+            "gpt_stats": gpt_service.stats(),
+            "schedules": scheduler_service.reschedule_progress,
+            "delivery": delivery_queue.stats(),
+            "weekly_wave": weekly_pipeline.last_wave,
+            "memory_compaction": memory_service.last_compaction,
+            "mood_analytics": mood_analytics.last_run,
+            "pdf": pdf_service.stats(),
+            "relevance_index": relevance_index.stats(),
+            "stem_cache": stem.cache_info()._asdict(),
+            "version": "1.0.0"
+        }
+    except Exception as e:
+        logger.error(f"Health check error: {e}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "timestamp": time.time()
+        }
 
 
 @app.get("/")
@@ -175,6 +241,8 @@ async def graceful_shutdown():
     try:
         # Останавливаем планировщик
         await scheduler_service.stop()
+        await delivery_queue.stop()
+        pdf_service.close()
         
         # Закрываем базу данных
         await db.close()
@@ -224,7 +292,3 @@ async def main():
         sys.exit(1)
     finally:
         await graceful_shutdown()
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
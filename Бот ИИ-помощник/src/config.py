@@ -23,6 +23,9 @@ class Config(BaseModel):
     morning_hour: int = Field(default=8, ge=0, le=23, description="Час утреннего опроса")
     evening_hour: int = Field(default=20, ge=0, le=23, description="Час вечернего опроса")
     weekly_weekday: int = Field(default=6, ge=0, le=6, description="День недели для отчета (0=пн, 6=вс)")
+    reminder_batch_size: int = Field(default=500, ge=1, description="Размер пачки рассылки напоминаний")
+    weekly_report_concurrency: int = Field(default=16, ge=1, description="Одновременных генераций еженедельных отчетов")
+    scheduler_startup_chunk: int = Field(default=2000, ge=1, description="Пользователей за один запрос при загрузке расписаний")
     
     # Tribute Payments
     tribute_product_url: str = Field(default="https://t.me/tribute/app?startapp=plVY", description="Ссылка на продукт Tribute")
@@ -32,13 +35,51 @@ class Config(BaseModel):
     # API Settings
     openai_timeout: int = Field(default=15, description="Таймаут OpenAI API в секундах")
     openai_retries: int = Field(default=3, description="Количество повторов для OpenAI API")
+    gpt_max_concurrency: int = Field(default=8, ge=1, description="Максимум одновременных запросов к OpenAI")
+    gpt_reserved_interactive: int = Field(default=2, ge=0, description="Слоты OpenAI, недоступные фоновым и пакетным запросам")
+    gpt_tokens_per_minute: int = Field(default=150000, ge=0, description="Бюджет токенов OpenAI в минуту (0 - без ограничения)")
+    gpt_breaker_window: float = Field(default=60.0, gt=0, description="Окно статистики circuit breaker в секундах")
+    gpt_breaker_min_calls: int = Field(default=10, ge=1, description="Минимум вызовов в окне для размыкания")
+    gpt_breaker_failure_rate: float = Field(default=0.5, gt=0, le=1, description="Доля ошибок и медленных вызовов для размыкания")
+    gpt_breaker_slow_seconds: float = Field(default=10.0, gt=0, description="Вызов дольше этого считается медленным")
+    gpt_breaker_open_seconds: float = Field(default=30.0, gt=0, description="Пауза перед пробным запросом")
+    gpt_interactive_budget: float = Field(default=20.0, gt=0, description="Бюджет времени на ответ GPT пользователю в секундах, включая повторы")
+    gpt_hedge_enabled: bool = Field(default=True, description="Дублировать интерактивный запрос, если ответ дольше p95")
+    gpt_hedge_quantile: float = Field(default=0.95, gt=0, lt=1, description="Квантиль задержки, после которого отправляется дубль")
+    gpt_hedge_min_samples: int = Field(default=20, ge=1, description="Минимум замеров задержки до включения дублей")
+    relevance_index_users: int = Field(default=256, ge=1, description="Сколько пользовательских индексов релевантности держать в памяти")
+    stem_cache_size: int = Field(default=50000, ge=0, description="Сколько основ слов хранить в кэше стеммера (0 - без кэша)")
+    memory_compaction_days: int = Field(default=30, ge=7, description="Возраст записей памяти, после которого они сворачиваются в недельные итоги")
+    memory_compaction_hour: int = Field(default=3, ge=0, le=23, description="Час (UTC) ночного сворачивания памяти")
+    memory_compaction_concurrency: int = Field(default=2, ge=1, description="Пользователей, чья память сворачивается одновременно")
+    mood_analytics_hour: int = Field(default=4, ge=0, le=23, description="Час (UTC) ночного пересчета аналитики настроения")
+    gpt_cache_size: int = Field(default=2000, ge=0, description="Максимум ответов GPT в кэше (0 - без кэша)")
+    gpt_cache_path: Optional[str] = Field(None, description="Файл SQLite для постоянного кэша ответов GPT")
     http_timeout: int = Field(default=10, description="Таймаут HTTP запросов в секундах")
     
     # Rate Limiting
     cooldown_seconds: int = Field(default=5, description="Кудаун между командами в секундах")
+    delivery_global_rate: float = Field(default=30.0, gt=0, description="Глобальный лимит исходящих сообщений в секунду")
+    delivery_chat_rate: float = Field(default=1.0, gt=0, description="Лимит сообщений в секунду на один чат")
+    delivery_workers: int = Field(default=8, ge=1, description="Количество воркеров очереди доставки")
+    delivery_queue_size: int = Field(default=50000, ge=1, description="Максимум рассылочных сообщений в очереди")
+    delivery_max_retries: int = Field(default=3, ge=0, description="Повторы доставки при сетевых ошибках")
+    
+    # PDF
+    pdf_workers: int = Field(default=2, ge=1, description="Количество процессов для рендеринга PDF")
+    pdf_queue_limit: int = Field(default=32, ge=0, description="Максимум PDF в ожидании свободного процесса")
     
     # Database
     db_path: str = Field(default="bot.db", description="Путь к файлу базы данных")
+    db_pool_size: int = Field(default=4, ge=0, description="Количество соединений для чтения")
+    db_mmap_size: int = Field(default=64 * 1024 * 1024, ge=0, description="PRAGMA mmap_size в байтах")
+    db_cache_size: int = Field(default=-16000, description="PRAGMA cache_size (отрицательное значение - в КиБ)")
+    db_synchronous: str = Field(default="NORMAL", description="PRAGMA synchronous (OFF/NORMAL/FULL)")
+    db_busy_timeout: int = Field(default=5000, ge=0, description="PRAGMA busy_timeout в миллисекундах")
+    db_write_batch_size: int = Field(default=64, ge=1, description="Максимум операций записи в одной транзакции (1 - без группировки)")
+    db_write_batch_delay_ms: float = Field(default=2.0, ge=0, description="Окно накопления операций записи в миллисекундах")
+    user_cache_size: int = Field(default=10000, ge=0, description="Максимум пользователей в кэше (0 - без кэша)")
+    user_cache_ttl: int = Field(default=300, ge=0, description="Время жизни записи кэша пользователей в секундах")
     
     @validator('bot_token', 'openai_api_key')
     def validate_required_secrets(cls, v):
@@ -52,6 +93,13 @@ class Config(BaseModel):
             raise ValueError("Час должен быть от 0 до 23")
         return v
     
+    @validator('db_synchronous')
+    def validate_synchronous(cls, v):
+        v = v.upper()
+        if v not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError("synchronous должен быть OFF, NORMAL, FULL или EXTRA")
+        return v
+    
     @validator('weekly_weekday')
     def validate_weekday(cls, v):
         if not 0 <= v <= 6:
@@ -70,9 +118,49 @@ def load_config() -> Config:
         morning_hour=int(os.getenv("MORNING_HOUR", "8")),
         evening_hour=int(os.getenv("EVENING_HOUR", "20")),
         weekly_weekday=int(os.getenv("WEEKLY_WEEKDAY", "6")),
+        reminder_batch_size=int(os.getenv("REMINDER_BATCH_SIZE", "500")),
+        weekly_report_concurrency=int(os.getenv("WEEKLY_REPORT_CONCURRENCY", "16")),
+        scheduler_startup_chunk=int(os.getenv("SCHEDULER_STARTUP_CHUNK", "2000")),
         tribute_product_url=os.getenv("TRIBUTE_PRODUCT_URL", "https://t.me/tribute/app?startapp=plVY"),
         tribute_webhook_secret=os.getenv("TRIBUTE_WEBHOOK_SECRET"),
         external_base_url=os.getenv("EXTERNAL_BASE_URL"),
+        db_path=os.getenv("DB_PATH", "bot.db"),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "4")),
+        db_mmap_size=int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024))),
+        db_cache_size=int(os.getenv("DB_CACHE_SIZE", "-16000")),
+        db_synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        db_busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT", "5000")),
+        db_write_batch_size=int(os.getenv("DB_WRITE_BATCH_SIZE", "64")),
+        db_write_batch_delay_ms=float(os.getenv("DB_WRITE_BATCH_DELAY_MS", "2")),
+        gpt_max_concurrency=int(os.getenv("GPT_MAX_CONCURRENCY", "8")),
+        gpt_reserved_interactive=int(os.getenv("GPT_RESERVED_INTERACTIVE", "2")),
+        gpt_tokens_per_minute=int(os.getenv("GPT_TOKENS_PER_MINUTE", "150000")),
+        gpt_breaker_window=float(os.getenv("GPT_BREAKER_WINDOW", "60")),
+        gpt_breaker_min_calls=int(os.getenv("GPT_BREAKER_MIN_CALLS", "10")),
+        gpt_breaker_failure_rate=float(os.getenv("GPT_BREAKER_FAILURE_RATE", "0.5")),
+        gpt_breaker_slow_seconds=float(os.getenv("GPT_BREAKER_SLOW_SECONDS", "10")),
+        gpt_breaker_open_seconds=float(os.getenv("GPT_BREAKER_OPEN_SECONDS", "30")),
+        gpt_interactive_budget=float(os.getenv("GPT_INTERACTIVE_BUDGET", "20")),
+        gpt_hedge_enabled=os.getenv("GPT_HEDGE_ENABLED", "true").lower() == "true",
+        gpt_hedge_quantile=float(os.getenv("GPT_HEDGE_QUANTILE", "0.95")),
+        gpt_hedge_min_samples=int(os.getenv("GPT_HEDGE_MIN_SAMPLES", "20")),
+        relevance_index_users=int(os.getenv("RELEVANCE_INDEX_USERS", "256")),
+        stem_cache_size=int(os.getenv("STEM_CACHE_SIZE", "50000")),
+        memory_compaction_days=int(os.getenv("MEMORY_COMPACTION_DAYS", "30")),
+        memory_compaction_hour=int(os.getenv("MEMORY_COMPACTION_HOUR", "3")),
+        memory_compaction_concurrency=int(os.getenv("MEMORY_COMPACTION_CONCURRENCY", "2")),
+        mood_analytics_hour=int(os.getenv("MOOD_ANALYTICS_HOUR", "4")),
+        gpt_cache_size=int(os.getenv("GPT_CACHE_SIZE", "2000")),
+        gpt_cache_path=os.getenv("GPT_CACHE_PATH"),
+        user_cache_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        user_cache_ttl=int(os.getenv("USER_CACHE_TTL", "300")),
+        delivery_global_rate=float(os.getenv("DELIVERY_GLOBAL_RATE", "30")),
+        delivery_chat_rate=float(os.getenv("DELIVERY_CHAT_RATE", "1")),
+        delivery_workers=int(os.getenv("DELIVERY_WORKERS", "8")),
+        delivery_queue_size=int(os.getenv("DELIVERY_QUEUE_SIZE", "50000")),
+        delivery_max_retries=int(os.getenv("DELIVERY_MAX_RETRIES", "3")),
+        pdf_workers=int(os.getenv("PDF_WORKERS", "2")),
+        pdf_queue_limit=int(os.getenv("PDF_QUEUE_LIMIT", "32")),
     )
 
 
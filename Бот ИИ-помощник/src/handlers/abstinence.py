@@ -21,10 +21,7 @@ async def cmd_abstinence(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Получаем воздержания пользователя
-    async with db._connection.execute("""
-        SELECT name, start_date, days_count FROM abstinence WHERE tg_id = ? ORDER BY days_count DESC
-    """, (user_id,)) as cursor:
-        abstinence_list = await cursor.fetchall()
+    abstinence_list = await db.get_abstinence(user_id)
     
     if not abstinence_list:
         await message.answer(
@@ -79,11 +76,10 @@ async def process_add_abstinence(message: Message, state: FSMContext):
     
     # Добавляем воздержание в БД
     today = datetime.now().date()
-    async with db._connection.execute("""
+    await db.execute_write("""
         INSERT INTO abstinence (tg_id, name, start_date, days_count, created_at)
         VALUES (?, ?, ?, 0, ?)
-    """, (user_id, abstinence_name, today, datetime.now())):
-        pass
+    """, (user_id, abstinence_name, today, datetime.now()))
     
     # Финальное сообщение
     await message.answer(
@@ -101,10 +97,7 @@ async def process_abstinence_delete_callback(callback: CallbackQuery, state: FSM
     user_id = callback.from_user.id
     
     # Получаем воздержания пользователя
-    async with db._connection.execute("""
-        SELECT name, days_count FROM abstinence WHERE tg_id = ? ORDER BY days_count DESC
-    """, (user_id,)) as cursor:
-        abstinence_list = await cursor.fetchall()
+    abstinence_list = await db.get_abstinence(user_id)
     
     if not abstinence_list:
         await callback.message.edit_text(
@@ -118,7 +111,7 @@ async def process_abstinence_delete_callback(callback: CallbackQuery, state: FSM
     
     # Создаем кнопки для выбора воздержания
     buttons = []
-    for i, (name, days) in enumerate(abstinence_list):
+    for i, (name, _, days) in enumerate(abstinence_list):
         buttons.append([InlineKeyboardButton(
             text=f"{name} ({days} дней)", 
             callback_data=f"abstinence:delete:{i}"
@@ -141,19 +134,15 @@ async def process_abstinence_delete_select(callback: CallbackQuery, state: FSMCo
     abstinence_idx = int(callback.data.split(":")[2])
     
     # Получаем воздержания пользователя
-    async with db._connection.execute("""
-        SELECT name, days_count FROM abstinence WHERE tg_id = ? ORDER BY days_count DESC
-    """, (user_id,)) as cursor:
-        abstinence_list = await cursor.fetchall()
+    abstinence_list = await db.get_abstinence(user_id)
     
     if abstinence_idx < len(abstinence_list):
         abstinence_name = abstinence_list[abstinence_idx][0]
         
         # Удаляем воздержание из БД
-        async with db._connection.execute("""
+        await db.execute_write("""
             DELETE FROM abstinence WHERE tg_id = ? AND name = ?
-        """, (user_id, abstinence_name)):
-            pass
+        """, (user_id, abstinence_name))
         
         # Финальное сообщение
         await callback.message.edit_text(
@@ -7,8 +7,10 @@ from ..states import Evening
 from ..texts import texts
 from ..keyboards import get_main_menu, kb_evening_done, kb_evening_not_done, kb_evening_learning, kb_post_flow
 from ..storage import db
+from ..config import config
 from ..services.gpt import gpt_service
 from ..services.memories import memory_service
+from ..services.stream_render import render_stream
 from ..services.emotion import emotion_service
 from ..services import ux, flow
 from ..logger import get_logger
@@ -197,15 +199,6 @@ async def finish_evening_flow(message_or_callback, state: FSMContext):
     # Получаем контекст из памяти
     memories = await memory_service.get_recent_memories(user_id, 3)
     
-    # Генерируем рефлексию через GPT
-    reflection = await gpt_service.reflect_evening(
-        done=data.get('done', []),
-        not_done=data.get('not_done', []),
-        learning=data.get('learning', ''),
-        persona=user.persona,
-        memories=memories
-    )
-    
     # Сохраняем запись в БД
     await db.save_entry(
         tg_id=user_id,
@@ -240,6 +233,21 @@ async def finish_evening_flow(message_or_callback, state: FSMContext):
             )
         )
     
+    # Рефлексию через GPT показываем по мере генерации
+    target = message_or_callback if isinstance(message_or_callback, Message) else message_or_callback.message
+    await render_stream(
+        target,
+        gpt_service.stream_reflect_evening(
+            done=data.get('done', []),
+            not_done=data.get('not_done', []),
+            learning=data.get('learning', ''),
+            persona=user.persona,
+            memories=memories,
+            budget=config.gpt_interactive_budget
+        ),
+        formatter=lambda text: ux.compose(ux.h1("Рефлексия дня", "🌙"), ux.p(text))
+    )
+    
     # Сообщение B (действия с кнопками)
     if isinstance(message_or_callback, Message):
         await message_or_callback.answer(
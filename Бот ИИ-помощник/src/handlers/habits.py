@@ -20,10 +20,7 @@ async def cmd_habits(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if not habits:
         await message.answer(
@@ -64,20 +61,16 @@ async def process_habit_add_callback(callback: CallbackQuery, state: FSMContext)
     user = await db.get_user(user_id)
     if user and user.plan_tier == "free":
         # Подсчитываем количество привычек
-        async with db._connection.execute("""
-            SELECT COUNT(*) FROM habits WHERE tg_id = ?
-        """, (user_id,)) as cursor:
-            count = await cursor.fetchone()
-            if count[0] >= 2:
-                await callback.message.edit_text(
-                    ux.compose(
-                        ux.h1("Лимит привычек", "🔥"),
-                        ux.p("На бесплатном тарифе можно создать только 2 привычки."),
-                        ux.p("Обновите подписку для большего количества привычек.")
-                    )
+        if await db.count_habits(user_id) >= 2:
+            await callback.message.edit_text(
+                ux.compose(
+                    ux.h1("Лимит привычек", "🔥"),
+                    ux.p("На бесплатном тарифе можно создать только 2 привычки."),
+                    ux.p("Обновите подписку для большего количества привычек.")
                 )
-                await callback.answer()
-                return
+            )
+            await callback.answer()
+            return
     
     await callback.message.edit_text(
         ux.compose(
@@ -103,20 +96,16 @@ async def process_add_habit(message: Message, state: FSMContext):
     user = await db.get_user(user_id)
     if user and user.plan_tier == "free":
         # Подсчитываем количество привычек
-        async with db._connection.execute("""
-            SELECT COUNT(*) FROM habits WHERE tg_id = ?
-        """, (user_id,)) as cursor:
-            count = await cursor.fetchone()
-            if count[0] >= 2:
-                await message.answer(
-                    ux.compose(
-                        ux.h1("Лимит привычек", "🔥"),
-                        ux.p("На бесплатном тарифе можно создать только 2 привычки."),
-                        ux.p("Обновите подписку для большего количества привычек.")
-                    )
+        if await db.count_habits(user_id) >= 2:
+            await message.answer(
+                ux.compose(
+                    ux.h1("Лимит привычек", "🔥"),
+                    ux.p("На бесплатном тарифе можно создать только 2 привычки."),
+                    ux.p("Обновите подписку для большего количества привычек.")
                 )
-                await state.clear()
-                return
+            )
+            await state.clear()
+            return
     
     # Добавляем привычку
     await db.tick_habit(user_id, habit_name)
@@ -137,10 +126,7 @@ async def process_habit_tick_callback(callback: CallbackQuery, state: FSMContext
     user_id = callback.from_user.id
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if not habits:
         await callback.message.edit_text(
@@ -177,10 +163,7 @@ async def process_habit_tick_select(callback: CallbackQuery, state: FSMContext):
     habit_idx = int(callback.data.split(":")[2])
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if habit_idx < len(habits):
         habit_name = habits[habit_idx][0]
@@ -203,10 +186,7 @@ async def process_habit_rename_callback(callback: CallbackQuery, state: FSMConte
     user_id = callback.from_user.id
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if not habits:
         await callback.message.edit_text(
@@ -243,10 +223,7 @@ async def process_habit_rename_select(callback: CallbackQuery, state: FSMContext
     habit_idx = int(callback.data.split(":")[2])
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if habit_idx < len(habits):
         old_name = habits[habit_idx][0]
@@ -277,10 +254,9 @@ async def process_habit_rename_text(message: Message, state: FSMContext):
         return
     
     # Обновляем название в БД
-    async with db._connection.execute("""
+    await db.execute_write("""
         UPDATE habits SET name = ? WHERE tg_id = ? AND name = ?
-    """, (new_name, user_id, old_name)):
-        pass
+    """, (new_name, user_id, old_name))
     
     # Сообщение А (финал без кнопок)
     await message.answer(
@@ -299,10 +275,7 @@ async def process_habit_delete_callback(callback: CallbackQuery, state: FSMConte
     user_id = callback.from_user.id
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if not habits:
         await callback.message.edit_text(
@@ -339,19 +312,15 @@ async def process_habit_delete_select(callback: CallbackQuery, state: FSMContext
     habit_idx = int(callback.data.split(":")[2])
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
-        SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
-    """, (user_id,)) as cursor:
-        habits = await cursor.fetchall()
+    habits = await db.get_habits(user_id)
     
     if habit_idx < len(habits):
         habit_name = habits[habit_idx][0]
         
         # Удаляем привычку из БД
-        async with db._connection.execute("""
+        await db.execute_write("""
             DELETE FROM habits WHERE tg_id = ? AND name = ?
-        """, (user_id, habit_name)):
-            pass
+        """, (user_id, habit_name))
         
         # Сообщение А (финал без кнопок)
         await callback.message.edit_text(
@@ -119,7 +119,7 @@ async def cmd_habits(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Получаем привычки пользователя
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
     """, (user_id,)) as cursor:
         habits = await cursor.fetchall()
@@ -193,6 +193,7 @@ async def cmd_weekly(message: Message, state: FSMContext):
     """Обработчик кнопки 'Отчёт недели'."""
     from ..services.reports import report_service
     from ..storage import db
+    from ..config import config
     
     user_id = message.from_user.id
     user = await db.get_user(user_id)
@@ -202,7 +203,9 @@ async def cmd_weekly(message: Message, state: FSMContext):
         return
     
     # Генерируем отчет
-    report = await report_service.generate_weekly_report(user_id, user.persona)
+    report = await report_service.generate_weekly_report(
+        user_id, user.persona, budget=config.gpt_interactive_budget
+    )
     
     await message.answer(
         texts.WEEKLY_REPORT.format(report=report),
@@ -216,7 +219,7 @@ async def cmd_abstinence(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Получаем воздержания пользователя
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT name, start_date, days_count FROM abstinence WHERE tg_id = ? ORDER BY days_count DESC
     """, (user_id,)) as cursor:
         abstinence_list = await cursor.fetchall()
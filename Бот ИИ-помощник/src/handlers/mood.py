@@ -14,6 +14,9 @@ from ..logger import get_logger
 logger = get_logger("mood")
 router = Router()
 
+# С какого числа оценок совет сравнивает настроение с обычным уровнем пользователя
+BASELINE_MIN_COUNT = 5
+
 
 @router.message(F.text.in_({"😊 Настроение", "/mood"}))
 async def mood_start(msg: Message, state: FSMContext):
@@ -122,9 +125,11 @@ async def save_mood_and_finish(message_or_callback, state: FSMContext, note: str
             ref_count=0
         )
         await db.upsert_user(new_user)
+        from ..scheduler import scheduler_service
+        await scheduler_service.schedule_user_tasks(user_id)
 
-    # Сохраняем настроение
-    await db.save_mood(
+    # Сохраняем настроение (вместе с накопленной статистикой)
+    stats = await db.save_mood(
         tg_id=user_id,
         energy=energy,
         mood=mood,
@@ -140,6 +145,23 @@ async def save_mood_and_finish(message_or_callback, state: FSMContext, note: str
     else:
         tip_lines.append("Хорошее состояние — продолжай в том же духе.")
 
+    # Сравнение с обычным уровнем пользователя по накопленной статистике
+    if stats.count >= BASELINE_MIN_COUNT:
+        spread = max(stats.mood_std, 1.0)
+        if mood <= stats.mood_mean - spread:
+            tip_lines.append(
+                f"Это ниже твоего обычного уровня ({stats.mood_mean:.1f}/10) — не требуй от себя сегодня слишком много."
+            )
+        elif mood >= stats.mood_mean + spread:
+            tip_lines.append(
+                f"Это выше твоего обычного уровня ({stats.mood_mean:.1f}/10) — хороший момент для сложной задачи."
+            )
+        recent = stats.recent_mood()
+        if recent is not None and recent <= stats.mood_mean - 1:
+            tip_lines.append(
+                f"Последние оценки в среднем {recent:.1f}/10 — ниже обычного. Выдели время на отдых."
+            )
+
     # Сообщение А (финал без кнопок)
     if isinstance(message_or_callback, Message):
         await message_or_callback.answer(
@@ -197,20 +219,20 @@ async def process_stats_from_mood(callback: CallbackQuery, state: FSMContext):
     today = datetime.now().strftime("%Y-%m-%d")
     
     # Получаем записи настроения
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT energy, mood, note FROM mood WHERE tg_id = ? AND date = ?
     """, (user_id, today)) as cursor:
         mood_data = await cursor.fetchone()
     
     # Получаем фокус-сессии
-    async with db._connection.execute("""
-        SELECT COUNT(*), SUM(duration) FROM pomodoro 
-        WHERE tg_id = ? AND DATE(started_at) = ?
+    async with db.read() as conn, conn.execute("""
+        SELECT focus_sessions, focus_minutes FROM daily_rollups
+        WHERE tg_id = ? AND day = ?
     """, (user_id, today)) as cursor:
         focus_data = await cursor.fetchone()
     
     # Получаем привычки
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT COUNT(*) FROM habits WHERE tg_id = ?
     """, (user_id,)) as cursor:
         habits_count = await cursor.fetchone()
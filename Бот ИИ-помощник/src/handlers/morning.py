@@ -7,8 +7,10 @@ from ..states import Morning
 from ..texts import texts
 from ..keyboards import get_main_menu, get_energy_keyboard, kb_morning_goal, kb_morning_tasks, kb_morning_energy, kb_post_flow
 from ..storage import db
+from ..config import config
 from ..services.gpt import gpt_service
 from ..services.memories import memory_service
+from ..services.stream_render import render_stream
 from ..services import ux, flow
 from ..logger import get_logger
 
@@ -189,15 +191,6 @@ async def finish_morning_flow(message_or_callback, state: FSMContext):
     # Получаем контекст из памяти
     memories = await memory_service.get_recent_memories(user_id, 3)
     
-    # Генерируем план через GPT
-    plan = await gpt_service.plan_morning(
-        goal=data['goal'],
-        top3=data['top3'],
-        energy=data.get('energy', 5),
-        persona=user.persona,
-        memories=memories
-    )
-    
     # Сохраняем запись в БД
     await db.save_entry(
         tg_id=user_id,
@@ -232,6 +225,21 @@ async def finish_morning_flow(message_or_callback, state: FSMContext):
             )
         )
     
+    # План дня через GPT показываем по мере генерации
+    target = message_or_callback if isinstance(message_or_callback, Message) else message_or_callback.message
+    await render_stream(
+        target,
+        gpt_service.stream_plan_morning(
+            goal=data['goal'],
+            top3=data['top3'],
+            energy=data.get('energy', 5),
+            persona=user.persona,
+            memories=memories,
+            budget=config.gpt_interactive_budget
+        ),
+        formatter=lambda text: ux.compose(ux.h1("План на день", "🗓"), ux.p(text))
+    )
+    
     # Сообщение B (действия с кнопками)
     if isinstance(message_or_callback, Message):
         await message_or_callback.answer(
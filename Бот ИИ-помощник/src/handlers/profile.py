@@ -11,6 +11,7 @@ from ..keyboards import (
     kb_profile_persona, kb_post_flow, get_main_menu
 )
 from ..storage import db
+from ..config import config
 from ..services.gpt import gpt_service
 from ..services import ux, flow
 from ..logger import get_logger
@@ -341,7 +342,7 @@ async def process_persona(callback: CallbackQuery, state: FSMContext):
     
     try:
         # Генерируем профиль через GPT
-        profile_data = await gpt_service.build_profile(answers)
+        profile_data = await gpt_service.build_profile(answers, budget=config.gpt_interactive_budget)
         
         # Преобразуем в читаемый текст
         profile_text = f"""🧠 Психологический портрет:
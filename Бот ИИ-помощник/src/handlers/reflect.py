@@ -7,8 +7,10 @@ from ..states import Reflect
 from ..texts import texts
 from ..keyboards import kb_reflect_topics, kb_reflect_actions, kb_post_flow, get_main_menu
 from ..storage import db
+from ..config import config
 from ..services.gpt import gpt_service
 from ..services.memories import memory_service
+from ..services.stream_render import render_stream
 from ..services import ux, flow
 from ..logger import get_logger
 
@@ -76,22 +78,23 @@ async def process_reflect_prompt(msg: Message, state: FSMContext):
         return
     
     # Получаем контекст из памяти
-    memories = await memory_service.get_recent_memories(msg.from_user.id, 5)
+    memories = await memory_service.get_relevant_memories(msg.from_user.id, question, 5)
     
-    # Генерируем ответ через GPT
-    response = await gpt_service.reflect_dialog(
+    # Генерируем ответ через GPT и показываем его по мере генерации
+    chunks = gpt_service.stream_reflect_dialog(
         user_prompt=question,
-        profile=user.profile_data or {},
+        profile=await db.get_profile(msg.from_user.id),
         persona=user.persona or "Дружелюбный помощник",
         memories=memories,
-        mood_snapshot={"energy": 5, "mood": 5}  # Значения по умолчанию
+        mood_snapshot={"energy": 5, "mood": 5},  # Значения по умолчанию
+        budget=config.gpt_interactive_budget
     )
-    
-    # Показываем ответ
-    await msg.answer(
-        ux.compose(
+    await render_stream(
+        msg,
+        chunks,
+        formatter=lambda text: ux.compose(
             ux.h1("Ответ цифрового Я", "🤖"),
-            ux.block("Размышление", response.split("\n"), "💭")
+            ux.block("Размышление", text.split("\n"), "💭")
         ),
         reply_markup=kb_reflect_actions()
     )
@@ -0,0 +1,97 @@
+"""Обработчики поиска по истории."""
+import time
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+
+from ..states import Search
+from ..keyboards import kb_search_pages, kb_cancel_reply
+from ..storage import db, MATCH_START, MATCH_END
+from ..services import ux
+from ..services.prompts import KIND_LABELS
+from ..logger import get_logger
+
+logger = get_logger("search")
+router = Router()
+
+PAGE_SIZE = 5
+
+SOURCE_EMOJI = {"memory": "🧠", "entry": "📝", "mood": "😊"}
+
+
+def _highlight(snippet: str) -> str:
+    """Сниппет в HTML: совпадения - жирным."""
+    return ux.escape(snippet or "").replace(MATCH_START, "<b>").replace(MATCH_END, "</b>")
+
+
+async def _render_page(user_id: int, query: str, page: int):
+    """Текст и клавиатура страницы результатов."""
+    started = time.perf_counter()
+    # Лишняя запись показывает, есть ли следующая страница
+    results = await db.search_history(user_id, query, PAGE_SIZE + 1, page * PAGE_SIZE)
+    logger.debug(f"Search for user {user_id} took {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    has_more = len(results) > PAGE_SIZE
+    title = ux.h1(f"Поиск: «{query}»", "🔎")
+    if not results:
+        text = ux.compose(title, ux.p("Ничего не нашлось. Попробуй другое слово."))
+        return text, kb_search_pages(page, False)
+
+    lines = []
+    for number, result in enumerate(results[:PAGE_SIZE], start=page * PAGE_SIZE + 1):
+        emoji = SOURCE_EMOJI.get(result["source"], "•")
+        label = KIND_LABELS.get(result["kind"], result["kind"] or "")
+        lines.append(
+            f"{ux.EM}{number}. {emoji} <i>{ux.escape(result['day'] or '')}, {ux.escape(label)}</i>\n"
+            f"{ux.EM}{_highlight(result['snippet'])}"
+        )
+    text = ux.compose(title, "\n\n".join(lines), ux.hr(), ux.p(f"Страница {page + 1}"))
+    return text, kb_search_pages(page, has_more)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext):
+    """Поиск по истории: /search <запрос>."""
+    query = (command.args or "").strip()
+    if not query:
+        await state.set_state(Search.query)
+        await message.answer(
+            ux.compose(
+                ux.h1("Поиск по истории", "🔎"),
+                ux.p("Что найти? Напиши слово или фразу из своих записей, заметок или диалогов.")
+            ),
+            reply_markup=kb_cancel_reply()
+        )
+        return
+
+    await show_results(message, state, query)
+
+
+@router.message(Search.query)
+async def process_search_query(message: Message, state: FSMContext):
+    """Ввод запроса после /search без аргументов."""
+    await state.set_state(None)
+    await show_results(message, state, (message.text or "").strip())
+
+
+async def show_results(message: Message, state: FSMContext, query: str):
+    """Первая страница результатов; запрос запоминается для листания."""
+    await state.update_data(search_query=query)
+    text, keyboard = await _render_page(message.from_user.id, query, 0)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("search:page:"))
+async def process_search_page(callback: CallbackQuery, state: FSMContext):
+    """Листание результатов поиска."""
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Поиск устарел, повтори /search", show_alert=True)
+        return
+
+    page = max(0, int(callback.data.split(":")[2]))
+    text, keyboard = await _render_page(callback.from_user.id, query, page)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
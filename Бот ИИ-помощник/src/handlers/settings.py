@@ -10,6 +10,7 @@ from ..keyboards import (
     kb_settings_clear, kb_post_flow, get_main_menu
 )
 from ..storage import db
+from ..scheduler import scheduler_service
 from ..services import ux, flow
 from ..logger import get_logger
 
@@ -80,6 +81,7 @@ async def process_tz_selection(callback: CallbackQuery, state: FSMContext):
     
     # Обновляем часовой пояс
     await db.update_user_tz(callback.from_user.id, tz)
+    await scheduler_service.schedule_user_tasks(callback.from_user.id)
     
     await callback.message.edit_text(
         ux.compose(
@@ -99,6 +101,7 @@ async def process_tz_custom(msg: Message, state: FSMContext):
     
     # Обновляем часовой пояс
     await db.update_user_tz(msg.from_user.id, tz)
+    await scheduler_service.schedule_user_tasks(msg.from_user.id)
     
     await msg.answer(
         ux.compose(
@@ -170,6 +173,7 @@ async def process_time_update(callback: CallbackQuery, state: FSMContext):
     
     if time_type == "morning":
         await db.update_user_morning_hour(callback.from_user.id, hour)
+        await scheduler_service.schedule_user_tasks(callback.from_user.id)
         await callback.message.edit_text(
             ux.compose(
                 ux.h1("Настройки", "⚙️"),
@@ -179,6 +183,7 @@ async def process_time_update(callback: CallbackQuery, state: FSMContext):
         )
     elif time_type == "evening":
         await db.update_user_evening_hour(callback.from_user.id, hour)
+        await scheduler_service.schedule_user_tasks(callback.from_user.id)
         await callback.message.edit_text(
             ux.compose(
                 ux.h1("Настройки", "⚙️"),
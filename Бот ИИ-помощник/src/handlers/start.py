@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 
 from ..states import Profile
 from ..storage import db, User
+from ..scheduler import scheduler_service
 from ..texts import texts
 from ..keyboards import kb_profile_q1, get_main_menu
 from ..logger import get_logger
@@ -32,6 +33,7 @@ async def cmd_start(message: Message, state: FSMContext):
             trial_until=datetime.now() + timedelta(days=5)  # 5-дневный trial
         )
         await db.upsert_user(new_user)
+        await scheduler_service.schedule_user_tasks(user_id)
         logger.info(f"New user created: {user_id}")
         
         # Начинаем создание профиля
@@ -176,15 +178,15 @@ async def process_q10(message: Message, state: FSMContext):
     
     # Создаем профиль через GPT
     from ..services.gpt import gpt_service
-    profile = await gpt_service.build_profile(data)
+    from ..config import config
+    profile = await gpt_service.build_profile(data, budget=config.gpt_interactive_budget)
     
     # Сохраняем профиль в базу
     import json
-    await db._connection.execute("""
+    await db.execute_write("""
         INSERT OR REPLACE INTO profiles (tg_id, data)
         VALUES (?, ?)
     """, (message.from_user.id, json.dumps(profile)))
-    await db._connection.commit()
     
     # Показываем краткий портрет
     from ..services import ux
@@ -6,8 +6,9 @@ from aiogram.fsm.context import FSMContext
 from ..texts import texts
 from ..keyboards import kb_post_flow, get_main_menu
 from ..storage import db
+from ..config import config
 from ..services.reports import report_service
-from ..services.pdf import pdf_service
+from ..services.pdf import pdf_service, PDFQueueFull
 from ..services import ux, flow
 from ..logger import get_logger
 
@@ -26,7 +27,9 @@ async def cmd_weekly(message: Message, state: FSMContext):
         return
     
     # Генерируем отчет
-    report = await report_service.generate_weekly_report(user_id, user.persona)
+    report = await report_service.generate_weekly_report(
+        user_id, user.persona, budget=config.gpt_interactive_budget
+    )
     
     # Форматируем ответ красиво
     summary_lines = report.split("\n")
@@ -80,14 +83,14 @@ async def cmd_export_pdf(message: Message, state: FSMContext):
     
     # Генерируем PDF
     try:
-        pdf_path = await pdf_service.generate_weekly_pdf(
-            user_id=user_id,
+        pdf = await pdf_service.generate_weekly_pdf(
+            tg_id=user_id,
             user_name=message.from_user.first_name or "Пользователь"
         )
         
         # Отправляем файл
-        from aiogram.types import FSInputFile
-        pdf_file = FSInputFile(pdf_path)
+        from aiogram.types import BufferedInputFile
+        pdf_file = BufferedInputFile(pdf, filename=pdf_service.filename(user_id))
         
         await message.answer_document(
             document=pdf_file,
@@ -107,6 +110,16 @@ async def cmd_export_pdf(message: Message, state: FSMContext):
         
         logger.info(f"PDF report sent to user {user_id}")
         
+    except PDFQueueFull:
+        logger.warning(f"PDF queue full, rejected export for user {user_id}")
+        await message.answer(
+            flow.finish_card(
+                title="Очередь занята",
+                intro="Сейчас готовится много PDF отчетов. Попробуй через пару минут.",
+                tips=["Попробуй снова позже", "Посмотри отчет текстом", "Вернись в меню"]
+            ),
+            reply_markup=kb_post_flow()
+        )
     except Exception as e:
         logger.error(f"PDF generation error for user {user_id}: {e}")
         await message.answer(
@@ -128,7 +141,7 @@ async def cmd_export_day(message: Message, state: FSMContext):
     from datetime import date
     today = date.today().isoformat()
     
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT type, data FROM entries 
         WHERE tg_id = ? AND date = ?
         ORDER BY created_at ASC
@@ -192,7 +205,7 @@ async def cmd_export_week(message: Message, state: FSMContext):
     from datetime import datetime, timedelta
     week_ago = (datetime.now() - timedelta(days=7)).date()
     
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT date, type, data FROM entries 
         WHERE tg_id = ? AND date >= ?
         ORDER BY date ASC, created_at ASC
@@ -265,20 +278,20 @@ async def process_stats_from_weekly(callback: CallbackQuery, state: FSMContext):
     today = datetime.now().strftime("%Y-%m-%d")
     
     # Получаем записи настроения
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT energy, mood, note FROM mood WHERE tg_id = ? AND date = ?
     """, (user_id, today)) as cursor:
         mood_data = await cursor.fetchone()
     
     # Получаем фокус-сессии
-    async with db._connection.execute("""
-        SELECT COUNT(*), SUM(duration) FROM pomodoro 
-        WHERE tg_id = ? AND DATE(started_at) = ?
+    async with db.read() as conn, conn.execute("""
+        SELECT focus_sessions, focus_minutes FROM daily_rollups
+        WHERE tg_id = ? AND day = ?
     """, (user_id, today)) as cursor:
         focus_data = await cursor.fetchone()
     
     # Получаем привычки
-    async with db._connection.execute("""
+    async with db.read() as conn, conn.execute("""
         SELECT COUNT(*) FROM habits WHERE tg_id = ?
     """, (user_id,)) as cursor:
         habits_count = await cursor.fetchone()
@@ -683,3 +683,14 @@ def kb_evening_learning() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text="✍️ Свой вариант", callback_data="evening:learning:custom")]
         ]
     )
+
+
+# Поиск
+def kb_search_pages(page: int, has_more: bool) -> InlineKeyboardMarkup:
+    """Листание результатов поиска."""
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"search:page:{page - 1}"))
+    if has_more:
+        row.append(InlineKeyboardButton(text="Дальше ▶️", callback_data=f"search:page:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[row] if row else [])
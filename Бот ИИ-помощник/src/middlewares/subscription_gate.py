@@ -116,11 +116,12 @@ class SubscriptionGateMiddleware(BaseMiddleware):
         """Проверяет лимиты фокус-сессий."""
         today = date.today().isoformat()
         
-        async with db._connection.execute("""
-            SELECT COUNT(*) FROM pomodoro 
-            WHERE tg_id = ? AND DATE(started_at) = ?
+        async with db.read() as conn, conn.execute("""
+            SELECT focus_sessions FROM daily_rollups
+            WHERE tg_id = ? AND day = ?
         """, (user_id, today)) as cursor:
-            sessions_count = (await cursor.fetchone())[0]
+            row = await cursor.fetchone()
+            sessions_count = row[0] if row else 0
         
         if sessions_count >= 1:
             title = ux.h1("Лимит фокус-сессий", "⏰")
@@ -0,0 +1,422 @@
+"""Версионированные миграции схемы и проверка планов запросов.
+
+Запуск проверки: python -m src.migrations [путь_к_бд] [--rebuild-rollups] [--rebuild-mood-stats]
+"""
+import sys
+from typing import List, Optional, Tuple
+
+import aiosqlite
+
+from .logger import get_logger
+from .stats import MoodStats
+
+logger = get_logger("migrations")
+
+
+def _fts_sync(table: str, text: str, when: str = "1") -> List[str]:
+    """FTS5-таблица {table}_fts и триггеры, синхронизирующие ее с таблицей.
+    
+    rowid совпадает с id исходной строки; owner - токен 'u<tg_id>', чтобы
+    поиск одного пользователя шел по индексу, а не фильтрацией всех
+    совпадений. text - SQL-выражение текста от NEW.
+    """
+    fts = f"{table}_fts"
+    insert = (
+        f"INSERT INTO {fts} (rowid, body, owner) "
+        f"SELECT NEW.id, {text}, 'u' || NEW.tg_id WHERE {when};"
+    )
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            body, owner, tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+        BEGIN
+            {insert}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = OLD.id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE ON {table}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = OLD.id;
+            {insert}
+        END""",
+        f"DELETE FROM {fts}",
+        # Заполнение из истории: то же выражение, но от строк таблицы
+        f"INSERT INTO {fts} (rowid, body, owner) "
+        f"SELECT NEW.id, {text}, 'u' || NEW.tg_id FROM {table} AS NEW WHERE {when}",
+    ]
+
+
+# Текст записи опроса - все строковые значения JSON (json_tree раскрывает \uXXXX)
+ENTRY_TEXT = (
+    "CASE WHEN json_valid(NEW.data) THEN "
+    "(SELECT group_concat(value, ' ') FROM json_tree(NEW.data) WHERE type = 'text') END"
+)
+
+
+# (версия, описание, SQL-операторы). Порядок важен, операторы идемпотентны.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "entries: индекс (tg_id, date, type)", [
+        "CREATE INDEX IF NOT EXISTS idx_entries_user_date_type ON entries (tg_id, date, type)",
+    ]),
+    (2, "memories: индекс (tg_id, ts)", [
+        "CREATE INDEX IF NOT EXISTS idx_memories_user_ts ON memories (tg_id, ts)",
+    ]),
+    (3, "pomodoro: покрывающий индекс (tg_id, started_at, duration)", [
+        "CREATE INDEX IF NOT EXISTS idx_pomodoro_user_started ON pomodoro (tg_id, started_at, duration)",
+    ]),
+    (4, "mood: покрывающий индекс (tg_id, date, energy, mood)", [
+        "CREATE INDEX IF NOT EXISTS idx_mood_user_date ON mood (tg_id, date, energy, mood)",
+    ]),
+    (5, "habits и abstinence: индексы по пользователю", [
+        "CREATE INDEX IF NOT EXISTS idx_habits_user_name ON habits (tg_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_abstinence_user ON abstinence (tg_id, days_count)",
+    ]),
+    (6, "payments: индекс (tg_id, created_at)", [
+        "CREATE INDEX IF NOT EXISTS idx_payments_user_created ON payments (tg_id, created_at)",
+    ]),
+    (7, "daily_rollups: дневные агрегаты, триггеры и заполнение из истории", [
+        """CREATE TABLE IF NOT EXISTS daily_rollups (
+            tg_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            entries_count INTEGER NOT NULL DEFAULT 0,
+            morning_count INTEGER NOT NULL DEFAULT 0,
+            evening_count INTEGER NOT NULL DEFAULT 0,
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            energy_min INTEGER,
+            energy_max INTEGER,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_min INTEGER,
+            mood_max INTEGER,
+            focus_sessions INTEGER NOT NULL DEFAULT 0,
+            focus_minutes INTEGER NOT NULL DEFAULT 0,
+            habit_ticks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tg_id, day)
+        ) WITHOUT ROWID""",
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_entries AFTER INSERT ON entries
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, entries_count, morning_count, evening_count)
+            VALUES (NEW.tg_id, NEW.date, 1, NEW.type = 'morning', NEW.type = 'evening')
+            ON CONFLICT (tg_id, day) DO UPDATE SET
+                entries_count = entries_count + 1,
+                morning_count = morning_count + excluded.morning_count,
+                evening_count = evening_count + excluded.evening_count;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_mood AFTER INSERT ON mood
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, mood_count, energy_sum, energy_min, energy_max,
+                                       mood_sum, mood_min, mood_max)
+            VALUES (NEW.tg_id, NEW.date, 1, NEW.energy, NEW.energy, NEW.energy,
+                    NEW.mood, NEW.mood, NEW.mood)
+            ON CONFLICT (tg_id, day) DO UPDATE SET
+                mood_count = mood_count + 1,
+                energy_sum = energy_sum + excluded.energy_sum,
+                energy_min = MIN(COALESCE(energy_min, excluded.energy_min), excluded.energy_min),
+                energy_max = MAX(COALESCE(energy_max, excluded.energy_max), excluded.energy_max),
+                mood_sum = mood_sum + excluded.mood_sum,
+                mood_min = MIN(COALESCE(mood_min, excluded.mood_min), excluded.mood_min),
+                mood_max = MAX(COALESCE(mood_max, excluded.mood_max), excluded.mood_max);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_pomodoro AFTER INSERT ON pomodoro
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, focus_sessions, focus_minutes)
+            VALUES (NEW.tg_id, DATE(NEW.started_at), 1, COALESCE(NEW.duration, 0))
+            ON CONFLICT (tg_id, day) DO UPDATE SET
+                focus_sessions = focus_sessions + 1,
+                focus_minutes = focus_minutes + excluded.focus_minutes;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_habit_insert AFTER INSERT ON habits
+        WHEN NEW.last_tick IS NOT NULL
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, habit_ticks)
+            VALUES (NEW.tg_id, DATE(NEW.last_tick), 1)
+            ON CONFLICT (tg_id, day) DO UPDATE SET habit_ticks = habit_ticks + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_habit_tick AFTER UPDATE OF last_tick ON habits
+        WHEN NEW.last_tick IS NOT NULL AND NEW.last_tick IS NOT OLD.last_tick
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, habit_ticks)
+            VALUES (NEW.tg_id, DATE(NEW.last_tick), 1)
+            ON CONFLICT (tg_id, day) DO UPDATE SET habit_ticks = habit_ticks + 1;
+        END""",
+    ]),
+    (8, "memories_archive: исходные записи памяти, свернутые в недельные итоги", [
+        """CREATE TABLE IF NOT EXISTS memories_archive (
+            id INTEGER PRIMARY KEY,
+            tg_id INTEGER NOT NULL,
+            ts DATETIME,
+            kind TEXT,
+            content TEXT,
+            summary_id INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_memories_archive_user_ts ON memories_archive (tg_id, ts)",
+    ]),
+    (9, "FTS5: полнотекстовый поиск по памяти, записям опросов и заметкам к настроению", [
+        *_fts_sync("memories", "NEW.content", "NEW.tg_id IS NOT NULL"),
+        *_fts_sync("entries", ENTRY_TEXT, "NEW.tg_id IS NOT NULL"),
+        *_fts_sync("mood", "NEW.note", "NEW.tg_id IS NOT NULL AND COALESCE(NEW.note, '') != ''"),
+    ]),
+    (10, "mood: время записи (ts) и покрывающий индекс истории для аналитики", [
+        "ALTER TABLE mood ADD COLUMN ts DATETIME",
+        "CREATE INDEX IF NOT EXISTS idx_mood_user_history ON mood (tg_id, date, ts, mood, energy)",
+    ]),
+    (11, "mood_stats: накопленная статистика настроения и последние оценки", [
+        """CREATE TABLE IF NOT EXISTS mood_stats (
+            tg_id INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            mood_mean REAL NOT NULL DEFAULT 0,
+            mood_m2 REAL NOT NULL DEFAULT 0,
+            energy_mean REAL NOT NULL DEFAULT 0,
+            energy_m2 REAL NOT NULL DEFAULT 0,
+            recent BLOB NOT NULL DEFAULT x''
+        )""",
+    ]),
+    (12, "daily_rollups: число непустых оценок; триггер mood принимает NULL в energy и mood", [
+        "ALTER TABLE daily_rollups ADD COLUMN energy_values INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE daily_rollups ADD COLUMN mood_values INTEGER NOT NULL DEFAULT 0",
+        "DROP TRIGGER IF EXISTS trg_rollup_mood",
+        # Средние считаются по непустым оценкам, как AVG(); скалярный MIN/MAX
+        # с NULL дает NULL, поэтому пустая оценка не сбрасывает min и max
+        """CREATE TRIGGER IF NOT EXISTS trg_rollup_mood AFTER INSERT ON mood
+        WHEN NEW.tg_id IS NOT NULL AND NEW.date IS NOT NULL
+        BEGIN
+            INSERT INTO daily_rollups (tg_id, day, mood_count, energy_values, energy_sum, energy_min, energy_max,
+                                       mood_values, mood_sum, mood_min, mood_max)
+            VALUES (NEW.tg_id, NEW.date, 1, NEW.energy IS NOT NULL, COALESCE(NEW.energy, 0), NEW.energy, NEW.energy,
+                    NEW.mood IS NOT NULL, COALESCE(NEW.mood, 0), NEW.mood, NEW.mood)
+            ON CONFLICT (tg_id, day) DO UPDATE SET
+                mood_count = mood_count + 1,
+                energy_values = energy_values + excluded.energy_values,
+                energy_sum = energy_sum + excluded.energy_sum,
+                energy_min = COALESCE(MIN(energy_min, excluded.energy_min), energy_min, excluded.energy_min),
+                energy_max = COALESCE(MAX(energy_max, excluded.energy_max), energy_max, excluded.energy_max),
+                mood_values = mood_values + excluded.mood_values,
+                mood_sum = mood_sum + excluded.mood_sum,
+                mood_min = COALESCE(MIN(mood_min, excluded.mood_min), mood_min, excluded.mood_min),
+                mood_max = COALESCE(MAX(mood_max, excluded.mood_max), mood_max, excluded.mood_max);
+        END""",
+    ]),
+]
+
+
+# Миграция, после которой схема daily_rollups совпадает с ROLLUP_BACKFILL
+ROLLUP_SCHEMA_VERSION = 12
+
+# Пересборка daily_rollups из сырых таблиц. Таблица habits хранит только
+# последнюю отметку, поэтому для привычек восстанавливается лишь last_tick.
+ROLLUP_BACKFILL: List[str] = [
+    """INSERT INTO daily_rollups (tg_id, day, entries_count, morning_count, evening_count)
+    SELECT tg_id, date, COUNT(*), SUM(type = 'morning'), SUM(type = 'evening')
+    FROM entries WHERE tg_id IS NOT NULL AND date IS NOT NULL {and_user}
+    GROUP BY tg_id, date
+    ON CONFLICT (tg_id, day) DO UPDATE SET
+        entries_count = excluded.entries_count,
+        morning_count = excluded.morning_count,
+        evening_count = excluded.evening_count""",
+    """INSERT INTO daily_rollups (tg_id, day, mood_count, energy_values, energy_sum, energy_min, energy_max,
+                               mood_values, mood_sum, mood_min, mood_max)
+    SELECT tg_id, date, COUNT(*), COUNT(energy), TOTAL(energy), MIN(energy), MAX(energy),
+           COUNT(mood), TOTAL(mood), MIN(mood), MAX(mood)
+    FROM mood WHERE tg_id IS NOT NULL AND date IS NOT NULL {and_user}
+    GROUP BY tg_id, date
+    ON CONFLICT (tg_id, day) DO UPDATE SET
+        mood_count = excluded.mood_count,
+        energy_values = excluded.energy_values,
+        energy_sum = excluded.energy_sum,
+        energy_min = excluded.energy_min,
+        energy_max = excluded.energy_max,
+        mood_values = excluded.mood_values,
+        mood_sum = excluded.mood_sum,
+        mood_min = excluded.mood_min,
+        mood_max = excluded.mood_max""",
+    """INSERT INTO daily_rollups (tg_id, day, focus_sessions, focus_minutes)
+    SELECT tg_id, DATE(started_at), COUNT(*), TOTAL(duration)
+    FROM pomodoro WHERE tg_id IS NOT NULL AND started_at IS NOT NULL {and_user}
+    GROUP BY tg_id, DATE(started_at)
+    ON CONFLICT (tg_id, day) DO UPDATE SET
+        focus_sessions = excluded.focus_sessions,
+        focus_minutes = excluded.focus_minutes""",
+    """INSERT INTO daily_rollups (tg_id, day, habit_ticks)
+    SELECT tg_id, DATE(last_tick), COUNT(*)
+    FROM habits WHERE tg_id IS NOT NULL AND last_tick IS NOT NULL {and_user}
+    GROUP BY tg_id, DATE(last_tick)
+    ON CONFLICT (tg_id, day) DO UPDATE SET habit_ticks = excluded.habit_ticks""",
+]
+
+
+# Горячие запросы, которые не должны приводить к полному сканированию таблицы
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("get_user", "SELECT * FROM users WHERE tg_id = ?", (1,)),
+    ("today_has", "SELECT COUNT(*) FROM entries WHERE tg_id = ? AND date = ? AND type = ?",
+     (1, "2024-01-01", "morning")),
+    ("week_entries", "SELECT COUNT(*) FROM entries WHERE tg_id = ? AND date >= ?", (1, "2024-01-01")),
+    ("week_daily_activity", "SELECT date, COUNT(*) FROM entries WHERE tg_id = ? AND date >= ? GROUP BY date",
+     (1, "2024-01-01")),
+    ("week_energy", "SELECT AVG(energy), AVG(mood) FROM mood WHERE tg_id = ? AND date >= ?",
+     (1, "2024-01-01")),
+    ("week_focus", "SELECT SUM(duration) FROM pomodoro WHERE tg_id = ? AND started_at >= ?",
+     (1, "2024-01-01")),
+    ("recent_memories", "SELECT kind, content, ts FROM memories WHERE tg_id = ? ORDER BY ts DESC LIMIT ?",
+     (1, 5)),
+    ("old_memories", "SELECT id, kind, content, ts FROM memories WHERE tg_id = ? AND ts < ? "
+     "AND kind != 'summary' ORDER BY ts", (1, "2024-01-01")),
+    ("habit_streaks", "SELECT name, streak, last_tick FROM habits WHERE tg_id = ? ORDER BY streak DESC", (1,)),
+    ("tick_habit", "SELECT streak, last_tick FROM habits WHERE tg_id = ? AND name = ?", (1, "x")),
+    ("abstinence_list", "SELECT name, start_date, days_count FROM abstinence WHERE tg_id = ?", (1,)),
+    ("user_payments", "SELECT external_id FROM payments WHERE tg_id = ? ORDER BY created_at DESC", (1,)),
+    ("daily_rollups", "SELECT * FROM daily_rollups WHERE tg_id = ? AND day >= ?", (1, "2024-01-01")),
+    ("mood_stats", "SELECT * FROM mood_stats WHERE tg_id = ?", (1,)),
+    ("mood_history", "SELECT date, ts, mood, energy FROM mood WHERE tg_id = ? AND mood IS NOT NULL "
+     "AND energy IS NOT NULL ORDER BY date, ts", (1,)),
+]
+
+
+async def current_version(connection: aiosqlite.Connection) -> int:
+    """Возвращает текущую версию схемы."""
+    await connection.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    async with connection.execute("SELECT MAX(version) FROM schema_version") as cursor:
+        row = await cursor.fetchone()
+    return row[0] or 0
+
+
+async def run_migrations(connection: aiosqlite.Connection) -> int:
+    """Применяет недостающие миграции по порядку и возвращает итоговую версию."""
+    version = await current_version(connection)
+
+    for step_version, description, statements in MIGRATIONS:
+        if step_version <= version:
+            continue
+
+        for statement in statements:
+            try:
+                await connection.execute(statement)
+            except aiosqlite.OperationalError as e:
+                # ALTER TABLE ... ADD COLUMN не идемпотентен: колонка могла
+                # остаться от прерванного применения миграции
+                if "duplicate column name" not in str(e):
+                    raise
+                logger.warning(f"Migration {step_version}: {e}, skipping")
+        if step_version == ROLLUP_SCHEMA_VERSION:
+            # Пересборка - после последней миграции, меняющей колонки daily_rollups
+            await rebuild_daily_rollups(connection, commit=False)
+        if step_version == 11:
+            await rebuild_mood_stats(connection, commit=False)
+        await connection.execute(
+            "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)",
+            (step_version, description)
+        )
+        await connection.commit()
+        version = step_version
+        logger.info(f"Applied migration {step_version}: {description}")
+
+    return version
+
+
+async def rebuild_daily_rollups(connection: aiosqlite.Connection, tg_id: Optional[int] = None,
+                                commit: bool = True) -> int:
+    """Пересобирает daily_rollups из истории (для всех или одного пользователя)."""
+    and_user = "AND tg_id = :tg_id" if tg_id is not None else ""
+    params = {"tg_id": tg_id}
+
+    if tg_id is None:
+        await connection.execute("DELETE FROM daily_rollups")
+    else:
+        await connection.execute("DELETE FROM daily_rollups WHERE tg_id = :tg_id", params)
+    for statement in ROLLUP_BACKFILL:
+        await connection.execute(statement.format(and_user=and_user), params)
+
+    async with connection.execute(
+        "SELECT COUNT(*) FROM daily_rollups" + (" WHERE tg_id = :tg_id" if tg_id is not None else ""),
+        params
+    ) as cursor:
+        rows = (await cursor.fetchone())[0]
+
+    if commit:
+        await connection.commit()
+    logger.info(f"Rebuilt {rows} daily rollups")
+    return rows
+
+
+async def rebuild_mood_stats(connection: aiosqlite.Connection, commit: bool = True) -> int:
+    """Пересобирает mood_stats проходом по истории настроения в порядке записи."""
+    await connection.execute("DELETE FROM mood_stats")
+    stats: Optional[MoodStats] = None
+    batch: List[tuple] = []
+    async with connection.execute("""
+        SELECT tg_id, mood, energy FROM mood
+        WHERE tg_id IS NOT NULL AND mood IS NOT NULL AND energy IS NOT NULL
+        ORDER BY tg_id, date, ts, id
+    """) as cursor:
+        async for tg_id, mood, energy in cursor:
+            if stats is None or stats.tg_id != tg_id:
+                if stats is not None:
+                    batch.append(stats.as_row())
+                stats = MoodStats(tg_id)
+            stats.add(mood, energy)
+    if stats is not None:
+        batch.append(stats.as_row())
+
+    await connection.executemany("INSERT INTO mood_stats VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+    if commit:
+        await connection.commit()
+    logger.info(f"Rebuilt mood stats for {len(batch)} users")
+    return len(batch)
+
+
+async def check_query_plans(connection: aiosqlite.Connection) -> List[str]:
+    """Возвращает список горячих запросов, которые сканируют таблицу целиком."""
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        async with connection.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+            details = [row[3] for row in await cursor.fetchall()]
+
+        scans = [d for d in details if d.startswith("SCAN ") and not d.startswith("SCAN CONSTANT")]
+        if scans:
+            problems.append(f"{name}: {'; '.join(scans)}")
+
+    return problems
+
+
+async def _main(db_path: str, rebuild_rollups: bool = False, rebuild_stats: bool = False) -> int:
+    from .storage import Database
+
+    database = Database(db_path, pool_size=0, write_batch_size=1)
+    await database.connect()
+    try:
+        if rebuild_rollups:
+            rows = await rebuild_daily_rollups(database._connection)
+            print(f"Rebuilt {rows} daily rollups")
+        if rebuild_stats:
+            users = await rebuild_mood_stats(database._connection)
+            print(f"Rebuilt mood stats for {users} users")
+        problems = await check_query_plans(database._connection)
+    finally:
+        await database.close()
+
+    for problem in problems:
+        print(f"TABLE SCAN {problem}")
+    if problems:
+        return 1
+    print(f"OK: {len(HOT_QUERIES)} hot queries use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Миграции и проверка планов запросов")
+    parser.add_argument("db_path", nargs="?", default=":memory:")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="пересобрать daily_rollups")
+    parser.add_argument("--rebuild-mood-stats", action="store_true", help="пересобрать mood_stats")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.db_path, args.rebuild_rollups, args.rebuild_mood_stats)))
@@ -104,11 +104,10 @@ class TributeService:
             await db.set_plan(tg_id, plan_tier, expires_at)
             
             # Логируем платеж
-            await db._connection.execute("""
+            await db.execute_write("""
                 INSERT INTO payments (tg_id, external_id, plan_tier, period, status, expires_at)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (tg_id, external_id, plan_tier, period, "paid", expires_at))
-            await db._connection.commit()
             
             logger.info(f"Payment processed for user {tg_id}: {plan_tier} {period} until {expires_at}")
             return True
@@ -131,7 +130,7 @@ class TributeService:
         """Получает историю платежей пользователя."""
         from ..storage import db
         
-        async with db._connection.execute("""
+        async with db.read() as conn, conn.execute("""
             SELECT external_id, plan_tier, period, status, created_at, expires_at
             FROM payments 
             WHERE tg_id = ? 
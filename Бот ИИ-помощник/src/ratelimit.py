@@ -0,0 +1,45 @@
+"""Примитивы ограничения скорости."""
+import time
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity.
+
+    Токены можно брать в долг: следующий запрос подождет, пока долг
+    не погасится. Так параллельные воркеры получают разнесенные по
+    времени слоты, а не одновременный всплеск.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float = 1.0) -> float:
+        """Сколько секунд ждать, пока накопится amount токенов."""
+        self._refill()
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Забирает токены (возможно, в долг) и возвращает время ожидания."""
+        wait = self.delay(amount)
+        self.tokens -= amount
+        return wait
+
+    def refund(self, amount: float) -> None:
+        """Возвращает неиспользованные токены (или списывает перерасход)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдает токены ближайшие seconds секунд (RetryAfter)."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
@@ -1,91 +1,164 @@
 """Планировщик задач."""
 import asyncio
+import time
+import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set
 
+from .config import config
 from .storage import db
 from .services.gpt import gpt_service
 from .services.memories import memory_service
-from .services.reports import report_service
-from .services.pdf import pdf_service
-from .services.timeutils import time_utils
+from .services.mood_analytics import mood_analytics
+from .services.reminders import ReminderIndex
+from .services.delivery import delivery_queue
+from .services.weekly_pipeline import weekly_pipeline
 from .logger import get_logger
 
 logger = get_logger("scheduler")
 
 
+# Час еженедельного отчета (локальное время пользователя)
+WEEKLY_REPORT_HOUR = 18
+
+# Сколько пропущенных минут догонять, если тик запоздал
+MAX_CATCHUP_MINUTES = 15
+
+
 class SchedulerService:
-    """Сервис планировщика задач."""
+    """Сервис планировщика задач.
+    
+    Вместо отдельных задач на каждого пользователя работает один тик в минуту,
+    который берет из ReminderIndex пользователей с наступившим локальным часом.
+    """
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
-        self.active_jobs = {}  # Хранилище активных задач
+        self.index = ReminderIndex()
+        self._last_tick: Optional[datetime] = None
+        self._dispatches: Set[asyncio.Task] = set()
+        self._reschedule_task: Optional[asyncio.Task] = None
+        self.reschedule_progress: Dict[str, Any] = {"loaded": 0, "total": 0, "done": False, "elapsed": 0.0}
     
     async def start(self):
         """Запускает планировщик."""
+        self.scheduler.add_job(
+            self._tick,
+            CronTrigger(minute="*", timezone=pytz.utc),
+            id="reminder_tick",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=30
+        )
+        # Ночное сворачивание старой памяти в недельные итоги
+        self.scheduler.add_job(
+            self._compact_memories,
+            CronTrigger(hour=config.memory_compaction_hour, minute=30, timezone=pytz.utc),
+            id="memory_compaction",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+        # Ночной пересчет аналитики настроения по всей истории
+        self.scheduler.add_job(
+            self._analyze_moods,
+            CronTrigger(hour=config.mood_analytics_hour, minute=0, timezone=pytz.utc),
+            id="mood_analytics",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
         self.scheduler.start()
         logger.info("Scheduler started")
     
     async def stop(self):
         """Останавливает планировщик."""
         self.scheduler.shutdown()
+        if self._reschedule_task and not self._reschedule_task.done():
+            self._reschedule_task.cancel()
+        for task in list(self._dispatches):
+            task.cancel()
         logger.info("Scheduler stopped")
     
     async def schedule_user_tasks(self, user_id: int):
-        """Планирует задачи для конкретного пользователя."""
+        """Добавляет пользователя в индекс напоминаний."""
         user = await db.get_user(user_id)
         if not user:
             return
         
-        # Удаляем существующие задачи пользователя
-        await self.unschedule_user_tasks(user_id)
-        
-        # Планируем утренний опрос
-        morning_time = time_utils.calculate_next_morning(user.tz, user.morning_hour)
-        self.scheduler.add_job(
-            self._send_morning_reminder,
-            DateTrigger(run_date=morning_time),
-            args=[user_id],
-            id=f"morning_{user_id}",
-            replace_existing=True
-        )
-        
-        # Планируем вечерний опрос
-        evening_time = time_utils.calculate_next_evening(user.tz, user.evening_hour)
-        self.scheduler.add_job(
-            self._send_evening_reminder,
-            DateTrigger(run_date=evening_time),
-            args=[user_id],
-            id=f"evening_{user_id}",
-            replace_existing=True
-        )
-        
-        # Планируем еженедельный отчет
-        weekly_time = time_utils.calculate_next_weekly_report(user.tz, 6, 18)
-        self.scheduler.add_job(
-            self._send_weekly_report,
-            DateTrigger(run_date=weekly_time),
-            args=[user_id],
-            id=f"weekly_{user_id}",
-            replace_existing=True
-        )
-        
-        logger.info(f"Scheduled tasks for user {user_id}")
+        self.index.add(user_id, user.tz, user.morning_hour, user.evening_hour)
+        logger.debug(f"Scheduled tasks for user {user_id}")
     
     async def unschedule_user_tasks(self, user_id: int):
-        """Удаляет задачи пользователя."""
-        job_ids = [f"morning_{user_id}", f"evening_{user_id}", f"weekly_{user_id}"]
+        """Удаляет пользователя из индекса напоминаний."""
+        self.index.remove(user_id)
+        logger.debug(f"Unscheduled tasks for user {user_id}")
+    
+    async def _tick(self):
+        """Раз в минуту находит пользователей, которым пора напомнить."""
+        now = datetime.now(pytz.utc).replace(second=0, microsecond=0)
         
-        for job_id in job_ids:
-            try:
-                self.scheduler.remove_job(job_id)
-            except Exception as e:
-                logger.warning(f"Failed to remove job {job_id}: {e}")
+        # Догоняем минуты, пропущенные из-за задержки цикла событий
+        if self._last_tick and now - self._last_tick <= timedelta(minutes=MAX_CATCHUP_MINUTES):
+            minutes = [self._last_tick + timedelta(minutes=i)
+                       for i in range(1, int((now - self._last_tick).total_seconds() // 60) + 1)]
+        else:
+            minutes = [now]
+        self._last_tick = now
         
-        logger.info(f"Unscheduled tasks for user {user_id}")
+        for minute in minutes:
+            due = self.index.due(minute, config.weekly_weekday, WEEKLY_REPORT_HOUR)
+            for kind, send in (
+                ("morning", self._send_morning_reminder),
+                ("evening", self._send_evening_reminder),
+            ):
+                if due[kind]:
+                    logger.info(f"{len(due[kind])} users due for {kind} at {minute.isoformat()}")
+                    self._spawn(self._dispatch(send, due[kind]))
+            
+            # Еженедельные отчеты когорты идут одной волной через конвейер
+            if due["weekly"]:
+                logger.info(f"{len(due['weekly'])} users due for weekly at {minute.isoformat()}")
+                self._spawn(self._send_weekly_reports(due["weekly"]))
+    
+    async def _compact_memories(self):
+        """Сворачивает старую память всех пользователей."""
+        try:
+            await memory_service.compact_all()
+        except Exception as e:
+            logger.error(f"Memory compaction failed: {e}")
+    
+    async def _analyze_moods(self):
+        """Пересчитывает аналитику настроения всех пользователей."""
+        try:
+            await mood_analytics.analyze_all()
+        except Exception as e:
+            logger.error(f"Mood analytics failed: {e}")
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, send, user_ids: List[int]):
+        """Рассылает напоминания пачками ограниченного размера."""
+        batch_size = config.reminder_batch_size
+        for start in range(0, len(user_ids), batch_size):
+            await asyncio.gather(*(send(user_id) for user_id in user_ids[start:start + batch_size]))
+    
+    async def _send_weekly_reports(self, user_ids: List[int]):
+        """Отправляет еженедельные отчеты когорте пользователей."""
+        if not delivery_queue.running:
+            logger.error("Bot instance not available")
+            return
+        
+        try:
+            await weekly_pipeline.run(user_ids)
+        except Exception as e:
+            logger.error(f"Weekly wave error: {e}")
     
     async def _send_morning_reminder(self, user_id: int):
         """Отправляет утреннее напоминание."""
@@ -96,19 +169,12 @@ class SchedulerService:
                 logger.info(f"Morning entry already exists for user {user_id}")
                 return
             
-            # Получаем бота из глобальной переменной
-            try:
-                from .main import bot
-            except ImportError:
-                # Если не можем импортировать, используем None
-                bot = None
-            
-            if not bot:
+            if not delivery_queue.running:
                 logger.error("Bot instance not available")
                 return
             
             # Отправляем напоминание
-            await bot.send_message(
+            await delivery_queue.send_message(
                 user_id,
                 "🌅 Доброе утро! Время для планирования дня.\n\n"
                 "Нажмите /start или используйте кнопку 'Мой день' для начала опроса."
@@ -128,19 +194,12 @@ class SchedulerService:
                 logger.info(f"Evening entry already exists for user {user_id}")
                 return
             
-            # Получаем бота из глобальной переменной
-            try:
-                from .main import bot
-            except ImportError:
-                # Если не можем импортировать, используем None
-                bot = None
-            
-            if not bot:
+            if not delivery_queue.running:
                 logger.error("Bot instance not available")
                 return
             
             # Отправляем напоминание
-            await bot.send_message(
+            await delivery_queue.send_message(
                 user_id,
                 "🌙 Добрый вечер! Время для рефлексии.\n\n"
                 "Нажмите /start или используйте кнопку 'Мой день' для вечернего опроса."
@@ -151,58 +210,6 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Evening reminder error for user {user_id}: {e}")
     
-    async def _send_weekly_report(self, user_id: int):
-        """Отправляет еженедельный отчет."""
-        try:
-            user = await db.get_user(user_id)
-            if not user:
-                return
-            
-            # Генерируем отчет
-            report = await report_service.generate_weekly_report(user_id, user.persona)
-            
-            # Получаем бота из глобальной переменной
-            try:
-                from .main import bot
-            except ImportError:
-                # Если не можем импортировать, используем None
-                bot = None
-            
-            if not bot:
-                logger.error("Bot instance not available")
-                return
-            
-            # Отправляем отчет
-            await bot.send_message(
-                user_id,
-                f"📊 Ваш еженедельный отчет:\n\n{report}"
-            )
-            
-            # Если пользователь на Ultimate плане, генерируем PDF
-            if user.plan_tier == "ultimate":
-                try:
-                    pdf_path = await pdf_service.generate_weekly_pdf(
-                        user_id=user_id,
-                        user_name=user.tz  # Используем tz как имя пользователя
-                    )
-                    
-                    from aiogram.types import FSInputFile
-                    pdf_file = FSInputFile(pdf_path)
-                    
-                    await bot.send_document(
-                        user_id,
-                        document=pdf_file,
-                        caption="📄 PDF отчет за неделю"
-                    )
-                    
-                except Exception as e:
-                    logger.error(f"PDF generation error for user {user_id}: {e}")
-            
-            logger.info(f"Weekly report sent to user {user_id}")
-            
-        except Exception as e:
-            logger.error(f"Weekly report error for user {user_id}: {e}")
-    
     async def schedule_habit_reminders(self, user_id: int, habit_name: str):
         """Планирует напоминания о привычках."""
         # В реальной реализации здесь была бы логика напоминаний о привычках
@@ -215,21 +222,61 @@ class SchedulerService:
         # Пока это заглушка
         pass
     
+    async def start_background_reschedule(self) -> asyncio.Task:
+        """Запускает загрузку расписаний в фоне, не задерживая старт бота."""
+        if self._reschedule_task is None or self._reschedule_task.done():
+            self._reschedule_task = asyncio.create_task(self.reschedule_all_users())
+        return self._reschedule_task
+    
     async def reschedule_all_users(self):
-        """Перепланирует задачи для всех пользователей."""
+        """Загружает расписания всех пользователей в индекс порциями.
+        
+        Пользователи читаются keyset-пагинацией одним запросом на порцию
+        (только поля расписания), без get_user на каждого. Между порциями
+        цикл событий свободен, поэтому бот отвечает уже во время загрузки.
+        """
         try:
-            # Получаем всех пользователей
-            async with db._connection.execute("SELECT tg_id FROM users") as cursor:
-                users = await cursor.fetchall()
+            # БД подключается в lifespan параллельно с запуском polling;
+            # ждем конца connect(), а не только открытия соединения
+            await db.ready.wait()
             
-            for (user_id,) in users:
-                await self.schedule_user_tasks(user_id)
+            started = time.perf_counter()
+            total = await db.count_users()
+            self.reschedule_progress = {"loaded": 0, "total": total, "done": False, "elapsed": 0.0}
+            logger.info(f"Loading reminder schedules for {total} users")
             
-            logger.info(f"Rescheduled tasks for {len(users)} users")
+            loaded = 0
+            chunks = 0
+            async for rows in db.iter_user_schedules(config.scheduler_startup_chunk):
+                for user_id, tz, morning_hour, evening_hour in rows:
+                    # Пользователь мог обновить настройки, пока шла загрузка
+                    if user_id in self.index:
+                        continue
+                    self.index.add(
+                        user_id,
+                        tz or config.default_tz,
+                        config.morning_hour if morning_hour is None else morning_hour,
+                        config.evening_hour if evening_hour is None else evening_hour
+                    )
+                loaded += len(rows)
+                chunks += 1
+                self.reschedule_progress.update(
+                    loaded=loaded, elapsed=round(time.perf_counter() - started, 3)
+                )
+                if chunks % 10 == 0:
+                    logger.info(f"Reminder schedules loaded: {loaded}/{total}")
+                await asyncio.sleep(0)
+            
+            self.reschedule_progress.update(
+                loaded=loaded, done=True, elapsed=round(time.perf_counter() - started, 3)
+            )
+            logger.info(
+                f"Rescheduled tasks for {loaded} users in "
+                f"{self.reschedule_progress['elapsed']:.2f}s"
+            )
             
         except Exception as e:
             logger.error(f"Reschedule error: {e}")
 
-
 # Глобальный экземпляр планировщика
 scheduler_service = SchedulerService()
@@ -0,0 +1,195 @@
+"""Circuit breaker для внешних вызовов."""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from ..logger import get_logger
+
+logger = get_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Максимальное время в состоянии open при повторных неудачных пробах
+MAX_OPEN_SECONDS = 300.0
+
+
+@dataclass(frozen=True)
+class Permit:
+    """Разрешение на вызов, выданное allow().
+
+    generation - номер состояния breaker на момент выдачи: результат
+    вызова, который завершился уже в другом состоянии, не учитывается.
+    """
+    generation: int
+    probe: bool = False
+
+
+class CircuitBreaker:
+    """Circuit breaker с окном ошибок и задержек.
+
+    closed: вызовы идут, результаты копятся в скользящем окне. Если в окне
+    не меньше min_calls вызовов и доля плохих (ошибка или дольше
+    slow_call_seconds) достигла failure_rate, breaker размыкается.
+    open: вызовы сразу отклоняются. Через open_seconds пропускается
+    проба (half_open); каждая неудачная проба удваивает паузу.
+    half_open: одновременно идет не больше half_open_probes проб, успешная
+    замыкает breaker, неудачная снова размыкает. Решают только результаты
+    самих проб: запоздавшие вызовы, пропущенные еще в closed, не учитываются.
+    """
+
+    def __init__(self, name: str, window_seconds: float = 60.0, min_calls: int = 10,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 10.0,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        # (время, ошибка, задержка)
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at: Optional[float] = None
+        self._open_for = open_seconds
+        self._probes = 0
+        self._generation = 0
+        self._changed_at = time.monotonic()
+        # Срабатывает при смене состояния и при освобождении пробы;
+        # после срабатывания заменяется новым
+        self.changed = asyncio.Event()
+
+        # Метрики
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def available(self) -> bool:
+        """Можно ли сейчас рассчитывать на вызов (без захвата пробы)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() >= self._opened_at + self._open_for
+        return self._probes < self.half_open_probes
+
+    @property
+    def retry_in(self) -> float:
+        """Секунд до следующей пробы в состоянии open."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def allow(self) -> Optional[Permit]:
+        """Решает, пропустить ли вызов.
+
+        Возвращает Permit или None; с выданным Permit вызов обязан вызвать
+        record_*.
+        """
+        if self.state == OPEN and self.retry_in == 0:
+            self._transition(HALF_OPEN)
+
+        if self.state == CLOSED:
+            return Permit(self._generation)
+        if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return Permit(self._generation, probe=True)
+
+        self.rejected += 1
+        return None
+
+    def record_success(self, permit: Permit, latency: float) -> None:
+        """Учитывает успешный вызов."""
+        if permit.generation != self._generation:
+            return
+        if permit.probe:
+            self._probes -= 1
+            if latency < self.slow_call_seconds:
+                self._open_for = self.open_seconds
+                self._transition(CLOSED)
+            else:
+                self._open()
+            return
+        self._record(False, latency)
+
+    def record_failure(self, permit: Permit, latency: float = 0.0) -> None:
+        """Учитывает неудачный вызов."""
+        if permit.generation != self._generation:
+            return
+        if permit.probe:
+            self._probes -= 1
+            self._open_for = min(MAX_OPEN_SECONDS, self._open_for * 2)
+            self._open()
+            return
+        self._record(True, latency)
+
+    def record_cancelled(self, permit: Permit) -> None:
+        """Освобождает пробу, если вызов отменили до результата."""
+        if permit.probe and permit.generation == self._generation:
+            self._probes -= 1
+            self._notify()
+
+    def trip(self) -> None:
+        """Принудительно размыкает breaker (например, проверка при старте не прошла)."""
+        if self.state != OPEN:
+            self._open()
+
+    def _is_bad(self, error: bool, latency: float) -> bool:
+        return error or latency >= self.slow_call_seconds
+
+    def _record(self, error: bool, latency: float) -> None:
+        now = time.monotonic()
+        self._calls.append((now, error, latency))
+        self._prune(now)
+
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            bad = sum(1 for _, call_error, call_latency in self._calls if self._is_bad(call_error, call_latency))
+            if bad / len(self._calls) >= self.failure_rate:
+                self._open()
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        previous, self.state = self.state, state
+        self._generation += 1
+        self._changed_at = time.monotonic()
+        if state == CLOSED:
+            self._calls.clear()
+        if state != HALF_OPEN:
+            self._probes = 0
+        self._notify()
+        logger.warning(f"Circuit breaker {self.name}: {previous} -> {state}")
+
+    def _notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние и показатели окна."""
+        self._prune(time.monotonic())
+        total = len(self._calls)
+        errors = sum(1 for _, error, _ in self._calls if error)
+        slow = sum(1 for _, error, latency in self._calls if not error and latency >= self.slow_call_seconds)
+        latencies = sorted(latency for _, error, latency in self._calls if not error)
+        return {
+            "state": self.state,
+            "in_state_s": round(time.monotonic() - self._changed_at, 1),
+            "retry_in_s": round(self.retry_in, 1),
+            "window_calls": total,
+            "error_rate": round(errors / total, 3) if total else 0.0,
+            "slow_rate": round(slow / total, 3) if total else 0.0,
+            "p95_latency_s": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
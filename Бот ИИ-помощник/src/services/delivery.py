@@ -0,0 +1,263 @@
+"""Очередь исходящих сообщений Telegram с ограничением скорости."""
+import asyncio
+import contextvars
+import itertools
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendDocument, SendMessage, TelegramMethod
+
+from ..cache import TTLCache, MISSING
+from ..ratelimit import TokenBucket
+from ..config import config
+from ..logger import get_logger
+
+logger = get_logger("delivery")
+
+# Приоритеты доставки (меньше - раньше)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BROADCAST = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BROADCAST: "broadcast"}
+
+# Окно для расчета пропускной способности в секундах
+THROUGHPUT_WINDOW = 60.0
+
+# Запросы из воркеров очереди уже прошли лимиты
+_from_queue: contextvars.ContextVar[bool] = contextvars.ContextVar("delivery_from_queue", default=False)
+
+
+class DeliveryDropped(Exception):
+    """Сообщение не принято в очередь доставки."""
+
+
+@dataclass(order=True)
+class _Delivery:
+    """Элемент очереди доставки."""
+    priority: int
+    seq: int
+    method: TelegramMethod = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class DeliveryQueue:
+    """Очередь исходящих сообщений с глобальным и поканальным лимитами.
+
+    Воркеры берут сообщения по приоритету, ждут слот в глобальном
+    token bucket (~30 сообщений/с) и в bucket чата (1 сообщение/с).
+    Сообщение, чей чат еще не готов, откладывается, не блокируя воркер.
+    RetryAfter ставит чат на паузу на указанное Telegram время, сетевые
+    ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.chat_rate = chat_rate or config.delivery_chat_rate
+        self.workers = workers or config.delivery_workers
+        self.max_size = max_size or config.delivery_queue_size
+        self.max_retries = config.delivery_max_retries if max_retries is None else max_retries
+        self.bot: Optional[Bot] = None
+
+        self._global = TokenBucket(global_rate or config.delivery_global_rate)
+        # Простаивающий bucket полон, поэтому вытеснение из кэша ничего не теряет
+        self._chats = TTLCache(maxsize=100_000, ttl=THROUGHPUT_WINDOW)
+        self._queue: "asyncio.PriorityQueue[_Delivery]" = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._delayed = 0
+
+        # Метрики
+        self.sent: Dict[str, int] = defaultdict(int)
+        self.dropped: Dict[str, int] = defaultdict(int)
+        self.retries = 0
+        self.retry_after = 0
+        self._sent_times: deque = deque()
+        self._wait_total = 0.0
+        self._wait_count = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def pending(self) -> int:
+        """Сообщения в очереди, включая отложенные."""
+        return self._queue.qsize() + self._delayed
+
+    def start(self, bot: Bot) -> None:
+        """Запускает воркеры и подключает учет ответов хендлеров."""
+        if self._tasks:
+            return
+
+        self.bot = bot
+        bot.session.middleware(DeliveryRateMiddleware(self))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Delivery queue started ({self.workers} workers)")
+
+    async def stop(self) -> None:
+        """Останавливает воркеры."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Delivery queue stopped ({self.pending} messages pending)")
+
+    def submit(self, method: TelegramMethod, priority: int = PRIORITY_BROADCAST) -> asyncio.Future:
+        """Ставит запрос в очередь; результат - future с ответом Telegram."""
+        future = asyncio.get_running_loop().create_future()
+
+        if priority != PRIORITY_INTERACTIVE and self.pending >= self.max_size:
+            self.dropped["queue_full"] += 1
+            future.set_exception(DeliveryDropped(f"Delivery queue is full ({self.max_size})"))
+            return future
+
+        self._queue.put_nowait(_Delivery(priority, next(self._seq), method, future, time.monotonic()))
+        return future
+
+    async def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_BROADCAST, **kwargs) -> Any:
+        """Отправляет сообщение через очередь."""
+        return await self.submit(SendMessage(chat_id=chat_id, text=text, **kwargs), priority)
+
+    async def send_document(self, chat_id: int, document: Any, priority: int = PRIORITY_BROADCAST, **kwargs) -> Any:
+        """Отправляет документ через очередь."""
+        return await self.submit(SendDocument(chat_id=chat_id, document=document, **kwargs), priority)
+
+    def reserve_interactive(self, chat_id: int) -> None:
+        """Учитывает ответ хендлера: он уходит сразу, а рассылка уступает ему слоты."""
+        self._global.reserve()
+        self._chat_bucket(chat_id).reserve()
+        self._record_sent(PRIORITY_INTERACTIVE)
+
+    def pause_chat(self, chat_id: int, seconds: float) -> None:
+        """Ставит чат на паузу после RetryAfter."""
+        self.retry_after += 1
+        bucket = self._chat_bucket(chat_id)
+        bucket.pause(seconds)
+        self._chats.set(chat_id, bucket, ttl=seconds + THROUGHPUT_WINDOW)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is MISSING:
+            bucket = TokenBucket(self.chat_rate)
+            self._chats.set(chat_id, bucket)
+        return bucket
+
+    async def _worker(self) -> None:
+        _from_queue.set(True)
+        while True:
+            item = await self._queue.get()
+            if item.future.done():
+                continue
+
+            chat_id = getattr(item.method, "chat_id", None)
+            if chat_id is not None:
+                bucket = self._chat_bucket(chat_id)
+                wait = bucket.delay()
+                if wait > 0:
+                    self._requeue(item, wait)
+                    continue
+                bucket.reserve()
+
+            wait = self._global.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                result = await self.bot(item.method)
+            except TelegramRetryAfter as e:
+                if chat_id is not None:
+                    self.pause_chat(chat_id, e.retry_after)
+                else:
+                    self.retry_after += 1
+                    self._global.pause(e.retry_after)
+                self.retries += 1
+                self._requeue(item, e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if item.attempts >= self.max_retries:
+                    self._fail(item, e, "failed")
+                else:
+                    item.attempts += 1
+                    self.retries += 1
+                    self._requeue(item, min(30.0, 2 ** item.attempts) * random.uniform(0.5, 1.0))
+            except Exception as e:
+                self._fail(item, e, "rejected")
+            else:
+                self._wait_total += time.monotonic() - item.enqueued
+                self._wait_count += 1
+                self._record_sent(item.priority)
+                item.future.set_result(result)
+
+    def _requeue(self, item: _Delivery, delay: float) -> None:
+        self._delayed += 1
+        asyncio.get_running_loop().call_later(delay, self._put_back, item)
+
+    def _put_back(self, item: _Delivery) -> None:
+        self._delayed -= 1
+        if not item.future.done():
+            self._queue.put_nowait(item)
+
+    def _fail(self, item: _Delivery, error: Exception, reason: str) -> None:
+        self.dropped[reason] += 1
+        logger.warning(f"Delivery {reason} for chat {getattr(item.method, 'chat_id', None)}: {error}")
+        if not item.future.done():
+            item.future.set_exception(error)
+
+    def _record_sent(self, priority: int) -> None:
+        now = time.monotonic()
+        self.sent[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        self._sent_times.append(now)
+        while self._sent_times and self._sent_times[0] < now - THROUGHPUT_WINDOW:
+            self._sent_times.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает метрики очереди доставки."""
+        now = time.monotonic()
+        while self._sent_times and self._sent_times[0] < now - THROUGHPUT_WINDOW:
+            self._sent_times.popleft()
+
+        return {
+            "running": self.running,
+            "pending": self.pending,
+            "sent": dict(self.sent),
+            "throughput_per_sec": round(len(self._sent_times) / THROUGHPUT_WINDOW, 2),
+            "avg_queue_wait_ms": round(self._wait_total / self._wait_count * 1000, 1) if self._wait_count else 0.0,
+            "retries": self.retries,
+            "retry_after": self.retry_after,
+            "dropped": dict(self.dropped),
+        }
+
+
+class DeliveryRateMiddleware(BaseRequestMiddleware):
+    """Учитывает прямые ответы хендлеров в лимитах очереди доставки."""
+
+    def __init__(self, queue: DeliveryQueue):
+        self.queue = queue
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        chat_id = getattr(method, "chat_id", None)
+        if _from_queue.get() or chat_id is None:
+            return await make_request(bot, method)
+
+        self.queue.reserve_interactive(chat_id)
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            self.queue.pause_chat(chat_id, e.retry_after)
+            raise
+
+
+# Глобальный экземпляр очереди доставки
+delivery_queue = DeliveryQueue()
@@ -1,13 +1,21 @@
 """Сервис для анализа эмоций и настроения."""
-import re
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional
 from ..logger import get_logger
+from .lexicon import LexiconMatcher
+from .stemmer import stem
 
 logger = get_logger("emotion")
 
 
 class EmotionService:
-    """Сервис для анализа эмоций в тексте."""
+    """Сервис для анализа эмоций в тексте.
+    
+    Словари компилируются в LexiconMatcher при первом анализе. Слова
+    шаблонов и текста сводятся к основам стеммером, поэтому совпадают
+    любые формы слова («устал» - «устала», «не успеваю» - «не успевала»).
+    """
+    
+    _matcher: Optional[LexiconMatcher] = None
     
     # Эмоциональные слова и их веса
     POSITIVE_WORDS = {
@@ -36,36 +44,45 @@ class EmotionService:
         'не успеваю': 3, 'не хватает': 2, 'слишком': 1
     }
     
+    @classmethod
+    def matcher(cls) -> LexiconMatcher:
+        """Скомпилированные словари (строятся один раз)."""
+        if cls._matcher is None:
+            cls._matcher = LexiconMatcher(
+                {"+": cls.POSITIVE_WORDS, "-": cls.NEGATIVE_WORDS, "!": cls.STRESS_INDICATORS},
+                normalize=stem
+            )
+            logger.info(f"Compiled emotion lexicon: {cls._matcher.size} patterns")
+        return cls._matcher
+    
     @classmethod
     def score_text(cls, text: str) -> Dict[str, Any]:
         """Анализирует эмоциональную окраску текста."""
         if not text:
             return {"polarity": 0, "stress": 0, "keywords": []}
         
-        text_lower = text.lower()
-        words = re.findall(r'\b\w+\b', text_lower)
+        # Из совпадений, начинающихся с одного слова, в категории берем самое
+        # длинное: «плохой» засчитывается один раз, а не как «плохо» и «плохой»
+        best: Dict[tuple, tuple] = {}
+        for start, (category, pattern, weight) in cls.matcher().find(text):
+            key = (category, start)
+            if key not in best or len(pattern) > len(best[key][0]):
+                best[key] = (pattern, weight)
         
         polarity_score = 0
         stress_score = 0
         keywords = []
-        
-        # Анализ позитивных слов
-        for word, weight in cls.POSITIVE_WORDS.items():
-            if word in text_lower:
-                polarity_score += weight
-                keywords.append(f"+{word}")
-        
-        # Анализ негативных слов
-        for word, weight in cls.NEGATIVE_WORDS.items():
-            if word in text_lower:
-                polarity_score += weight
-                keywords.append(f"-{word}")
-        
-        # Анализ стресса
-        for word, weight in cls.STRESS_INDICATORS.items():
-            if word in text_lower:
+        seen = set()
+        for (category, _), (pattern, weight) in sorted(best.items(), key=lambda item: "+-!".index(item[0][0])):
+            # Каждое слово словаря учитывается один раз, сколько бы раз ни встретилось
+            if (category, pattern) in seen:
+                continue
+            seen.add((category, pattern))
+            if category == "!":
                 stress_score += weight
-                keywords.append(f"!{word}")
+            else:
+                polarity_score += weight
+            keywords.append(f"{category}{pattern}")
         
         # Нормализация polarity (-5 до +5)
         polarity = max(-5, min(5, polarity_score))
@@ -79,6 +96,18 @@ class EmotionService:
             "keywords": keywords[:10]  # Ограничиваем количество ключевых слов
         }
     
+    @classmethod
+    def score_many(cls, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Анализирует пачку текстов; одинаковые тексты анализируются один раз."""
+        scores: Dict[str, Dict[str, Any]] = {}
+        results = []
+        for text in texts:
+            if text not in scores:
+                scores[text] = cls.score_text(text)
+            # Копия, чтобы изменение одного результата не задевало дубликаты
+            results.append(dict(scores[text], keywords=list(scores[text]["keywords"])))
+        return results
+    
     @classmethod
     def analyze_mood_pattern(cls, mood_history: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Анализирует паттерны настроения."""
@@ -4,69 +4,350 @@ import json
 import re
 import uuid
 import hashlib
-from typing import Dict, List, Any, Optional
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import aclosing
+from typing import AsyncIterator, Deque, Dict, List, Any, Optional, Tuple
 from openai import AsyncOpenAI
 import httpx
 
 from ..config import config
 from ..logger import get_logger
+from .gpt_cache import ResponseCache, request_key
+from .gpt_scheduler import GPTScheduler, PRIORITIES, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from .circuit_breaker import CircuitBreaker, CLOSED, OPEN
+from .prompts import PromptBuilder, token_counter
 
 logger = get_logger("gpt")
 
+class CircuitOpenError(Exception):
+    """Запрос отклонен: circuit breaker OpenAI разомкнут."""
+
+
+# Ответ, когда OpenAI недоступен
+UNAVAILABLE_TEXT = "ИИ временно недоступен. Попробуйте позже."
+
+# Сколько последних замеров времени до первого фрагмента хранить
+TTFB_SAMPLES = 500
+
+# Сколько последних задержек OpenAI учитывать при выборе порога дублирования
+LATENCY_SAMPLES = 200
+
+# Статические инструкции методов: идут первыми и не зависят от пользователя,
+# чтобы OpenAI мог переиспользовать кэш префикса промпта
+REFLECT_DIALOG_INSTRUCTIONS = """Ты - персональный ассистент в боте для планирования и саморефлексии.
+Отвечай в стиле персоны, указанной в сообщении пользователя, с учетом его профиля,
+состояния и контекста из памяти.
+Дай 1 конкретный следующий шаг. Будь поддерживающим и практичным.
+Максимум 2-6 строк."""
+
+PLAN_MORNING_INSTRUCTIONS = """Ты - персональный ассистент в боте для планирования. Помоги спланировать день.
+Говори в стиле персоны, указанной в сообщении пользователя.
+Дай краткий план дня (3-4 пункта) с учетом энергии и приоритетов.
+Будь практичным и мотивирующим."""
+
+REFLECT_EVENING_INSTRUCTIONS = """Ты - персональный ассистент в боте для саморефлексии. Проведи вечернюю рефлексию.
+Говори в стиле персоны, указанной в сообщении пользователя.
+Дай краткую рефлексию (3-4 предложения) с выводами и советами на завтра."""
+
+WEEKLY_REPORT_INSTRUCTIONS = """Ты - персональный ассистент в боте для планирования. Создай еженедельный отчет.
+Говори в стиле персоны, указанной в сообщении пользователя.
+Создай краткий отчет (5-6 предложений) с выводами и рекомендациями."""
+
+SUMMARIZE_MEMORIES_INSTRUCTIONS = """Ты сворачиваешь дневник пользователя в краткие итоги периода.
+По записям за период напиши 3-5 предложений: главные цели и дела, что получилось и что нет,
+настроение и энергия, важные выводы и повторяющиеся темы.
+Пиши от третьего лица, без оценок и советов, только факты из записей."""
+
+SUMMARIZE_DIALOG_INSTRUCTIONS = """Ты сохраняешь суть разговора пользователя с ассистентом в память.
+Перескажи диалог в 1-3 предложениях: вопрос пользователя, ключевая мысль ответа и
+договоренности о следующих шагах."""
+
+# Время жизни закэшированных ответов по методам в секундах (0 - не кэшировать)
+CACHE_TTLS = {
+    "build_profile": 24 * 3600,
+    "weekly_report": 6 * 3600,
+    "plan_morning": 30 * 60,
+    "reflect_evening": 30 * 60,
+    "reflect_dialog": 5 * 60,
+}
+
 
 class GPTService:
     """Сервис для работы с OpenAI API."""
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=config.openai_api_key)
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = client or AsyncOpenAI(api_key=config.openai_api_key)
         self.timeout = config.openai_timeout
         self.retries = config.openai_retries
         self.model = config.openai_model
-        self.gpt_available = True
         self.last_response_hash = None
+        self.breaker = CircuitBreaker(
+            "openai",
+            window_seconds=config.gpt_breaker_window,
+            min_calls=config.gpt_breaker_min_calls,
+            failure_rate=config.gpt_breaker_failure_rate,
+            slow_call_seconds=config.gpt_breaker_slow_seconds,
+            open_seconds=config.gpt_breaker_open_seconds
+        )
+        self._prober: Optional[asyncio.Task] = None
+        self.cache = ResponseCache(config.gpt_cache_size, config.gpt_cache_path)
+        # Идущие вызовы по (ключ запроса, приоритет)
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.scheduler = GPTScheduler(
+            max_concurrency=config.gpt_max_concurrency,
+            reserved_interactive=config.gpt_reserved_interactive,
+            tokens_per_minute=config.gpt_tokens_per_minute
+        )
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+        # Фактический расход токенов по методам
+        self.token_usage: Dict[str, Counter] = defaultdict(Counter)
+        # Задержки успешных вызовов OpenAI для порога дублирования
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        # Время до первого фрагмента ответа: потоковые и обычные запросы
+        self._ttfb: Dict[str, Deque[float]] = {
+            "stream": deque(maxlen=TTFB_SAMPLES),
+            "blocking": deque(maxlen=TTFB_SAMPLES),
+        }
         
+    @property
+    def gpt_available(self) -> bool:
+        """Доступен ли OpenAI по мнению circuit breaker."""
+        return self.breaker.available
+    
     async def health_check(self) -> bool:
         """Проверяет доступность OpenAI API."""
         try:
             import time
             start_time = time.time()
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=10,
-                timeout=5
+            await self._call_upstream(
+                [{"role": "user", "content": "Hi"}], max_tokens=10, timeout=5
             )
             latency = int((time.time() - start_time) * 1000)
             logger.info(f"OpenAI OK: {self.model}, {latency}ms")
-            self.gpt_available = True
             return True
         except Exception as e:
             logger.error(f"OpenAI health check failed: {e}")
-            self.gpt_available = False
+            # Не ждем накопления окна: сразу размыкаем и восстанавливаемся пробами
+            self.breaker.trip()
+            self._ensure_prober()
             return False
     
+    async def _call_upstream(self, messages: List[Dict[str, str]], max_tokens: int,
+                             temperature: Optional[float] = None, timeout: Optional[float] = None,
+                             priority: str = PRIORITY_INTERACTIVE, estimated_tokens: int = 0) -> Any:
+        """Один вызов OpenAI через лимитер и circuit breaker."""
+        if not self.breaker.available:
+            self.breaker.rejected += 1
+            raise CircuitOpenError("OpenAI circuit is open")
+        
+        # Слот и бюджет токенов занимаются на каждую попытку
+        async with self.scheduler.slot(priority, estimated_tokens):
+            # Пока ждали слот, breaker мог разомкнуться
+            permit = self.breaker.allow()
+            if permit is None:
+                raise CircuitOpenError("OpenAI circuit is open")
+            
+            start_time = time.monotonic()
+            kwargs = {"temperature": temperature, "top_p": 0.9} if temperature is not None else {}
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    timeout=timeout or self.timeout,
+                    **kwargs
+                )
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled(permit)
+                raise
+            except Exception:
+                self.breaker.record_failure(permit, time.monotonic() - start_time)
+                self._ensure_prober()
+                raise
+        
+        latency = time.monotonic() - start_time
+        self.breaker.record_success(permit, latency)
+        self._latencies.append(latency)
+        self._ensure_prober()
+        self.scheduler.settle(estimated_tokens, self._usage_tokens(getattr(response, "usage", None)))
+        return response
+    
+    def _hedge_delay(self, priority: str) -> Optional[float]:
+        """Через сколько секунд дублировать запрос; None - не дублировать."""
+        if (not config.gpt_hedge_enabled or priority != PRIORITY_INTERACTIVE
+                or len(self._latencies) < config.gpt_hedge_min_samples):
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * config.gpt_hedge_quantile))]
+    
+    async def _hedged_call(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                           timeout: float, priority: str, estimated_tokens: int) -> Any:
+        """Вызов OpenAI с дублем: если ответа нет дольше p95, отправляется второй запрос.
+        
+        Побеждает первый успешный ответ, проигравший отменяется.
+        """
+        def call() -> Any:
+            return self._call_upstream(
+                messages, max_tokens, temperature=temperature, timeout=timeout,
+                priority=priority, estimated_tokens=estimated_tokens
+            )
+        
+        hedge_after = self._hedge_delay(priority)
+        if hedge_after is None:
+            return await call()
+        
+        primary = asyncio.create_task(call())
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done and self.breaker.state == CLOSED:
+                self.hedged += 1
+                pending.add(asyncio.create_task(call()))
+            
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            
+            if error is None:
+                # Первичный запрос завершился еще до порога дублирования
+                return primary.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _ensure_prober(self) -> None:
+        """Запускает фоновые пробы, пока breaker разомкнут."""
+        if self.breaker.state != OPEN or (self._prober and not self._prober.done()):
+            return
+        try:
+            self._prober = asyncio.get_running_loop().create_task(self._probe_until_closed())
+        except RuntimeError:
+            # Нет цикла событий: проба случится при следующем запросе
+            pass
+    
+    async def _probe_until_closed(self) -> None:
+        """Проверяет OpenAI легким запросом, пока breaker не замкнется."""
+        while self.breaker.state != CLOSED:
+            # Ждем не по таймеру, а смены состояния: в half_open чужая проба
+            # может идти до slow_call_seconds
+            changed = self.breaker.changed
+            if self.breaker.state == OPEN:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=self.breaker.retry_in)
+                except asyncio.TimeoutError:
+                    pass
+            elif not self.breaker.available:
+                await changed.wait()
+            if self.breaker.state == CLOSED:
+                break
+            try:
+                await self._call_upstream([{"role": "user", "content": "ping"}], max_tokens=1, timeout=5)
+                logger.info("OpenAI probe succeeded")
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                logger.warning(f"OpenAI probe failed: {e}")
+    
     async def _make_request(self, messages: List[Dict[str, str]], 
                           temperature: float = 0.7, 
-                          max_tokens: int = 500) -> str:
-        """Выполняет запрос к OpenAI с retry логикой."""
+                          max_tokens: int = 500,
+                          method: str = "default",
+                          priority: str = PRIORITY_INTERACTIVE,
+                          budget: Optional[float] = None) -> str:
+        """Выполняет запрос к OpenAI с retry логикой.
+        
+        budget - секунды на весь вызов, включая повторы; по истечении
+        возвращается ответ о недоступности.
+        """
         if not self.gpt_available:
-            return "ИИ временно недоступен. Попробуйте позже."
-            
+            return UNAVAILABLE_TEXT
+        deadline = time.monotonic() + budget if budget else None
+        
+        # Одинаковые запросы отдаем из кэша
+        cache_ttl = CACHE_TTLS.get(method, 0)
+        cache_key = request_key(self.model, messages, temperature, max_tokens)
+        if cache_ttl:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"GPT cache hit for {method}")
+                return cached
+        
+        # Одновременные одинаковые запросы ждут один вызов OpenAI
+        task = self._joinable(cache_key, priority)
+        if task is None:
+            task = asyncio.create_task(
+                self._fetch(messages, temperature, max_tokens, cache_key, cache_ttl, priority, deadline, method)
+            )
+            flight_key = (cache_key, priority)
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(flight_key, None))
+        else:
+            self.coalesced += 1
+            logger.info(f"GPT request for {method} coalesced with an in-flight call")
+        
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        started = time.monotonic()
+        try:
+            # У присоединившегося к чужому запросу свой бюджет
+            content = await asyncio.wait_for(asyncio.shield(task), self._remaining(deadline))
+        except asyncio.TimeoutError:
+            self.budget_exhausted += 1
+            logger.warning(f"GPT request for {method} exceeded its {budget}s budget")
+            return UNAVAILABLE_TEXT
+        # Без потока первый фрагмент - это весь ответ
+        self._ttfb["blocking"].append(time.monotonic() - started)
+        return content
+    
+    def _joinable(self, cache_key: str, priority: str) -> Optional[asyncio.Task]:
+        """Идущий такой же вызов, к которому можно присоединиться.
+        
+        Присоединяемся только к вызову не ниже своего приоритета: иначе
+        интерактивный запрос ждал бы слот в очереди фоновых.
+        """
+        if priority not in PRIORITIES:
+            priority = PRIORITY_INTERACTIVE
+        for level in PRIORITIES[:PRIORITIES.index(priority) + 1]:
+            task = self._in_flight.get((cache_key, level))
+            if task is not None:
+                return task
+        return None
+    
+    async def _fetch(self, messages: List[Dict[str, str]], temperature: float,
+                     max_tokens: int, cache_key: str, cache_ttl: float, priority: str,
+                     deadline: Optional[float] = None, method: str = "default") -> str:
+        """Выполняет запрос к OpenAI с повторами и кладет ответ в кэш."""
+        self.upstream_calls += 1
         request_id = str(uuid.uuid4())[:8]
-        logger.info(f"GPT request {request_id}: {len(messages)} messages")
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        logger.info(f"GPT request {request_id}: {method}, ~{estimated_tokens - max_tokens} prompt tokens, {priority}")
         
         for attempt in range(self.retries):
+            remaining = self._remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                self.budget_exhausted += 1
+                logger.warning(f"OpenAI request {request_id}: budget exhausted")
+                return UNAVAILABLE_TEXT
             try:
-                import time
                 start_time = time.time()
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    top_p=0.9,
-                    timeout=self.timeout
-                )
+                # Попытка не может пережить бюджет вызова
+                async with asyncio.timeout(remaining):
+                    response = await self._hedged_call(
+                        messages, max_tokens, temperature,
+                        timeout=self.timeout if remaining is None else min(self.timeout, remaining),
+                        priority=priority, estimated_tokens=estimated_tokens
+                    )
                 
                 latency = int((time.time() - start_time) * 1000)
                 content = response.choices[0].message.content.strip()
@@ -81,16 +362,220 @@ class GPTService:
                 
                 self.last_response_hash = response_hash
                 logger.info(f"GPT response {request_id}: {latency}ms, {len(content)} chars")
+                self._record_usage(method, messages, getattr(response, "usage", None), latency / 1000)
+                await self.cache.set(cache_key, content, cache_ttl, latency / 1000)
                 return content
             
+            except CircuitOpenError:
+                # Заведомо неработающий API не ждем
+                logger.warning(f"OpenAI request {request_id} rejected: circuit open")
+                return UNAVAILABLE_TEXT
+            
             except Exception as e:
-                logger.error(f"OpenAI request {request_id} failed (attempt {attempt + 1}): {e}")
-                if attempt == self.retries - 1:
-                    self.gpt_available = False
-                    return "ИИ временно недоступен. Попробуйте позже."
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+                logger.error(f"OpenAI request {request_id} failed (attempt {attempt + 1}): {e!r}")
+                backoff = 2 ** attempt
+                if attempt == self.retries - 1 or not self.breaker.available:
+                    return UNAVAILABLE_TEXT
+                remaining = self._remaining(deadline)
+                if remaining is not None and remaining <= backoff:
+                    # Повтор все равно не уложится в бюджет
+                    self.budget_exhausted += 1
+                    return UNAVAILABLE_TEXT
+                await asyncio.sleep(backoff)  # Exponential backoff
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Остаток бюджета в секундах; None - бюджет не задан."""
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
     
-    async def build_profile(self, answers_10q: List[str]) -> Dict[str, Any]:
+    async def _stream_upstream(self, messages: List[Dict[str, str]], max_tokens: int,
+                               temperature: float, timeout: Optional[float] = None,
+                               priority: str = PRIORITY_INTERACTIVE,
+                               estimated_tokens: int = 0, method: str = "default") -> AsyncIterator[str]:
+        """Потоковый вызов OpenAI через лимитер и circuit breaker."""
+        if not self.breaker.available:
+            self.breaker.rejected += 1
+            raise CircuitOpenError("OpenAI circuit is open")
+        
+        # Слот держится, пока поток не дочитан
+        async with self.scheduler.slot(priority, estimated_tokens):
+            permit = self.breaker.allow()
+            if permit is None:
+                raise CircuitOpenError("OpenAI circuit is open")
+            
+            start_time = time.monotonic()
+            first_chunk: Optional[float] = None
+            usage = None
+            stream = None
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=0.9,
+                    timeout=timeout or self.timeout,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage
+                    piece = chunk.choices[0].delta.content if chunk.choices else None
+                    if piece:
+                        if first_chunk is None:
+                            first_chunk = time.monotonic() - start_time
+                        yield piece
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.record_cancelled(permit)
+                if stream is not None and hasattr(stream, "close"):
+                    # Закрываем HTTP-ответ, чтобы OpenAI не генерировал впустую
+                    await stream.close()
+                raise
+            except Exception:
+                self.breaker.record_failure(permit, time.monotonic() - start_time)
+                self._ensure_prober()
+                raise
+        
+        # Медленным поток считается по ожиданию первого фрагмента
+        self.breaker.record_success(permit, first_chunk if first_chunk is not None else time.monotonic() - start_time)
+        self._ensure_prober()
+        self.scheduler.settle(estimated_tokens, self._usage_tokens(usage))
+        self._record_usage(method, messages, usage, time.monotonic() - start_time)
+    
+    async def stream_request(self, messages: List[Dict[str, str]],
+                             temperature: float = 0.7,
+                             max_tokens: int = 500,
+                             method: str = "default",
+                             priority: str = PRIORITY_INTERACTIVE,
+                             budget: Optional[float] = None) -> AsyncIterator[str]:
+        """Выполняет запрос к OpenAI, отдавая ответ по мере генерации.
+        
+        Ответ из кэша или от уже идущего такого же запроса отдается
+        одним фрагментом. Повтор возможен только до первого фрагмента:
+        после него обрыв завершает ответ пометкой о недоступности.
+        budget ограничивает ожидание первого фрагмента, включая повторы.
+        """
+        started = time.monotonic()
+        deadline = started + budget if budget else None
+        if not self.gpt_available:
+            yield UNAVAILABLE_TEXT
+            return
+        
+        cache_ttl = CACHE_TTLS.get(method, 0)
+        cache_key = request_key(self.model, messages, temperature, max_tokens)
+        if cache_ttl:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"GPT cache hit for {method}")
+                yield cached
+                return
+        
+        task = self._joinable(cache_key, priority)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"GPT stream for {method} coalesced with an in-flight call")
+            try:
+                yield await asyncio.wait_for(asyncio.shield(task), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self.budget_exhausted += 1
+                yield UNAVAILABLE_TEXT
+            return
+        
+        self.upstream_calls += 1
+        request_id = str(uuid.uuid4())[:8]
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        logger.info(f"GPT stream {request_id}: {method}, ~{estimated_tokens - max_tokens} prompt tokens, {priority}")
+        
+        for attempt in range(self.retries):
+            parts: List[str] = []
+            remaining = self._remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                self.budget_exhausted += 1
+                logger.warning(f"OpenAI stream {request_id}: budget exhausted")
+                yield UNAVAILABLE_TEXT
+                return
+            try:
+                async with aclosing(self._stream_upstream(
+                    messages, max_tokens, temperature,
+                    timeout=self.timeout if remaining is None else min(self.timeout, remaining),
+                    priority=priority, estimated_tokens=estimated_tokens, method=method
+                )) as chunks:
+                    # Бюджет - на первый фрагмент: дальше ответ уже виден пользователю
+                    piece = await asyncio.wait_for(anext(chunks, None), remaining)
+                    while piece is not None:
+                        if not parts:
+                            self._ttfb["stream"].append(time.monotonic() - started)
+                        parts.append(piece)
+                        yield piece
+                        piece = await anext(chunks, None)
+            
+            except CircuitOpenError:
+                logger.warning(f"OpenAI stream {request_id} rejected: circuit open")
+                yield UNAVAILABLE_TEXT
+                return
+            
+            except Exception as e:
+                logger.error(f"OpenAI stream {request_id} failed (attempt {attempt + 1}): {e!r}")
+                if parts:
+                    # Часть ответа уже показана - повтор ее продублирует
+                    yield f"\n\n{UNAVAILABLE_TEXT}"
+                    return
+                backoff = 2 ** attempt
+                remaining = self._remaining(deadline)
+                if attempt == self.retries - 1 or not self.breaker.available:
+                    yield UNAVAILABLE_TEXT
+                    return
+                if remaining is not None and remaining <= backoff:
+                    self.budget_exhausted += 1
+                    yield UNAVAILABLE_TEXT
+                    return
+                await asyncio.sleep(backoff)
+                continue
+            
+            content = "".join(parts).strip()
+            latency = time.monotonic() - started
+            logger.info(f"GPT stream {request_id}: {int(latency * 1000)}ms, {len(content)} chars")
+            self.last_response_hash = hashlib.md5(content[-100:].encode()).hexdigest()
+            await self.cache.set(cache_key, content, cache_ttl, latency)
+            return
+    
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Оценка расхода токенов запроса: промпт плюс максимум ответа."""
+        return token_counter.count_messages(messages) + max_tokens
+    
+    def _record_usage(self, method: str, messages: List[Dict[str, str]], usage: Any, latency: float) -> None:
+        """Учитывает фактический расход токенов вызова и уточняет их оценку."""
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        
+        totals = self.token_usage[method]
+        totals["calls"] += 1
+        totals["prompt"] += prompt
+        totals["completion"] += completion
+        totals["cached"] += cached
+        totals["latency"] += latency
+        token_counter.calibrate(messages, prompt)
+        logger.info(
+            f"GPT usage {method}: prompt {prompt} (cached {cached}), "
+            f"completion {completion}, {int(latency * 1000)}ms"
+        )
+    
+    @staticmethod
+    def _usage_tokens(usage: Any) -> int:
+        """Фактический расход токенов по usage из ответа OpenAI."""
+        if usage is None:
+            return 0
+        return getattr(usage, "total_tokens", None) or (
+            (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+        )
+    
+    async def build_profile(self, answers_10q: List[str], budget: Optional[float] = None) -> Dict[str, Any]:
         """Строит психологический профиль на основе 10 вопросов."""
         if not self.gpt_available:
             return self._get_fallback_profile(answers_10q)
@@ -118,7 +603,7 @@ class GPTService:
 }}"""
         
         messages = [{"role": "user", "content": prompt}]
-        response = await self._make_request(messages, temperature=0.8)
+        response = await self._make_request(messages, temperature=0.8, method="build_profile", budget=budget)
         
         try:
             return self._parse_json_response(response)
@@ -200,96 +685,200 @@ class GPTService:
     
     async def reflect_dialog(self, user_prompt: str, profile: Dict[str, Any], 
                            persona: str, memories: List[Dict[str, Any]], 
-                           mood_snapshot: Dict[str, int]) -> str:
+                           mood_snapshot: Dict[str, int], budget: Optional[float] = None) -> str:
         """Диалог с цифровым Я."""
         if not self.gpt_available:
-            return "ИИ временно недоступен. Попробуйте позже."
-            
-        memories_context = "\n".join([f"- {m['content']}" for m in memories[:5]])
+            return UNAVAILABLE_TEXT
         
-        prompt = f"""Ты - {persona}, персональный ассистент.
-
-Профиль пользователя:
+        messages = self._reflect_dialog_messages(user_prompt, profile, persona, memories, mood_snapshot)
+        return await self._make_request(messages, temperature=0.7, max_tokens=200, method="reflect_dialog",
+                                        budget=budget)
+    
+    def stream_reflect_dialog(self, user_prompt: str, profile: Dict[str, Any],
+                              persona: str, memories: List[Dict[str, Any]],
+                              mood_snapshot: Dict[str, int], budget: Optional[float] = None) -> AsyncIterator[str]:
+        """Диалог с цифровым Я с потоковым ответом."""
+        messages = self._reflect_dialog_messages(user_prompt, profile, persona, memories, mood_snapshot)
+        return self.stream_request(messages, temperature=0.7, max_tokens=200, method="reflect_dialog",
+                                   budget=budget)
+    
+    def _reflect_dialog_messages(self, user_prompt: str, profile: Dict[str, Any],
+                                 persona: str, memories: List[Dict[str, Any]],
+                                 mood_snapshot: Dict[str, int]) -> List[Dict[str, str]]:
+        """Промпт диалога с цифровым Я."""
+        return (
+            PromptBuilder("reflect_dialog", REFLECT_DIALOG_INSTRUCTIONS)
+            .section(f"Персона: {persona}")
+            .section(f"""Профиль пользователя:
 - Тип: {profile.get('personality_type', 'Не определен')}
 - Сильные стороны: {', '.join(profile.get('strengths', []))}
-- Области роста: {', '.join(profile.get('growth_areas', []))}
-
-Текущее состояние:
+- Области роста: {', '.join(profile.get('growth_areas', []))}""", max_tokens=200)
+            .section(f"""Текущее состояние:
 - Энергия: {mood_snapshot.get('energy', 5)}/10
-- Настроение: {mood_snapshot.get('mood', 5)}/10
-
-Контекст из памяти:
-{memories_context}
-
-Вопрос: {user_prompt}
-
-Ответь как персональный ассистент в стиле {persona}. 
-Дай 1 конкретный следующий шаг. Будь поддерживающим и практичным.
-Максимум 2-6 строк."""
-        
-        messages = [{"role": "user", "content": prompt}]
-        return await self._make_request(messages, temperature=0.7, max_tokens=200)
+- Настроение: {mood_snapshot.get('mood', 5)}/10""")
+            .memories(memories, max_items=5)
+            .section(f"Вопрос: {user_prompt}", max_tokens=400)
+            .build()
+        )
     
     async def plan_morning(self, goal: str, top3: List[str], energy: int, 
-                          persona: str, memories: List[Dict[str, Any]]) -> str:
+                          persona: str, memories: List[Dict[str, Any]],
+                          budget: Optional[float] = None) -> str:
         """Планирует утро на основе целей и энергии."""
         if not self.gpt_available:
-            return "ИИ временно недоступен. Попробуйте позже."
-            
-        memories_context = "\n".join([f"- {m['content']}" for m in memories[:3]])
+            return UNAVAILABLE_TEXT
         
-        prompt = f"""Ты - {persona}. Помоги спланировать день.
-
-Цель дня: {goal}
+        messages = self._plan_morning_messages(goal, top3, energy, persona, memories)
+        return await self._make_request(messages, temperature=0.7, method="plan_morning", budget=budget)
+    
+    def stream_plan_morning(self, goal: str, top3: List[str], energy: int,
+                            persona: str, memories: List[Dict[str, Any]],
+                            budget: Optional[float] = None) -> AsyncIterator[str]:
+        """План утра с потоковым ответом."""
+        messages = self._plan_morning_messages(goal, top3, energy, persona, memories)
+        return self.stream_request(messages, temperature=0.7, method="plan_morning", budget=budget)
+    
+    def _plan_morning_messages(self, goal: str, top3: List[str], energy: int,
+                               persona: str, memories: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Промпт утреннего плана."""
+        return (
+            PromptBuilder("plan_morning", PLAN_MORNING_INSTRUCTIONS)
+            .section(f"Персона: {persona}")
+            .section(f"""Цель дня: {goal}
 Топ-3 приоритета: {', '.join(top3)}
-Уровень энергии (1-10): {energy}
-
-Контекст: {memories_context}
-
-Дай краткий план дня (3-4 пункта) с учетом энергии и приоритетов.
-Будь практичным и мотивирующим."""
-        
-        messages = [{"role": "user", "content": prompt}]
-        return await self._make_request(messages, temperature=0.7)
+Уровень энергии (1-10): {energy}""", max_tokens=300)
+            .memories(memories, title="Контекст:", max_items=3)
+            .build()
+        )
     
     async def reflect_evening(self, done: List[str], not_done: List[str], 
-                             learning: str, persona: str, memories: List[Dict[str, Any]]) -> str:
+                             learning: str, persona: str, memories: List[Dict[str, Any]],
+                             budget: Optional[float] = None) -> str:
         """Рефлексия вечером."""
         if not self.gpt_available:
-            return "ИИ временно недоступен. Попробуйте позже."
-            
-        memories_context = "\n".join([f"- {m['content']}" for m in memories[:3]])
+            return UNAVAILABLE_TEXT
         
-        prompt = f"""Ты - {persona}. Проведи вечернюю рефлексию.
-
-Выполнено: {', '.join(done)}
-Не выполнено: {', '.join(not_done)}
-Что узнал: {learning}
-
-Контекст: {memories_context}
-
-Дай краткую рефлексию (3-4 предложения) с выводами и советами на завтра."""
-        
-        messages = [{"role": "user", "content": prompt}]
-        return await self._make_request(messages, temperature=0.7)
+        messages = self._reflect_evening_messages(done, not_done, learning, persona, memories)
+        return await self._make_request(messages, temperature=0.7, method="reflect_evening", budget=budget)
+    
+    def stream_reflect_evening(self, done: List[str], not_done: List[str],
+                               learning: str, persona: str, memories: List[Dict[str, Any]],
+                               budget: Optional[float] = None) -> AsyncIterator[str]:
+        """Вечерняя рефлексия с потоковым ответом."""
+        messages = self._reflect_evening_messages(done, not_done, learning, persona, memories)
+        return self.stream_request(messages, temperature=0.7, method="reflect_evening", budget=budget)
+    
+    def _reflect_evening_messages(self, done: List[str], not_done: List[str], learning: str,
+                                  persona: str, memories: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Промпт вечерней рефлексии."""
+        return (
+            PromptBuilder("reflect_evening", REFLECT_EVENING_INSTRUCTIONS)
+            .section(f"Персона: {persona}")
+            .section(f"""Выполнено: {', '.join(done)}
+Не выполнено: {', '.join(not_done)}""", max_tokens=250)
+            .section(f"Что узнал: {learning}", max_tokens=200)
+            .memories(memories, title="Контекст:", max_items=3)
+            .build()
+        )
     
-    async def weekly_report(self, metrics: Dict[str, Any], persona: str) -> str:
+    async def weekly_report(self, metrics: Dict[str, Any], persona: str,
+                            priority: str = PRIORITY_INTERACTIVE, budget: Optional[float] = None) -> str:
         """Генерирует еженедельный отчет."""
         if not self.gpt_available:
-            return "ИИ временно недоступен. Попробуйте позже."
+            return UNAVAILABLE_TEXT
             
-        prompt = f"""Ты - {persona}. Создай еженедельный отчет.
-
-Метрики:
+        mood_line = f"- Среднее настроение: {metrics.get('avg_mood', 5)}/10"
+        if metrics.get("mood_baseline") is not None:
+            mood_line += f" (обычно {metrics['mood_baseline']} ± {metrics.get('mood_spread', 0)})"
+        
+        messages = (
+            PromptBuilder("weekly_report", WEEKLY_REPORT_INSTRUCTIONS)
+            .section(f"Персона: {persona}")
+            .section(f"""Метрики:
 - Записей: {metrics.get('entries_count', 0)}
 - Средняя энергия: {metrics.get('avg_energy', 0)}/10
+{mood_line}
 - Фокус-сессии: {metrics.get('focus_minutes', 0)} минут
-- Активность: {metrics.get('daily_activity', {})}
-
-Создай краткий отчет (5-6 предложений) с выводами и рекомендациями."""
+- Активность: {metrics.get('daily_activity', {})}""")
+            .build()
+        )
+        return await self._make_request(messages, temperature=0.7, method="weekly_report",
+                                        priority=priority, budget=budget)
+    
+    async def summarize_memories(self, period: str, memories: List[Dict[str, Any]],
+                                 priority: str = PRIORITY_BACKGROUND) -> Optional[str]:
+        """Сворачивает записи памяти за период в итог; None, если GPT недоступен."""
+        if not self.gpt_available:
+            return None
         
-        messages = [{"role": "user", "content": prompt}]
-        return await self._make_request(messages, temperature=0.7)
+        messages = (
+            PromptBuilder("summarize_memories", SUMMARIZE_MEMORIES_INSTRUCTIONS)
+            .section(f"Период: {period}")
+            # Записи от новых к старым: при нехватке бюджета сворачиваются самые ранние
+            .memories(list(reversed(memories)), title="Записи:", max_items=len(memories), item_tokens=60)
+            .build()
+        )
+        summary = await self._make_request(messages, temperature=0.3, max_tokens=250,
+                                           method="summarize_memories", priority=priority)
+        return None if summary == UNAVAILABLE_TEXT else summary
+    
+    async def summarize_dialog(self, dialog: str, priority: str = PRIORITY_BACKGROUND) -> Optional[str]:
+        """Краткое резюме диалога для памяти; None, если GPT недоступен."""
+        if not self.gpt_available:
+            return None
+        
+        messages = (
+            PromptBuilder("summarize_dialog", SUMMARIZE_DIALOG_INSTRUCTIONS)
+            .section(dialog, max_tokens=1200)
+            .build()
+        )
+        summary = await self._make_request(messages, temperature=0.3, max_tokens=150,
+                                           method="summarize_dialog", priority=priority)
+        return None if summary == UNAVAILABLE_TEXT else summary
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики запросов к GPT."""
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "in_flight": len(self._in_flight),
+            "scheduler": self.scheduler.stats(),
+            "breaker": self.breaker.stats(),
+            "cache": self.cache.stats(),
+            "ttfb": {kind: self._ttfb_stats(samples) for kind, samples in self._ttfb.items()},
+            "tokens": {
+                method: {
+                    "calls": totals["calls"],
+                    "avg_prompt": round(totals["prompt"] / totals["calls"]),
+                    "avg_completion": round(totals["completion"] / totals["calls"]),
+                    "cached_share": round(totals["cached"] / totals["prompt"], 3) if totals["prompt"] else 0.0,
+                    "avg_latency_ms": round(totals["latency"] / totals["calls"] * 1000),
+                }
+                for method, totals in self.token_usage.items() if totals["calls"]
+            },
+            "token_ratio": round(token_counter.ratio, 3),
+        }
+    
+    @staticmethod
+    def _ttfb_stats(samples: Deque[float]) -> Dict[str, Any]:
+        """p50/p95 времени до первого фрагмента в миллисекундах."""
+        if not samples:
+            return {"count": 0, "p50_ms": None, "p95_ms": None}
+        ordered = sorted(samples)
+        return {
+            "count": len(ordered),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        }
+    
+    async def close(self) -> None:
+        """Освобождает ресурсы сервиса."""
+        if self._prober:
+            self._prober.cancel()
+        await self.cache.close()
 
 
 # Глобальный экземпляр сервиса
@@ -0,0 +1,133 @@
+"""Кэш ответов GPT: LRU в памяти и опциональный уровень в SQLite."""
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from ..cache import TTLCache, MISSING
+from ..logger import get_logger
+
+logger = get_logger("gpt_cache")
+
+
+def request_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+    """Ключ запроса: sha256 от (model, messages, temperature, max_tokens)."""
+    payload = json.dumps(
+        [model, messages, round(temperature, 3), max_tokens],
+        ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Кэш ответов GPT с TTL на запись.
+
+    Первый уровень - LRU в памяти процесса, второй (если задан путь) -
+    таблица SQLite, переживающая перезапуск. Вместе с ответом хранится
+    задержка исходного запроса, чтобы считать сэкономленное время.
+    """
+
+    def __init__(self, maxsize: int = 2000, path: Optional[str] = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=0)
+        self.path = path
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0
+        self._connection: Optional[aiosqlite.Connection] = None
+
+    async def get(self, key: str) -> Optional[str]:
+        """Возвращает закэшированный ответ или None."""
+        item = self.memory.get(key)
+        if item is MISSING:
+            item = await self._persistent_get(key)
+            if item is not None:
+                content, latency, expires_at = item
+                self.memory.set(key, (content, latency), ttl=expires_at - time.time())
+                self.persistent_hits += 1
+                item = (content, latency)
+
+        if item is MISSING or item is None:
+            self.misses += 1
+            return None
+
+        content, latency = item
+        self.hits += 1
+        self.saved_latency += latency
+        return content
+
+    async def set(self, key: str, content: str, ttl: float, latency: float) -> None:
+        """Сохраняет ответ на ttl секунд."""
+        if ttl <= 0:
+            return
+
+        self.memory.set(key, (content, latency), ttl=ttl)
+        connection = await self._persistent()
+        if connection is None:
+            return
+
+        try:
+            await connection.execute(
+                "INSERT OR REPLACE INTO gpt_cache (key, content, latency, expires_at) VALUES (?, ?, ?, ?)",
+                (key, content, latency, time.time() + ttl)
+            )
+            await connection.commit()
+        except Exception as e:
+            logger.error(f"GPT cache write failed: {e}")
+
+    async def close(self) -> None:
+        """Закрывает соединение постоянного уровня."""
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+
+    async def _persistent(self) -> Optional[aiosqlite.Connection]:
+        if not self.path:
+            return None
+
+        if self._connection is None:
+            self._connection = await aiosqlite.connect(self.path)
+            await self._connection.execute("PRAGMA journal_mode=WAL")
+            await self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS gpt_cache (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    latency REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            # Просроченные записи удаляем при открытии
+            await self._connection.execute("DELETE FROM gpt_cache WHERE expires_at < ?", (time.time(),))
+            await self._connection.commit()
+        return self._connection
+
+    async def _persistent_get(self, key: str) -> Optional[Tuple[str, float, float]]:
+        connection = await self._persistent()
+        if connection is None:
+            return None
+
+        try:
+            async with connection.execute(
+                "SELECT content, latency, expires_at FROM gpt_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ) as cursor:
+                return await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"GPT cache read failed: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики кэша."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self.memory),
+            "maxsize": self.memory.maxsize,
+            "persistent": bool(self.path),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "saved_latency_s": round(self.saved_latency, 3),
+        }
@@ -0,0 +1,152 @@
+"""Приоритетный лимитер конкурентности для запросов к OpenAI."""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from ..ratelimit import TokenBucket
+from ..logger import get_logger
+
+logger = get_logger("gpt_scheduler")
+
+# Классы приоритета в порядке обслуживания
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_BATCH)
+
+
+class GPTScheduler:
+    """Ограничивает число одновременных запросов к OpenAI с учетом приоритета.
+
+    Свободный слот всегда получает самый приоритетный ожидающий запрос.
+    Фоновые и пакетные запросы не могут занять последние reserved слотов,
+    поэтому интерактивным не приходится ждать окончания волны отчетов.
+    Бюджет токенов в минуту - token bucket: фоновые и пакетные запросы
+    ждут, пока бюджет накопится, интерактивные берут его в долг сразу.
+    """
+
+    def __init__(self, max_concurrency: int = 8, reserved_interactive: int = 2,
+                 tokens_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        shared = max(1, max_concurrency - reserved_interactive)
+        self._limits = {
+            PRIORITY_INTERACTIVE: max_concurrency,
+            PRIORITY_BACKGROUND: shared,
+            PRIORITY_BATCH: shared,
+        }
+        self._active: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {p: deque() for p in PRIORITIES}
+        self._budget: Optional[TokenBucket] = (
+            TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute) if tokens_per_minute else None
+        )
+
+        # Метрики
+        self._granted: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._wait_total: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self._max_depth: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.budget_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE, tokens: int = 0) -> AsyncIterator[None]:
+        """Держит слот на время запроса; tokens - оценка расхода токенов.
+
+        Если вызов внутри слота завершился исключением или отменой, оценка
+        возвращается в бюджет; после успеха бюджет правит settle().
+        """
+        if priority not in self._active:
+            priority = PRIORITY_INTERACTIVE
+
+        started = time.monotonic()
+        reserved = tokens if self._budget else 0
+        try:
+            # Бюджет ждем до слота: ожидание токенов не занимает конкурентность
+            if reserved:
+                wait = self._budget.reserve(reserved)
+                if wait > 0 and priority != PRIORITY_INTERACTIVE:
+                    self.budget_wait += wait
+                    await asyncio.sleep(wait)
+            await self._acquire(priority)
+        except BaseException:
+            self._refund(reserved)
+            raise
+
+        self._granted[priority] += 1
+        self._wait_total[priority] += time.monotonic() - started
+        try:
+            yield
+        except BaseException:
+            # Неудачный или отмененный вызов (и проигравший дубль) бюджет не расходует
+            self._refund(reserved)
+            raise
+        finally:
+            self._release(priority)
+
+    def _refund(self, tokens: int) -> None:
+        if self._budget and tokens:
+            self._budget.refund(tokens)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Исправляет бюджет по фактическому расходу токенов."""
+        if self._budget and actual:
+            self._budget.refund(estimated - actual)
+
+    def _running(self) -> int:
+        return sum(self._active.values())
+
+    def _can_run(self, priority: str) -> bool:
+        return self._running() < self._limits[priority]
+
+    async def _acquire(self, priority: str) -> None:
+        # Не обгоняем уже ожидающих с тем же или более высоким приоритетом
+        ahead = any(self._waiters[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        if not ahead and self._can_run(priority):
+            self._active[priority] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters[priority]
+        waiters.append(future)
+        self._max_depth[priority] = max(self._max_depth[priority], len(waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан - возвращаем его
+                self._release(priority)
+            else:
+                waiters.remove(future)
+            raise
+
+    def _release(self, priority: str) -> None:
+        self._active[priority] -= 1
+        for p in PRIORITIES:
+            waiters = self._waiters[p]
+            while waiters and self._can_run(p):
+                future = waiters.popleft()
+                if not future.done():
+                    self._active[p] += 1
+                    future.set_result(None)
+            if waiters:
+                # Более низкие классы не обгоняют ожидающий высокий
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает глубину очередей и загрузку по классам."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running(),
+            "classes": {
+                p: {
+                    "active": self._active[p],
+                    "queued": len(self._waiters[p]),
+                    "max_queued": self._max_depth[p],
+                    "granted": self._granted[p],
+                    "avg_wait_ms": round(self._wait_total[p] / self._granted[p] * 1000, 1) if self._granted[p] else 0.0,
+                }
+                for p in PRIORITIES
+            },
+            "tokens_available": round(self._budget.tokens) if self._budget else None,
+            "budget_wait_s": round(self.budget_wait, 3),
+        }
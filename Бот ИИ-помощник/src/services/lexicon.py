@@ -0,0 +1,113 @@
+"""Поиск словарных слов и фраз в тексте: trie по словам с границами слов."""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+
+# Совпадение: (категория, шаблон, вес)
+Hit = Tuple[str, str, float]
+
+
+class _Node:
+    """Узел trie: переходы по целому слову и по началу слова (основе)."""
+
+    __slots__ = ("children", "prefixes", "prefix_lengths", "suffix_limit", "hits")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.prefixes: Dict[str, "_Node"] = {}
+        self.prefix_lengths: Tuple[int, ...] = ()
+        # Для узла основы: сколько букв может идти после нее (None - сколько угодно)
+        self.suffix_limit: Optional[int] = None
+        self.hits: List[Hit] = []
+
+
+class LexiconMatcher:
+    """Словари категорий, скомпилированные в один trie по словам.
+
+    Текст разбивается на слова один раз, и из каждой позиции trie
+    проходится по словам, поэтому стоимость почти не зависит от размера
+    словарей, а совпадения всегда начинаются и заканчиваются на границе
+    слова («рад» не находится в «отрада»). Шаблоны могут быть фразами
+    («не успеваю»). Шаблон «устал*» совпадает с любым словом, которое
+    начинается с «устал». prefix_min_len включает словоформы для всех
+    однословных шаблонов не короче заданной длины: после шаблона может
+    идти окончание до max_suffix букв («устал» - «устала», но «быстро» -
+    не «быстрорастворимый»). normalize применяется и к словам шаблонов,
+    и к словам текста.
+    """
+
+    def __init__(self, lexicons: Dict[str, Dict[str, float]], prefix_min_len: Optional[int] = None,
+                 max_suffix: int = 2, normalize: Optional[Callable[[str], str]] = None):
+        self.prefix_min_len = prefix_min_len
+        self.max_suffix = max_suffix
+        self.normalize = normalize
+        self.root = _Node()
+        self.size = 0
+        for category, patterns in lexicons.items():
+            for pattern, weight in patterns.items():
+                self.add(category, pattern, weight)
+
+    def tokens(self, text: str) -> List[str]:
+        """Слова текста в нижнем регистре (и нормализованные, если задано)."""
+        words = _WORD_RE.findall(text.lower())
+        if self.normalize:
+            words = [self.normalize(word) for word in words]
+        return words
+
+    def add(self, category: str, pattern: str, weight: float) -> None:
+        """Добавляет шаблон в trie."""
+        explicit_prefix = pattern.endswith("*")
+        words = self.tokens(pattern)
+        if not words:
+            return
+        auto_prefix = (
+            self.prefix_min_len is not None and len(words) == 1 and len(words[0]) >= self.prefix_min_len
+        )
+
+        node = self.root
+        for word in words[:-1]:
+            node = node.children.setdefault(word, _Node())
+        last = words[-1]
+        if explicit_prefix or auto_prefix:
+            parent = node
+            if last not in parent.prefixes:
+                parent.prefixes[last] = _Node()
+                parent.prefixes[last].suffix_limit = self.max_suffix
+                if len(last) not in parent.prefix_lengths:
+                    parent.prefix_lengths = tuple(sorted((*parent.prefix_lengths, len(last)), reverse=True))
+            node = parent.prefixes[last]
+            if explicit_prefix:
+                node.suffix_limit = None
+        else:
+            node = node.children.setdefault(last, _Node())
+        node.hits.append((category, pattern.rstrip("*"), weight))
+        self.size += 1
+
+    def find(self, text: str) -> List[Tuple[int, Hit]]:
+        """Все совпадения в тексте: (номер слова, где началось совпадение; совпадение)."""
+        return self.find_tokens(self.tokens(text))
+
+    def find_tokens(self, tokens: List[str]) -> List[Tuple[int, Hit]]:
+        matches: List[Tuple[int, Hit]] = []
+        root = self.root
+        count = len(tokens)
+        for start in range(count):
+            node = root
+            position = start
+            while position < count:
+                token = tokens[position]
+                for length in node.prefix_lengths:
+                    if len(token) < length:
+                        continue
+                    stem_node = node.prefixes.get(token[:length])
+                    if stem_node is not None and (
+                        stem_node.suffix_limit is None or len(token) - length <= stem_node.suffix_limit
+                    ):
+                        matches.extend((start, hit) for hit in stem_node.hits)
+                node = node.children.get(token)
+                if node is None:
+                    break
+                matches.extend((start, hit) for hit in node.hits)
+                position += 1
+        return matches
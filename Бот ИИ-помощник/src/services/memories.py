@@ -1,20 +1,34 @@
 """Сервис для работы с памятью пользователя."""
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import asyncio
+import time
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
 
+from ..config import config
 from ..storage import db
 from ..logger import get_logger
+from .gpt import gpt_service
+from .relevance import relevance_index
 
 logger = get_logger("memories")
 
 
 class MemoryService:
-    """Сервис для управления памятью пользователя."""
+    """Сервис для управления памятью пользователя.
+    
+    Старая память сворачивается в недельные итоги (kind='summary'), а
+    исходные записи переносятся в memories_archive, поэтому число строк
+    памяти и размер контекста GPT не растут со временем.
+    """
+    
+    def __init__(self):
+        self.last_compaction: Optional[Dict[str, Any]] = None
     
     @staticmethod
     async def add_memory(tg_id: int, kind: str, content: str) -> None:
         """Добавляет запись в память."""
-        await db.add_memory(tg_id, kind, content)
+        memory_id = await db.add_memory(tg_id, kind, content)
+        relevance_index.add_memory(tg_id, memory_id, kind, content)
         logger.info(f"Added memory for user {tg_id}: {kind}")
     
     @staticmethod
@@ -22,19 +36,40 @@ class MemoryService:
         """Получает последние записи памяти."""
         return await db.recent_memories(tg_id, limit)
     
+    @staticmethod
+    async def get_relevant_memories(tg_id: int, query: str, limit: int = 5,
+                                    recent: int = 2) -> List[Dict[str, Any]]:
+        """Контекст для ответа на запрос: несколько последних записей и самые релевантные.
+        
+        Релевантные ищутся локальным индексом по памяти, записям опросов и
+        заметкам к настроению, поэтому в контекст попадают и давние записи.
+        """
+        memories = await db.recent_memories(tg_id, recent)
+        seen = {m["content"] for m in memories}
+        for match in await relevance_index.search(tg_id, query, limit):
+            if len(memories) >= limit:
+                break
+            if match["content"] not in seen:
+                seen.add(match["content"])
+                memories.append(match)
+        return memories
+    
     @staticmethod
     async def get_memories_by_type(tg_id: int, kind: str, limit: int = 3) -> List[Dict[str, Any]]:
         """Получает записи памяти определенного типа."""
-        # Это упрощенная версия - в реальности нужен отдельный метод в storage
-        all_memories = await db.recent_memories(tg_id, limit * 2)
-        return [m for m in all_memories if m['kind'] == kind][:limit]
+        return await db.memories_by_kind(tg_id, kind, limit)
     
     @staticmethod
     async def summarize_dialog(tg_id: int, dialog_content: str) -> str:
         """Создает краткое резюме диалога для сохранения в память."""
-        # В реальной реализации здесь был бы вызов GPT для создания резюме
-        # Пока возвращаем первые 200 символов
-        return dialog_content[:200] + "..." if len(dialog_content) > 200 else dialog_content
+        if len(dialog_content) <= 200:
+            return dialog_content
+        
+        summary = await gpt_service.summarize_dialog(dialog_content)
+        if summary:
+            return summary
+        # GPT недоступен - сохраняем начало диалога
+        return dialog_content[:200] + "..."
     
     @staticmethod
     async def get_context_for_gpt(tg_id: int, context_types: List[str] = None) -> str:
@@ -54,12 +89,88 @@ class MemoryService:
         
         return "\n".join(context_parts)
     
+    @staticmethod
+    def compaction_cutoff(days_old: int) -> str:
+        """Граница сворачивания: понедельник недели, в которую попадает дата days_old дней назад.
+        
+        Сворачиваются только недели, целиком лежащие до границы.
+        """
+        cutoff = date.today() - timedelta(days=days_old)
+        return (cutoff - timedelta(days=cutoff.weekday())).isoformat()
+    
     @staticmethod
     async def cleanup_old_memories(tg_id: int, days_old: int = 30) -> int:
-        """Очищает старые записи памяти (оставляем только последние N дней)."""
-        # В реальной реализации нужен метод в storage для удаления старых записей
-        # Пока возвращаем 0
-        return 0
+        """Сворачивает записи памяти старше days_old дней в недельные итоги.
+        
+        Каждая неделя сворачивается своей транзакцией. Если GPT недоступен,
+        сворачивание останавливается и продолжится со следующей недели при
+        следующем запуске. Возвращает число свернутых записей.
+        """
+        weeks = await db.old_memory_weeks(tg_id, MemoryService.compaction_cutoff(days_old))
+        folded = 0
+        for week_start, items in weeks.items():
+            week_end = (date.fromisoformat(week_start) + timedelta(days=6)).isoformat()
+            period = f"{week_start} - {week_end}"
+            if len(items) == 1:
+                # Одну запись пересказывать незачем
+                summary = items[0]["content"]
+            else:
+                summary = await gpt_service.summarize_memories(period, items)
+                if summary is None:
+                    logger.warning(f"Memory compaction for user {tg_id} paused: GPT unavailable")
+                    break
+            
+            folded += await db.fold_memories(
+                tg_id, [m["id"] for m in items], f"Итоги недели {period}: {summary}", items[-1]["ts"]
+            )
+        
+        if folded:
+            relevance_index.invalidate(tg_id)
+            logger.info(f"Folded {folded} memories of user {tg_id} into {len(weeks)} weekly summaries")
+        return folded
+    
+    async def compact_all(self, days_old: Optional[int] = None) -> Dict[str, Any]:
+        """Сворачивает старую память всех пользователей (ночная фоновая задача).
+        
+        Пользователи перебираются keyset-пагинацией по tg_id, GPT вызывается
+        с фоновым приоритетом. Состояния задачи нет: прерванный запуск
+        продолжится со всех еще не свернутых недель.
+        """
+        days_old = days_old or config.memory_compaction_days
+        before = self.compaction_cutoff(days_old)
+        semaphore = asyncio.Semaphore(config.memory_compaction_concurrency)
+        started = time.perf_counter()
+        result = {"users": 0, "folded": 0, "failed": 0, "interrupted": False}
+        
+        async def process(tg_id: int) -> None:
+            async with semaphore:
+                try:
+                    folded = await self.cleanup_old_memories(tg_id, days_old)
+                    result["users"] += 1
+                    result["folded"] += folded
+                except Exception as e:
+                    result["failed"] += 1
+                    logger.error(f"Memory compaction error for user {tg_id}: {e}")
+        
+        after = 0
+        while True:
+            if not gpt_service.gpt_available:
+                # Не тратим запуск, пока OpenAI недоступен
+                result["interrupted"] = True
+                break
+            user_ids = await db.users_with_old_memories(before, after)
+            if not user_ids:
+                break
+            after = user_ids[-1]
+            await asyncio.gather(*(process(tg_id) for tg_id in user_ids))
+        
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+        self.last_compaction = result
+        logger.info(
+            f"Memory compaction: {result['folded']} memories of {result['users']} users folded "
+            f"in {result['elapsed']:.2f}s"
+        )
+        return result
 
 
 # Глобальный экземpляр сервиса
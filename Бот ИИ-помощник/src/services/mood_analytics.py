@@ -0,0 +1,304 @@
+"""Аналитика настроения по всей истории на NumPy.
+
+История загружается одним запросом в массивы, дальше все считается
+векторно: тренд по EWMA, скользящая волатильность, сезонность по дням
+недели и часам, аномалии. Истории нескольких пользователей идут подряд
+в одних массивах (сегментами), поэтому ночной пересчет analyze_all
+обрабатывает пачку из сотен пользователей за несколько операций NumPy,
+а не пользователя за пользователем.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import config
+from ..logger import get_logger
+from ..storage import db
+from .timeutils import TimeUtils
+
+logger = get_logger("mood_analytics")
+
+# Коэффициент сглаживания EWMA: вес последней записи
+ALPHA = 0.3
+
+# Окно скользящих статистик (в записях)
+WINDOW = 7
+
+# Изменение EWMA за окно, начиная с которого тренд не «stable»
+TREND_THRESHOLD = 1.0
+
+# Аномалия: отклонение от предыдущего окна больше ANOMALY_Z его стандартных отклонений
+ANOMALY_Z = 2.5
+
+# Нижняя граница стандартного отклонения окна: после нескольких одинаковых
+# оценок любое изменение иначе считалось бы аномалией
+MIN_STD = 1.0
+
+# Сколько последних аномалий возвращать
+MAX_ANOMALIES = 10
+
+# Длина блока EWMA: w^-i в блоке не должен переполниться
+EWMA_BLOCK = 256
+
+EMPTY = {"count": 0, "trend": "stable", "average_mood": 5, "average_energy": 5, "volatility": 0}
+
+
+def ewma(values: np.ndarray, alpha: float = ALPHA, first: Optional[np.ndarray] = None) -> np.ndarray:
+    """Экспоненциальное сглаживание y_t = a*x_t + (1-a)*y_{t-1}, y_0 = x_0.
+
+    values - вектор или матрица (каждый столбец сглаживается отдельно).
+    first - маска начал сегментов: там сглаживание начинается заново.
+    Рекурсия разворачивается в накопленную сумму x_j * w^-j (w = 1 - a),
+    которая считается блоками, чтобы степени w не переполнялись.
+    """
+    values = np.asarray(values, dtype=float)
+    count = len(values)
+    result = np.empty_like(values)
+    if not count:
+        return result
+    if first is None:
+        first = np.zeros(count, dtype=bool)
+        first[0] = True
+    columns = values.reshape(count, -1)
+    smoothed = result.reshape(count, -1)
+
+    w = 1.0 - alpha
+    powers = w ** np.arange(EWMA_BLOCK + 1)
+    previous = columns[0]
+    for start in range(0, count, EWMA_BLOCK):
+        block = columns[start:start + EWMA_BLOCK]
+        starts = first[start:start + EWMA_BLOCK]
+        n = len(block)
+        k = np.arange(n)
+        scaled = np.cumsum(block / powers[:n, None], axis=0)
+        # origin - начало сегмента строки внутри блока (0, если сегмент начался раньше)
+        origin = np.maximum.accumulate(np.where(starts, k, 0))
+        base = np.where((origin > 0)[:, None], scaled[origin - 1], 0.0)
+        # Новый сегмент начинается со своего первого значения, продолжение - с конца прошлого блока
+        seed = np.where(starts[origin][:, None], block[origin], previous)
+        # y_k = w^(k-o+1) * seed + a * sum_{o<=j<=k} w^(k-j) * x_j
+        smoothed[start:start + n] = (
+            powers[k - origin + 1, None] * seed + alpha * powers[:n, None] * (scaled - base)
+        )
+        previous = smoothed[start + n - 1]
+    return result
+
+
+def rolling(values: np.ndarray, window: int = WINDOW,
+            segment_start: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Скользящие среднее и стандартное отклонение по последним window записям.
+
+    Окно не выходит за начало сегмента строки (segment_start), первые
+    записи сегмента считаются по неполному окну. Суммы окон - разности
+    накопленных сумм x и x^2.
+    """
+    values = np.asarray(values, dtype=float)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    squares = np.concatenate(([0.0], np.cumsum(values * values)))
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, 0 if segment_start is None else segment_start)
+    count = end - begin
+    mean = (sums[end] - sums[begin]) / count
+    variance = np.maximum((squares[end] - squares[begin]) / count - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+def seasonality(values: np.ndarray, keys: np.ndarray, size: int, segments: int = 1) -> np.ndarray:
+    """Средние по ключам 0..size-1 для каждого сегмента: (segments, size), NaN - нет записей.
+
+    keys уже включают сегмент: segment * size + ключ.
+    """
+    counts = np.bincount(keys, minlength=segments * size)
+    sums = np.bincount(keys, weights=values, minlength=segments * size)
+    means = np.divide(sums, counts, out=np.full(segments * size, np.nan), where=counts > 0)
+    return means.reshape(segments, size)
+
+
+def _optional(row: List[float]) -> List[Optional[float]]:
+    return [None if value != value else value for value in row]
+
+
+def analyze_segments(lengths: Sequence[int], days: np.ndarray, moods: np.ndarray, energies: np.ndarray,
+                     seconds: Optional[np.ndarray] = None,
+                     offsets: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+    """Аналитика нескольких историй, лежащих подряд в одних массивах.
+
+    lengths - число записей каждой истории (> 0), days - номера дней от
+    1970-01-01, seconds - время записи в секундах UTC (NaN для старых
+    записей без времени), offsets - смещения часовых поясов историй в секундах.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    segments = len(lengths)
+    if not segments:
+        return []
+    moods = np.asarray(moods, dtype=float)
+    energies = np.asarray(energies, dtype=float)
+    days = np.asarray(days, dtype=np.int64)
+
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    lasts = starts + lengths - 1
+    segment = np.repeat(np.arange(segments), lengths)
+    segment_start = starts[segment]
+    first = np.zeros(len(moods), dtype=bool)
+    first[starts] = True
+
+    smoothed = ewma(np.column_stack((moods, energies)), first=first)
+    smoothed_mood, smoothed_energy = smoothed[:, 0], smoothed[:, 1]
+    mean, std = rolling(moods, WINDOW, segment_start)
+
+    # Тренд: изменение EWMA за последнее окно
+    change = smoothed_mood[lasts] - smoothed_mood[np.maximum(starts, lasts - WINDOW)]
+    trends = np.where(
+        change > TREND_THRESHOLD, "improving", np.where(change < -TREND_THRESHOLD, "declining", "stable")
+    )
+    trends[lengths < 3] = "stable"
+
+    # Аномалии: запись сравнивается с полным окном, которое заканчивается перед ней
+    candidates = np.flatnonzero(np.arange(len(moods)) - segment_start >= WINDOW)
+    scores = (moods[candidates] - mean[candidates - 1]) / np.maximum(std[candidates - 1], MIN_STD)
+    flagged = np.abs(scores) >= ANOMALY_Z
+    anomaly_rows, anomaly_scores = candidates[flagged], scores[flagged]
+    anomaly_bounds = np.searchsorted(segment[anomaly_rows], np.arange(segments + 1))
+
+    # 1970-01-01 - четверг, поэтому +3 дает понедельник = 0
+    weekday = seasonality(moods, segment * 7 + (days + 3) % 7, 7, segments)
+    hour = np.full((segments, 24), np.nan)
+    if seconds is not None:
+        known = ~np.isnan(seconds)
+        if known.any():
+            shift = np.zeros(segments) if offsets is None else np.asarray(offsets, dtype=float)
+            local = seconds[known] + shift[segment[known]]
+            keys = segment[known] * 24 + (local // 3600).astype(np.int64) % 24
+            hour = seasonality(moods[known], keys, 24, segments)
+
+    average_mood = np.bincount(segment, weights=moods, minlength=segments) / lengths
+    average_energy = np.bincount(segment, weights=energies, minlength=segments) / lengths
+
+    # Дальше только сборка словарей из готовых массивов
+    columns = zip(
+        lengths.tolist(), trends.tolist(), np.round(average_mood, 1).tolist(),
+        np.round(average_energy, 1).tolist(), np.round(smoothed_mood[lasts], 2).tolist(),
+        np.round(smoothed_energy[lasts], 2).tolist(), np.round(std[lasts], 2).tolist(),
+        np.round(weekday, 1).tolist(), np.round(hour, 1).tolist(),
+        anomaly_bounds[:-1].tolist(), anomaly_bounds[1:].tolist(),
+    )
+    anomaly_days = (days[anomaly_rows].astype("datetime64[D]")).astype(str).tolist()
+    anomaly_moods = moods[anomaly_rows].astype(int).tolist()
+    anomaly_scores = np.round(anomaly_scores, 1).tolist()
+
+    results = []
+    for count, trend, avg_mood, avg_energy, ewma_mood, ewma_energy, volatility, weekdays, hours, low, high in columns:
+        recent = range(max(low, high - MAX_ANOMALIES), high)
+        results.append({
+            "count": count,
+            "trend": trend,
+            "average_mood": avg_mood,
+            "average_energy": avg_energy,
+            "ewma_mood": ewma_mood,
+            "ewma_energy": ewma_energy,
+            "volatility": volatility,
+            "weekday_mood": _optional(weekdays),
+            "hour_mood": _optional(hours),
+            "anomaly_count": high - low,
+            "anomalies": [
+                {"date": anomaly_days[i], "mood": anomaly_moods[i], "z": anomaly_scores[i]} for i in recent
+            ],
+        })
+    return results
+
+
+def analyze(days: np.ndarray, moods: np.ndarray, energies: np.ndarray,
+            seconds: Optional[np.ndarray] = None, utc_offset: float = 0) -> Dict[str, Any]:
+    """Аналитика одной истории настроения (аргументы - как у analyze_segments)."""
+    if not len(moods):
+        return dict(EMPTY)
+    return analyze_segments([len(moods)], days, moods, energies, seconds, [utc_offset])[0]
+
+
+def utc_offset(tz: Optional[str]) -> float:
+    """Текущее смещение часового пояса пользователя в секундах."""
+    timezone = TimeUtils.get_user_timezone(tz or config.default_tz)
+    return datetime.now(timezone).utcoffset().total_seconds()
+
+
+def to_arrays(rows: Sequence[Sequence[Optional[float]]]) -> np.ndarray:
+    """Числовые строки из базы в двумерный массив (NULL -> NaN)."""
+    return np.array(rows, dtype=float).reshape(len(rows), -1)
+
+
+class MoodAnalytics:
+    """Аналитика настроения одного пользователя и ночной пересчет для всех."""
+
+    def __init__(self):
+        # Результаты последнего ночного пересчета: tg_id -> аналитика
+        self.latest: Dict[int, Dict[str, Any]] = {}
+        self.last_run: Dict[str, Any] = {}
+
+    async def analyze_user(self, tg_id: int) -> Dict[str, Any]:
+        """Аналитика всей истории пользователя."""
+        rows = await db.mood_history(tg_id)
+        if not rows:
+            return dict(EMPTY)
+        user = await db.get_user(tg_id)
+        data = to_arrays(rows)
+        return analyze(data[:, 0], data[:, 2], data[:, 3], data[:, 1], utc_offset(user.tz if user else None))
+
+    @staticmethod
+    def analyze_batch(rows: Sequence[Tuple[int, int, Optional[int], int, int]],
+                      timezones: Dict[int, str]) -> Dict[int, Dict[str, Any]]:
+        """Аналитика пачки пользователей из строк mood_history_batch."""
+        if not rows:
+            return {}
+        data = to_arrays(rows)
+        tg_ids = data[:, 0].astype(np.int64)
+        # Строки упорядочены по tg_id: границы пользователей - места смены tg_id
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(tg_ids)) + 1))
+        lengths = np.diff(np.append(starts, len(rows)))
+        users = tg_ids[starts].tolist()
+
+        offsets: Dict[str, float] = {}
+        for tg_id in users:
+            tz = timezones.get(tg_id) or config.default_tz
+            if tz not in offsets:
+                offsets[tz] = utc_offset(tz)
+        results = analyze_segments(
+            lengths, data[:, 1], data[:, 3], data[:, 4], data[:, 2],
+            [offsets[timezones.get(tg_id) or config.default_tz] for tg_id in users]
+        )
+        return dict(zip(users, results))
+
+    async def analyze_all(self, batch_users: int = 500) -> Dict[int, Dict[str, Any]]:
+        """Пересчитывает аналитику всех пользователей с историей настроения.
+
+        Пользователи читаются пачками по batch_users одним запросом на пачку;
+        расчет пачки идет в отдельном потоке, чтобы не держать event loop.
+        """
+        started = time.perf_counter()
+        results: Dict[int, Dict[str, Any]] = {}
+        after_tg_id = 0
+        rows_total = 0
+        while True:
+            rows, timezones = await db.mood_history_batch(after_tg_id, batch_users)
+            if not rows:
+                break
+            results.update(await asyncio.to_thread(self.analyze_batch, rows, timezones))
+            rows_total += len(rows)
+            after_tg_id = rows[-1][0]
+
+        self.latest = results
+        self.last_run = {
+            "users": len(results),
+            "rows": rows_total,
+            "declining": sum(1 for result in results.values() if result["trend"] == "declining"),
+            "elapsed": round(time.perf_counter() - started, 2),
+            "finished_at": time.time(),
+        }
+        logger.info(f"Mood analytics: {len(results)} users, {rows_total} rows in {self.last_run['elapsed']}s")
+        return results
+
+
+# Глобальный экземпляр сервиса
+mood_analytics = MoodAnalytics()
@@ -1,175 +1,146 @@
-"""Сервис для генерации PDF отчетов."""
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from typing import Dict, Any, List
-from datetime import datetime, date
-import os
+"""Сервис для генерации PDF отчетов.
 
+reportlab синхронный и держит GIL, поэтому рендеринг выполняется в пуле
+процессов: сервис собирает данные в словарь, воркер (pdf_render)
+возвращает готовые байты PDF.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+from datetime import date
+from functools import partial
+import asyncio
+import multiprocessing
+
+from ..config import config
 from ..services.reports import report_service
+from ..services.pdf_render import render_weekly_pdf, timed_render_weekly_pdf
+from ..storage import WeeklySnapshot
 from ..logger import get_logger
 
 logger = get_logger("pdf")
 
+__all__ = ["PDFQueueFull", "PDFService", "pdf_service", "render_weekly_pdf"]
+
+
+class PDFQueueFull(Exception):
+    """Все процессы рендеринга заняты и очередь PDF заполнена."""
+
 
 class PDFService:
     """Сервис для генерации PDF отчетов."""
     
-    def __init__(self, reports_dir: str = "reports"):
-        self.reports_dir = reports_dir
-        if not os.path.exists(reports_dir):
-            os.makedirs(reports_dir)
+    def __init__(self, workers: int = config.pdf_workers, queue_limit: int = config.pdf_queue_limit):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        # Рендеринги в процессах плюс ожидающие свободного процесса
+        self._slots = asyncio.Semaphore(workers + queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+        # Время рендеринга в воркере и ожидания свободного процесса
+        self._render_total = 0.0
+        self._wait_total = 0.0
     
-    async def generate_weekly_pdf(self, tg_id: int, user_name: str = "Пользователь") -> str:
-        """Генерирует PDF отчет за неделю."""
-        filename = f"weekly_{tg_id}_{date.today().strftime('%Y%m%d')}.pdf"
-        filepath = os.path.join(self.reports_dir, filename)
-        
-        # Получаем данные для отчета
-        metrics = await report_service.generate_weekly_metrics(tg_id)
-        habits = await report_service.get_habit_streaks(tg_id)
-        focus_sessions = await report_service.get_focus_sessions(tg_id)
-        mood_trend = await report_service.get_mood_trend(tg_id)
-        productivity = await report_service.get_productivity_score(tg_id)
-        
-        # Создаем PDF
-        doc = SimpleDocTemplate(filepath, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Заголовок
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        story.append(Paragraph(f"Еженедельный отчет - {user_name}", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Общая статистика
-        story.append(Paragraph("Общая статистика", styles['Heading2']))
-        story.append(Spacer(1, 12))
-        
-        stats_data = [
-            ["Метрика", "Значение"],
-            ["Активных дней", str(metrics.get('active_days', 0))],
-            ["Средняя энергия", f"{metrics.get('avg_energy', 0)}/10"],
-            ["Фокус-сессии", f"{metrics.get('focus_minutes', 0)} мин"],
-            ["Привычки", str(metrics.get('habits_count', 0))],
-            ["Балл продуктивности", f"{productivity.get('total_score', 0)}/100"]
-        ]
-        
-        stats_table = Table(stats_data, colWidths=[2*inch, 1.5*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(stats_table)
-        story.append(Spacer(1, 20))
-        
-        # Привычки
-        if habits:
-            story.append(Paragraph("Привычки", styles['Heading2']))
-            story.append(Spacer(1, 12))
-            
-            habits_data = [["Привычка", "Streak", "Последний раз"]]
-            for habit in habits[:5]:  # Показываем топ-5
-                habits_data.append([
-                    habit['name'],
-                    str(habit['streak']),
-                    habit['last_tick'] or "Никогда"
-                ])
-            
-            habits_table = Table(habits_data, colWidths=[2*inch, 1*inch, 1.5*inch])
-            habits_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(habits_table)
-            story.append(Spacer(1, 20))
-        
-        # Тренд настроения
-        if mood_trend:
-            story.append(Paragraph("Тренд настроения", styles['Heading2']))
-            story.append(Spacer(1, 12))
-            
-            mood_data = [["Дата", "Энергия", "Настроение", "Заметка"]]
-            for mood in mood_trend[-7:]:  # Последние 7 записей
-                mood_data.append([
-                    mood['date'],
-                    str(mood['energy']),
-                    str(mood['mood']),
-                    mood['note'][:30] + "..." if len(mood['note']) > 30 else mood['note']
-                ])
-            
-            mood_table = Table(mood_data, colWidths=[1*inch, 0.8*inch, 0.8*inch, 2*inch])
-            mood_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(mood_table)
-            story.append(Spacer(1, 20))
-        
-        # Рекомендации
-        story.append(Paragraph("Рекомендации", styles['Heading2']))
-        story.append(Spacer(1, 12))
-        
-        recommendations = []
-        if productivity['total_score'] < 50:
-            recommendations.append("• Сосредоточьтесь на выполнении основных задач")
-        if metrics.get('focus_minutes', 0) < 60:
-            recommendations.append("• Увеличьте время фокус-сессий")
-        if metrics.get('active_days', 0) < 5:
-            recommendations.append("• Старайтесь быть активными каждый день")
-        if not habits:
-            recommendations.append("• Добавьте полезные привычки")
+    def _pool(self) -> ProcessPoolExecutor:
+        """Пул процессов создается при первом PDF."""
+        if self._executor is None:
+            # spawn: воркеры не наследуют состояние бота (соединения, цикл событий).
+            # Воркер импортирует только pdf_render и main.py, где нет ничего,
+            # кроме запуска, - сборка приложения вынесена в src.app
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    @staticmethod
+    def filename(tg_id: int) -> str:
+        """Имя файла недельного отчета для отправки."""
+        return f"weekly_{tg_id}_{date.today().strftime('%Y%m%d')}.pdf"
+    
+    async def render(self, report: Dict[str, Any], wait: bool = False) -> bytes:
+        """Рендерит PDF в пуле процессов.
         
-        if not recommendations:
-            recommendations.append("• Отличная работа! Продолжайте в том же духе")
+        wait=False - при заполненной очереди сразу выбрасывает PDFQueueFull
+        (запрос пользователя), wait=True - ждет свободного места (рассылка).
+        Отмена ожидания не отменяет рендеринг, уже отданный пулу: место в
+        очереди освобождается, только когда задача в пуле завершится.
+        """
+        if not wait and self._slots.locked():
+            self.rejected += 1
+            raise PDFQueueFull(f"{self.workers + self.queue_limit} PDFs already queued")
         
-        for rec in recommendations:
-            story.append(Paragraph(rec, styles['Normal']))
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            executor = self._pool()
+            future = loop.run_in_executor(executor, timed_render_weekly_pdf, report)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.in_flight += 1
+        future.add_done_callback(partial(self._job_done, executor, loop.time()))
         
-        # Подпись
-        story.append(Spacer(1, 30))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER,
-            textColor=colors.grey
-        )
-        story.append(Paragraph(f"Сгенерировано: {datetime.now().strftime('%d.%m.%Y %H:%M')}", footer_style))
+        pdf, _ = await asyncio.shield(future)
+        return pdf
+    
+    def _job_done(self, executor: ProcessPoolExecutor, submitted: float, future: asyncio.Future) -> None:
+        """Учитывает завершенную задачу пула и освобождает ее место в очереди."""
+        self.in_flight -= 1
+        self._slots.release()
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            _, render_seconds = future.result()
+            self.rendered += 1
+            self._render_total += render_seconds
+            self._wait_total += max(0.0, asyncio.get_running_loop().time() - submitted - render_seconds)
+            return
+        self.failed += 1
+        if isinstance(error, BrokenProcessPool) and self._executor is executor:
+            # Воркер упал (например, OOM) - следующий рендеринг поднимет новый пул
+            self._executor = None
+    
+    async def generate_weekly_pdf(self, tg_id: int, user_name: str = "Пользователь",
+                                  snapshot: Optional[WeeklySnapshot] = None, wait: bool = False) -> bytes:
+        """Генерирует PDF отчет за неделю и возвращает его содержимое."""
+        # Получаем данные для отчета
+        if snapshot is None:
+            snapshot = await report_service.generate_weekly_snapshot(tg_id)
+        report = {
+            "user_name": user_name,
+            "metrics": snapshot.as_metrics(),
+            "habits": await report_service.get_habit_streaks(tg_id),
+            "mood_trend": await report_service.get_mood_trend(tg_id),
+            "productivity": report_service.productivity_score(snapshot),
+        }
         
-        # Собираем PDF
-        doc.build(story)
-        logger.info(f"Generated PDF report: {filepath}")
+        pdf = await self.render(report, wait=wait)
+        logger.info(f"Generated PDF report for user {tg_id}: {len(pdf)} bytes")
         
-        return filepath
+        return pdf
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает метрики рендеринга PDF."""
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "avg_render_ms": round(self._render_total / self.rendered * 1000, 1) if self.rendered else 0.0,
+            "avg_wait_ms": round(self._wait_total / self.rendered * 1000, 1) if self.rendered else 0.0,
+        }
+    
+    def close(self) -> None:
+        """Останавливает процессы рендеринга."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
 
 # Глобальный экземпляр сервиса
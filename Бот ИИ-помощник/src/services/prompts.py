@@ -0,0 +1,158 @@
+"""Сборка промптов GPT с учетом бюджета токенов."""
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Union
+
+from ..logger import get_logger
+
+logger = get_logger("prompts")
+
+# Бюджет входных токенов промпта по методам
+PROMPT_BUDGETS = {
+    "reflect_dialog": 1500,
+    "plan_morning": 1000,
+    "reflect_evening": 1000,
+    "weekly_report": 800,
+    "summarize_memories": 2500,
+    "summarize_dialog": 1500,
+}
+DEFAULT_BUDGET = 1000
+
+# Служебные токены OpenAI на каждое сообщение
+MESSAGE_OVERHEAD = 4
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+KIND_LABELS = {
+    "morning": "утро", "evening": "вечер", "reflect": "диалог", "summary": "итоги", "mood": "настроение",
+}
+
+
+class TokenCounter:
+    """Оценка числа токенов без токенизатора.
+
+    Слово стоит ceil(len/4) токенов, знак препинания - один. Поправочный
+    коэффициент подстраивается под фактический prompt_tokens из ответов
+    OpenAI, поэтому оценка со временем сходится к реальной.
+    """
+
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self.ratio = 1.0
+
+    def raw(self, text: str) -> int:
+        return sum((len(token) + 3) // 4 for token in _TOKEN_RE.findall(text or ""))
+
+    def count(self, text: str) -> int:
+        """Оценка токенов в тексте."""
+        return round(self.raw(text) * self.ratio)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Оценка токенов в списке сообщений chat API."""
+        return sum(self.count(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+    def calibrate(self, messages: List[Dict[str, str]], prompt_tokens: int) -> None:
+        """Уточняет коэффициент по фактическому расходу токенов."""
+        raw = sum(self.raw(m["content"]) for m in messages)
+        if not raw or not prompt_tokens:
+            return
+        actual = max(0, prompt_tokens - MESSAGE_OVERHEAD * len(messages)) / raw
+        self.ratio += self.smoothing * (actual - self.ratio)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Обрезает текст по границе слова, чтобы он уложился в max_tokens."""
+        if self.count(text) <= max_tokens:
+            return text
+        # Оценка аддитивна по словам - ищем длину префикса бинарным поиском
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) + 1 <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text.rfind(" ", 0, low)
+        return text[:cut if cut > low // 2 else low].rstrip() + "…"
+
+
+class PromptBuilder:
+    """Собирает messages для chat API в рамках бюджета токенов.
+
+    Первым идет статический system-промпт метода: он одинаков для всех
+    пользователей, и OpenAI может кэшировать этот префикс. Затем - данные
+    пользователя. Обязательные секции обрезаются по своему лимиту, память
+    заполняет остаток бюджета: сначала свежие записи, более старые, не
+    поместившиеся целиком, сворачиваются в одну строку-сводку.
+    """
+
+    def __init__(self, method: str, instructions: str, budget: Optional[int] = None):
+        self.method = method
+        self.instructions = instructions
+        self.budget = budget or PROMPT_BUDGETS.get(method, DEFAULT_BUDGET)
+        self._parts: List[Union[str, Dict[str, Any]]] = []
+
+    def section(self, text: str, max_tokens: Optional[int] = None) -> "PromptBuilder":
+        """Добавляет секцию пользовательского сообщения."""
+        if max_tokens is not None:
+            text = token_counter.truncate(text, max_tokens)
+        self._parts.append(text)
+        return self
+
+    def memories(self, memories: List[Dict[str, Any]], title: str = "Контекст из памяти:",
+                 max_items: int = 10, item_tokens: int = 80) -> "PromptBuilder":
+        """Добавляет записи памяти (от новых к старым); объем определяется при сборке."""
+        self._parts.append({"title": title, "items": memories[:max_items], "item_tokens": item_tokens})
+        return self
+
+    def build(self) -> List[Dict[str, str]]:
+        """Возвращает messages: system-префикс и сообщение с данными пользователя."""
+        fixed = [part for part in self._parts if isinstance(part, str)]
+        used = (
+            token_counter.count(self.instructions) + token_counter.count("\n\n".join(fixed))
+            + 2 * MESSAGE_OVERHEAD
+        )
+        free = max(0, self.budget - used)
+
+        parts: List[str] = []
+        for part in self._parts:
+            if isinstance(part, str):
+                parts.append(part)
+                continue
+            text, free = self._fit_memories(part, free)
+            parts.append(text)
+
+        messages = [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": "\n\n".join(p for p in parts if p)},
+        ]
+        tokens = token_counter.count_messages(messages)
+        if tokens > self.budget:
+            logger.warning(f"Prompt {self.method} is over budget: {tokens}/{self.budget} tokens")
+        return messages
+
+    @staticmethod
+    def _fit_memories(part: Dict[str, Any], free: int) -> "tuple[str, int]":
+        lines: List[str] = []
+        dropped: Counter = Counter()
+        title_cost = token_counter.count(part["title"]) + 1
+        # Резерв под строку-сводку о непоместившихся записях
+        reserve = 16
+        for memory in part["items"]:
+            line = "- " + token_counter.truncate(memory["content"], part["item_tokens"])
+            cost = token_counter.count(line) + 1
+            if title_cost + cost + reserve > free:
+                dropped[memory.get("kind", "")] += 1
+                continue
+            lines.append(line)
+            free -= cost
+
+        if dropped:
+            kinds = ", ".join(f"{KIND_LABELS.get(kind, kind or 'прочее')}: {n}" for kind, n in dropped.most_common())
+            lines.append(f"- ...и еще {sum(dropped.values())} более ранних записей ({kinds})")
+        if not lines:
+            return "", free
+        return "\n".join([part["title"], *lines]), max(0, free - title_cost)
+
+
+# Глобальный счетчик токенов
+token_counter = TokenCounter()
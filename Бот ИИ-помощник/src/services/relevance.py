@@ -0,0 +1,261 @@
+"""Локальный индекс релевантности: хешированный TF-IDF и косинус на NumPy.
+
+Индекс строится по памяти, записям опросов и заметкам к настроению и
+не требует сети. Документы пользователя хранятся в CSR-массивах
+(indices/data/indptr), поиск - один векторизованный проход по ним.
+Признаки нумеруются в словаре пользователя, поэтому частоты и вектор
+запроса занимают память по числу его признаков, а не по DIM.
+"""
+import asyncio
+import re
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ..config import config
+from ..logger import get_logger
+from ..storage import db
+
+logger = get_logger("relevance")
+
+# Размерность хешированного пространства признаков
+DIM = 1 << 18
+
+# Длина символьных n-грамм
+NGRAM = 3
+
+# Начиная с этого числа документов индекс строится в отдельном потоке
+BULK_THRESHOLD = 500
+
+# Во сколько раз должно вырасти число документов, чтобы пересчитать нормы всех
+IDF_DRIFT = 1.1
+
+SOURCES = ("memory", "entry", "mood")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def features(text: str) -> Counter:
+    """Хешированные признаки текста: слова и символьные триграммы слов.
+
+    Триграммы сглаживают русские окончания: «работа» и «работе» делят
+    большую часть признаков. Встроенный hash() солится при запуске
+    процесса, но индекс живет только в памяти, поэтому это не важно.
+    """
+    counts: Counter = Counter()
+    for word in _WORD_RE.findall(text.lower()):
+        counts[hash("#" + word) % DIM] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - NGRAM + 1):
+            counts[hash(padded[i:i + NGRAM]) % DIM] += 1
+    return counts
+
+
+class UserIndex:
+    """Индекс одного пользователя."""
+
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+        # Последний проиндексированный id по каждому источнику
+        self.last_ids: Dict[str, int] = dict.fromkeys(SOURCES, 0)
+        # Хеш признака -> номер в словаре пользователя (индекс в CSR и в df)
+        self.vocabulary: Dict[int, int] = {}
+        self.df = np.zeros(0, dtype=np.int32)
+        self.loaded = False
+        # Память, добавленная во время первичной загрузки
+        self.backlog: List[Dict[str, Any]] = []
+        self.lock = asyncio.Lock()
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._data = np.zeros(0, dtype=np.float32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._norms = np.zeros(0, dtype=np.float32)
+        # Число документов на момент полного пересчета норм
+        self._norms_base = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """Добавляет документ; уже проиндексированные id пропускаются."""
+        source = document["source"]
+        if document["id"] <= self.last_ids[source]:
+            return
+        self.last_ids[source] = document["id"]
+
+        counts = features(document["content"] or "")
+        if not counts:
+            return
+        vocabulary = self.vocabulary
+        indices = np.fromiter(
+            (vocabulary.setdefault(feature, len(vocabulary)) for feature in counts),
+            dtype=np.int32, count=len(counts)
+        )
+        # Сублинейный TF: повтор слова весит меньше, чем новое слово
+        data = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        self._pending.append((indices, data))
+        self.documents.append({key: document[key] for key in ("kind", "content", "ts")})
+
+    def add_many(self, documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.add(document)
+        self._flush()
+
+    def _flush(self) -> None:
+        """Переносит добавленные документы в CSR-массивы и считает их нормы."""
+        if not self._pending:
+            return
+        start = len(self._indptr) - 1
+        lengths = np.fromiter((len(indices) for indices, _ in self._pending), dtype=np.int64)
+        added = np.concatenate([indices for indices, _ in self._pending])
+        self._indices = np.concatenate([self._indices, added])
+        self._data = np.concatenate([self._data, *(data for _, data in self._pending)])
+        self._indptr = np.concatenate([self._indptr, self._indptr[-1] + np.cumsum(lengths)])
+        self._pending.clear()
+        # Признак входит в документ один раз, поэтому bincount - прирост df
+        df = np.bincount(added, minlength=len(self.vocabulary)).astype(np.int32)
+        df[:len(self.df)] += self.df
+        self.df = df
+
+        # Нормы зависят от IDF; пока коллекция выросла ненамного, старые
+        # нормы остаются прежними, а считаются только нормы новых документов
+        if len(self.documents) > self._norms_base * IDF_DRIFT:
+            start = 0
+            self._norms_base = len(self.documents)
+        self._norms = np.concatenate([self._norms[:start], self._doc_norms(start)])
+
+    def _doc_norms(self, start: int) -> np.ndarray:
+        offset = self._indptr[start]
+        indices = self._indices[offset:]
+        weights = self._data[offset:] * self._idf(self.df[indices])
+        return np.sqrt(np.add.reduceat(weights * weights, self._indptr[start:-1] - offset)).astype(np.float32)
+
+    def _idf(self, df: np.ndarray) -> np.ndarray:
+        return np.log((1.0 + len(self.documents)) / (1.0 + df)) + 1.0
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.1) -> List[Tuple[float, Dict[str, Any]]]:
+        """Документы с наибольшим косинусом к запросу, по убыванию."""
+        counts = features(query)
+        if not counts or not self.documents:
+            return []
+        self._flush()
+
+        # Признаки запроса, которых нет у пользователя (-1), влияют только на норму
+        query_indices = np.fromiter(
+            (self.vocabulary.get(feature, -1) for feature in counts), dtype=np.int64, count=len(counts)
+        )
+        known = query_indices >= 0
+        query_idf = self._idf(np.where(known, self.df[query_indices], 0))
+        query_tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        query_norm = float(np.linalg.norm(query_tf * query_idf))
+
+        # Скалярное произведение tf_d * idf * tf_q * idf через вектор запроса
+        # размером со словарь пользователя
+        dense = np.zeros(len(self.vocabulary), dtype=np.float32)
+        dense[query_indices[known]] = (query_tf * query_idf * query_idf)[known]
+        scores = np.add.reduceat(self._data * dense[self._indices], self._indptr[:-1])
+        scores /= self._norms * query_norm
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), self.documents[i]) for i in top if scores[i] >= min_score]
+
+
+class RelevanceIndex:
+    """Индексы релевантности пользователей с вытеснением давно не нужных (LRU).
+
+    Индекс загружается из БД при первом поиске. Память добавляется сразу
+    при сохранении (add_memory), записи опросов и заметки к настроению
+    догружаются перед каждым поиском по id больше уже проиндексированного.
+    """
+
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, UserIndex]" = OrderedDict()
+        self.searches = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _get(self, tg_id: int) -> UserIndex:
+        index = self._users.get(tg_id)
+        if index is None:
+            index = self._users[tg_id] = UserIndex()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._users.move_to_end(tg_id)
+        return index
+
+    async def search(self, tg_id: int, query: str, limit: int = 5,
+                     min_score: float = 0.1) -> List[Dict[str, Any]]:
+        """Самые близкие к запросу записи пользователя (с полем score)."""
+        index = self._get(tg_id)
+        async with index.lock:
+            await self._catch_up(tg_id, index)
+            results = index.search(query, limit, min_score)
+        self.searches += 1
+        return [dict(document, score=round(score, 3)) for score, document in results]
+
+    async def _catch_up(self, tg_id: int, index: UserIndex) -> None:
+        """Догружает новые записи; при первом обращении - строит индекс целиком."""
+        documents = await db.relevance_documents(
+            tg_id,
+            after_memory=index.last_ids["memory"] if not index.loaded else None,
+            after_entry=index.last_ids["entry"],
+            after_mood=index.last_ids["mood"]
+        )
+        if index.loaded:
+            index.add_many(documents)
+            return
+
+        started = time.perf_counter()
+        if len(documents) >= BULK_THRESHOLD:
+            # Разбор тысяч текстов не должен надолго блокировать event loop
+            await asyncio.to_thread(index.add_many, documents)
+        else:
+            index.add_many(documents)
+        index.add_many(index.backlog)
+        index.backlog.clear()
+        index.loaded = True
+        self.loads += 1
+        logger.info(
+            f"Built relevance index for user {tg_id}: {len(index)} documents "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def add_memory(self, tg_id: int, memory_id: int, kind: str, content: str) -> None:
+        """Добавляет новую запись памяти в индекс, если он уже в памяти."""
+        index = self._users.get(tg_id)
+        if index is None:
+            # Индекса нет - запись попадет в него при загрузке из БД
+            return
+        document = {
+            "source": "memory", "id": memory_id, "kind": kind, "content": content,
+            "ts": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if index.loaded:
+            index.add(document)
+        else:
+            index.backlog.append(document)
+
+    def invalidate(self, tg_id: int) -> None:
+        """Сбрасывает индекс пользователя (например, после сворачивания памяти)."""
+        self._users.pop(tg_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._users),
+            "documents": sum(len(index) for index in self._users.values()),
+            "searches": self.searches,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+# Глобальный индекс релевантности
+relevance_index = RelevanceIndex(max_users=config.relevance_index_users)
@@ -0,0 +1,98 @@
+"""In-memory индекс напоминаний по часовым поясам."""
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+import pytz
+
+from .timeutils import time_utils
+
+KINDS = ("morning", "evening")
+
+
+class ReminderIndex:
+    """Индекс пользователей по (часовой пояс, локальный час).
+
+    Вместо трех задач APScheduler на пользователя планировщик раз в минуту
+    спрашивает у индекса, у кого сейчас наступил нужный локальный час.
+    Часовые пояса группируются по текущему UTC-смещению, поэтому стоимость
+    проверки - O(число поясов + число найденных пользователей).
+    """
+
+    def __init__(self):
+        # user_id -> (tz, morning_hour, evening_hour)
+        self._users: Dict[int, Tuple[str, int, int]] = {}
+        # kind -> tz -> hour -> user_ids
+        self._buckets: Dict[str, Dict[str, Dict[int, Set[int]]]] = {
+            kind: defaultdict(lambda: defaultdict(set)) for kind in KINDS
+        }
+        self._tz_users: Dict[str, int] = defaultdict(int)
+        self._tzinfo: Dict[str, pytz.BaseTzInfo] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def add(self, user_id: int, tz: str, morning_hour: int, evening_hour: int) -> None:
+        """Добавляет или обновляет пользователя."""
+        self.remove(user_id)
+        tz = sys.intern(tz)
+        if tz not in self._tzinfo:
+            self._tzinfo[tz] = time_utils.get_user_timezone(tz)
+
+        self._users[user_id] = (tz, morning_hour, evening_hour)
+        self._buckets["morning"][tz][morning_hour].add(user_id)
+        self._buckets["evening"][tz][evening_hour].add(user_id)
+        self._tz_users[tz] += 1
+
+    def remove(self, user_id: int) -> None:
+        """Удаляет пользователя из индекса."""
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+
+        tz, morning_hour, evening_hour = entry
+        for kind, hour in (("morning", morning_hour), ("evening", evening_hour)):
+            by_hour = self._buckets[kind][tz]
+            by_hour[hour].discard(user_id)
+            if not by_hour[hour]:
+                del by_hour[hour]
+            if not by_hour:
+                del self._buckets[kind][tz]
+
+        self._tz_users[tz] -= 1
+        if not self._tz_users[tz]:
+            del self._tz_users[tz]
+            self._tzinfo.pop(tz, None)
+
+    def timezones_by_offset(self, now_utc: datetime) -> Dict[timedelta, List[str]]:
+        """Группирует часовые пояса пользователей по текущему UTC-смещению."""
+        groups: Dict[timedelta, List[str]] = defaultdict(list)
+        for tz, tzinfo in self._tzinfo.items():
+            groups[now_utc.astimezone(tzinfo).utcoffset()].append(tz)
+        return groups
+
+    def due(self, now_utc: datetime, weekly_weekday: int, weekly_hour: int) -> Dict[str, List[int]]:
+        """Возвращает пользователей, у которых в эту минуту наступил час напоминания."""
+        result: Dict[str, List[int]] = {"morning": [], "evening": [], "weekly": []}
+
+        for offset, zones in self.timezones_by_offset(now_utc).items():
+            local = now_utc + offset
+            if local.minute != 0:
+                continue
+
+            for tz in zones:
+                for kind in KINDS:
+                    users = self._buckets[kind].get(tz, {}).get(local.hour)
+                    if users:
+                        result[kind].extend(users)
+
+                if local.weekday() == weekly_weekday and local.hour == weekly_hour:
+                    # Каждый пользователь пояса лежит ровно в одной утренней корзине
+                    for users in self._buckets["morning"].get(tz, {}).values():
+                        result["weekly"].extend(users)
+
+        return result
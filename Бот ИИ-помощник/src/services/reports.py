@@ -1,8 +1,9 @@
 """Сервис для генерации отчетов."""
-from typing import Dict, Any, List
-from datetime import datetime, timedelta, date
-from ..storage import db
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+from ..storage import db, WeeklySnapshot
 from ..services.gpt import gpt_service
+from ..services.gpt_scheduler import PRIORITY_INTERACTIVE
 from ..logger import get_logger
 
 logger = get_logger("reports")
@@ -11,54 +12,31 @@ logger = get_logger("reports")
 class ReportService:
     """Сервис для генерации отчетов."""
     
+    @staticmethod
+    async def generate_weekly_snapshot(tg_id: int) -> WeeklySnapshot:
+        """Получает недельные метрики одним запросом."""
+        return await db.weekly_snapshot(tg_id)
+    
     @staticmethod
     async def generate_weekly_metrics(tg_id: int) -> Dict[str, Any]:
         """Генерирует метрики за неделю."""
-        week_ago = (datetime.now() - timedelta(days=7)).date()
-        
-        # Базовые метрики из storage
-        base_metrics = await db.week_stats(tg_id)
-        
-        # Дополнительные метрики
-        # Количество привычек
-        async with db._connection.execute("""
-            SELECT COUNT(*) FROM habits WHERE tg_id = ?
-        """, (tg_id,)) as cursor:
-            habits_count = (await cursor.fetchone())[0]
-        
-        # Среднее настроение
-        async with db._connection.execute("""
-            SELECT AVG(mood) FROM mood 
-            WHERE tg_id = ? AND date >= ?
-        """, (tg_id, week_ago.isoformat())) as cursor:
-            avg_mood = (await cursor.fetchone())[0] or 5
-        
-        # Количество дней с записями
-        async with db._connection.execute("""
-            SELECT COUNT(DISTINCT date) FROM entries 
-            WHERE tg_id = ? AND date >= ?
-        """, (tg_id, week_ago.isoformat())) as cursor:
-            active_days = (await cursor.fetchone())[0]
-        
-        return {
-            **base_metrics,
-            "habits_count": habits_count,
-            "avg_mood": round(avg_mood, 1),
-            "active_days": active_days,
-            "week_start": week_ago.isoformat(),
-            "week_end": date.today().isoformat()
-        }
+        snapshot = await db.weekly_snapshot(tg_id)
+        return snapshot.as_metrics()
     
     @staticmethod
-    async def generate_weekly_report(tg_id: int, persona: str = "mentor") -> str:
+    async def generate_weekly_report(tg_id: int, persona: str = "mentor",
+                                     snapshot: Optional[WeeklySnapshot] = None,
+                                     priority: str = PRIORITY_INTERACTIVE,
+                                     budget: Optional[float] = None) -> str:
         """Генерирует еженедельный отчет."""
-        metrics = await ReportService.generate_weekly_metrics(tg_id)
-        return await gpt_service.weekly_report(metrics, persona)
+        if snapshot is None:
+            snapshot = await db.weekly_snapshot(tg_id)
+        return await gpt_service.weekly_report(snapshot.as_metrics(), persona, priority=priority, budget=budget)
     
     @staticmethod
     async def get_habit_streaks(tg_id: int) -> List[Dict[str, Any]]:
         """Получает streak'и привычек."""
-        async with db._connection.execute("""
+        async with db.read() as conn, conn.execute("""
             SELECT name, streak, last_tick FROM habits 
             WHERE tg_id = ? 
             ORDER BY streak DESC
@@ -78,7 +56,7 @@ class ReportService:
         """Получает сессии фокуса за период."""
         since = (datetime.now() - timedelta(days=days)).date()
         
-        async with db._connection.execute("""
+        async with db.read() as conn, conn.execute("""
             SELECT started_at, duration, status FROM pomodoro 
             WHERE tg_id = ? AND DATE(started_at) >= ?
             ORDER BY started_at DESC
@@ -98,7 +76,7 @@ class ReportService:
         """Получает тренд настроения."""
         since = (datetime.now() - timedelta(days=days)).date()
         
-        async with db._connection.execute("""
+        async with db.read() as conn, conn.execute("""
             SELECT date, energy, mood, note FROM mood 
             WHERE tg_id = ? AND date >= ?
             ORDER BY date ASC
@@ -115,27 +93,33 @@ class ReportService:
             ]
     
     @staticmethod
-    async def get_productivity_score(tg_id: int) -> Dict[str, Any]:
+    async def get_productivity_score(tg_id: int,
+                                     snapshot: Optional[WeeklySnapshot] = None) -> Dict[str, Any]:
         """Вычисляет общий балл продуктивности."""
-        metrics = await ReportService.generate_weekly_metrics(tg_id)
-        
+        if snapshot is None:
+            snapshot = await db.weekly_snapshot(tg_id)
+        return ReportService.productivity_score(snapshot)
+    
+    @staticmethod
+    def productivity_score(snapshot: WeeklySnapshot) -> Dict[str, Any]:
+        """Вычисляет балл продуктивности по готовым метрикам."""
         # Простая формула продуктивности
         score = 0
         
         # Активность (максимум 30 баллов)
-        activity_score = min(30, metrics.get('active_days', 0) * 4.3)
+        activity_score = min(30, snapshot.active_days * 4.3)
         score += activity_score
         
         # Фокус (максимум 25 баллов)
-        focus_score = min(25, metrics.get('focus_minutes', 0) / 4)
+        focus_score = min(25, snapshot.focus_minutes / 4)
         score += focus_score
         
         # Энергия (максимум 25 баллов)
-        energy_score = min(25, metrics.get('avg_energy', 5) * 2.5)
+        energy_score = min(25, snapshot.avg_energy * 2.5)
         score += energy_score
         
         # Привычки (максимум 20 баллов)
-        habits_score = min(20, metrics.get('habits_count', 0) * 4)
+        habits_score = min(20, snapshot.habits_count * 4)
         score += habits_score
         
         total_score = min(100, score)
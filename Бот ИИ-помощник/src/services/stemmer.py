@@ -0,0 +1,139 @@
+"""Стеммер русского языка (алгоритм Snowball/Портера) с LRU-кэшем основ.
+
+Чистый Python без зависимостей. Словоформы сводятся к общей основе:
+«устала», «устал» -> «уста»; «парковкой», «парковки» -> «парковк».
+Слова в заметках повторяются, поэтому основы кэшируются: stem() -
+кэшированная версия stem_word().
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from ..config import config
+
+VOWELS = frozenset("аеиоуыэюя")
+
+# Окончания: True - окончание должно идти после «а» или «я» (сама буква остается)
+PERFECTIVE_GERUND = {
+    "в": True, "вши": True, "вшись": True,
+    "ив": False, "ивши": False, "ившись": False, "ыв": False, "ывши": False, "ывшись": False,
+}
+REFLEXIVE = {"ся": False, "сь": False}
+ADJECTIVE = dict.fromkeys((
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+), False)
+PARTICIPLE = {
+    "ем": True, "нн": True, "вш": True, "ющ": True, "щ": True,
+    "ивш": False, "ывш": False, "ующ": False,
+}
+VERB = {
+    **dict.fromkeys((
+        "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно",
+    ), True),
+    **dict.fromkeys((
+        "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен",
+        "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю",
+    ), False),
+}
+NOUN = dict.fromkeys((
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й",
+    "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+), False)
+SUPERLATIVE = {"ейше": False, "ейш": False}
+DERIVATIONAL = ("ость", "ост")
+
+
+def _by_length(endings: Dict[str, bool]) -> Tuple[Tuple[str, bool], ...]:
+    return tuple(sorted(endings.items(), key=lambda item: len(item[0]), reverse=True))
+
+
+# Snowball выбирает самое длинное подходящее окончание
+_PERFECTIVE_GERUND = _by_length(PERFECTIVE_GERUND)
+_REFLEXIVE = _by_length(REFLEXIVE)
+_ADJECTIVE = _by_length(ADJECTIVE)
+_PARTICIPLE = _by_length(PARTICIPLE)
+_VERB = _by_length(VERB)
+_NOUN = _by_length(NOUN)
+_SUPERLATIVE = _by_length(SUPERLATIVE)
+
+
+def _remove(rv: str, endings: Tuple[Tuple[str, bool], ...]) -> Optional[str]:
+    """Срезает самое длинное окончание из списка; None, если срезать нечего."""
+    for ending, after_a in endings:
+        if rv.endswith(ending):
+            if after_a and not (len(rv) > len(ending) and rv[-len(ending) - 1] in "ая"):
+                return None
+            return rv[:-len(ending)]
+    return None
+
+
+def _regions(word: str) -> Tuple[int, int]:
+    """Начала областей RV (после первой гласной) и R2 алгоритма Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def stem_word(word: str) -> str:
+    """Основа слова без кэша."""
+    word = word.lower().replace("ё", "е")
+    rv_start, r2 = _regions(word)
+    rv = word[rv_start:]
+    if not rv:
+        return word
+
+    # Шаг 1: деепричастие; иначе возвратность, затем прилагательное
+    # (с причастием), глагол или существительное
+    stripped = _remove(rv, _PERFECTIVE_GERUND)
+    if stripped is None:
+        rv = _remove(rv, _REFLEXIVE) or rv
+        adjective = _remove(rv, _ADJECTIVE)
+        if adjective is not None:
+            participle = _remove(adjective, _PARTICIPLE)
+            rv = adjective if participle is None else participle
+        else:
+            for endings in (_VERB, _NOUN):
+                stripped = _remove(rv, endings)
+                if stripped is not None:
+                    rv = stripped
+                    break
+    else:
+        rv = stripped
+
+    # Шаг 2: конечная «и»
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix):
+            if rv_start + len(rv) - len(suffix) >= r2:
+                rv = rv[:-len(suffix)]
+            break
+
+    # Шаг 4: «нн» -> «н», превосходная степень, мягкий знак
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        superlative = _remove(rv, _SUPERLATIVE)
+        if superlative is not None:
+            rv = superlative[:-1] if superlative.endswith("нн") else superlative
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+
+    return word[:rv_start] + rv
+
+
+# Кэш основ: слово -> основа, вытесняются давно не встречавшиеся слова
+stem = lru_cache(maxsize=config.stem_cache_size)(stem_word)
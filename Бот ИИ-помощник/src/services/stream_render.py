@@ -0,0 +1,95 @@
+"""Постепенный вывод потокового ответа GPT в сообщения Telegram."""
+import asyncio
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from ..logger import get_logger
+from . import ux
+
+logger = get_logger("stream_render")
+
+# Курсор в конце еще не дописанного текста
+CURSOR = " ▌"
+
+# Telegram принимает до 4096 символов; запас на разметку форматтера
+PART_LIMIT = 3500
+
+
+def _split_point(text: str, start: int, limit: int) -> int:
+    """Позиция разреза не дальше limit символов: по абзацу, строке или пробелу."""
+    end = start + limit
+    for separator in ("\n\n", "\n", " "):
+        cut = text.rfind(separator, start + limit // 2, end)
+        if cut != -1:
+            return cut + len(separator)
+    return end
+
+
+async def _edit(message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> float:
+    """Редактирует сообщение; возвращает, сколько секунд просит подождать Telegram."""
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except TelegramRetryAfter as e:
+        return float(e.retry_after)
+    except TelegramBadRequest as e:
+        # Текст не изменился - не ошибка
+        if "message is not modified" not in str(e):
+            raise
+    return 0.0
+
+
+async def render_stream(
+    target: Message,
+    chunks: AsyncIterator[str],
+    formatter: Callable[[str], str] = ux.escape,
+    placeholder: str = "⏳ Думаю...",
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    interval: float = 1.0
+) -> str:
+    """Показывает ответ по мере генерации и возвращает его полный текст.
+
+    Сначала отправляется заглушка; первый фрагмент заменяет ее сразу,
+    дальше правки идут не чаще раза в interval секунд (лимит Telegram
+    на правки в чате). Длинный ответ продолжается новыми сообщениями,
+    клавиатура ставится на последнее. Если вывод в Telegram упал, поток
+    закрывается сразу: он держит слот лимитера и HTTP-ответ OpenAI.
+    """
+    text = ""
+    offset = 0
+    # Первый фрагмент показываем сразу, дальше правим не чаще interval
+    next_edit = 0.0
+
+    async with aclosing(chunks):
+        messages: List[Message] = [await target.answer(placeholder)]
+        async for piece in chunks:
+            text += piece
+
+            while len(text) - offset > PART_LIMIT:
+                cut = _split_point(text, offset, PART_LIMIT)
+                await _edit_final(messages[-1], formatter(text[offset:cut].strip()))
+                offset = cut
+                messages.append(await target.answer(placeholder))
+                next_edit = time.monotonic() + interval
+
+            now = time.monotonic()
+            if now >= next_edit and text[offset:].strip():
+                wait = await _edit(messages[-1], formatter(text[offset:].strip()) + CURSOR)
+                next_edit = now + max(interval, wait)
+
+    await _edit_final(messages[-1], formatter(text[offset:].strip()), reply_markup)
+    logger.info(f"Streamed {len(text)} chars into {len(messages)} message(s)")
+    return text
+
+
+async def _edit_final(message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+    """Финальная правка: при RetryAfter ждет и повторяет, иначе текст останется недописанным."""
+    for _ in range(3):
+        wait = await _edit(message, text, reply_markup)
+        if not wait:
+            return
+        await asyncio.sleep(wait)
+    logger.warning(f"Final edit of message {message.message_id} was rate limited")
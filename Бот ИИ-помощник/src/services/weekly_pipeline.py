@@ -0,0 +1,124 @@
+"""Конвейер еженедельных отчетов для когорты часового пояса."""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiogram.types import BufferedInputFile
+
+from ..config import config
+from ..storage import db, User, WeeklySnapshot
+from ..logger import get_logger
+from .delivery import delivery_queue
+from .gpt_scheduler import PRIORITY_BATCH
+from .pdf import pdf_service
+from .reports import report_service
+
+logger = get_logger("weekly_pipeline")
+
+
+@dataclass
+class WaveReport:
+    """Итоги волны еженедельных отчетов."""
+    cohort_size: int = 0
+    sent: int = 0
+    failed: int = 0
+    pdfs: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль задержки на пользователя в секундах."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "cohort_size": self.cohort_size,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pdfs": self.pdfs,
+            "elapsed": round(self.elapsed, 3),
+            "p50": round(self.percentile(0.5), 3),
+            "p95": round(self.percentile(0.95), 3),
+        }
+
+
+class WeeklyReportPipeline:
+    """Рассылка еженедельных отчетов когорте пользователей.
+
+    Метрики всей когорты считаются одним запросом, генерация через GPT
+    идет с ограниченной конкурентностью, PDF рендерится вне цикла событий.
+    Каждый готовый отчет сразу уходит в очередь доставки, не дожидаясь
+    остальных.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = concurrency or config.weekly_report_concurrency
+        self.last_wave: Optional[Dict[str, Any]] = None
+
+    async def run(self, user_ids: List[int]) -> WaveReport:
+        """Генерирует и отправляет отчеты пользователям когорты."""
+        started = time.perf_counter()
+        report = WaveReport(cohort_size=len(user_ids))
+
+        users = await db.get_users(user_ids)
+        snapshots = await db.weekly_snapshots(list(users))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(user: User) -> None:
+            try:
+                await self._process_user(user, snapshots[user.tg_id], semaphore, report)
+                report.sent += 1
+            except Exception as e:
+                report.failed += 1
+                logger.error(f"Weekly report error for user {user.tg_id}: {e}")
+
+        await asyncio.gather(*(process(user) for user in users.values()))
+
+        report.failed += len(user_ids) - len(users)
+        report.elapsed = time.perf_counter() - started
+        self.last_wave = report.as_dict()
+        logger.info(
+            f"Weekly wave: {report.sent}/{report.cohort_size} sent, {report.failed} failed, "
+            f"{report.pdfs} PDFs in {report.elapsed:.2f}s "
+            f"(p50 {report.percentile(0.5):.2f}s, p95 {report.percentile(0.95):.2f}s)"
+        )
+        return report
+
+    async def _process_user(self, user: User, snapshot: WeeklySnapshot,
+                            semaphore: asyncio.Semaphore, report: WaveReport) -> None:
+        # Ограничиваем только генерацию: доставка и PDF не занимают слот GPT
+        async with semaphore:
+            user_started = time.perf_counter()
+            text = await report_service.generate_weekly_report(
+                user.tg_id, user.persona, snapshot=snapshot, priority=PRIORITY_BATCH
+            )
+
+        await delivery_queue.send_message(user.tg_id, f"📊 Ваш еженедельный отчет:\n\n{text}")
+        report.latencies.append(time.perf_counter() - user_started)
+
+        # Если пользователь на Ultimate плане, генерируем PDF
+        if user.plan_tier == "ultimate":
+            try:
+                # Рассылка ждет свободного процесса, а не отказывается от PDF
+                pdf = await pdf_service.generate_weekly_pdf(
+                    tg_id=user.tg_id,
+                    user_name=user.tz,  # Используем tz как имя пользователя
+                    snapshot=snapshot,
+                    wait=True
+                )
+                await delivery_queue.send_document(
+                    user.tg_id,
+                    document=BufferedInputFile(pdf, filename=pdf_service.filename(user.tg_id)),
+                    caption="📄 PDF отчет за неделю"
+                )
+                report.pdfs += 1
+            except Exception as e:
+                logger.error(f"PDF generation error for user {user.tg_id}: {e}")
+
+
+# Глобальный экземпляр конвейера
+weekly_pipeline = WeeklyReportPipeline()
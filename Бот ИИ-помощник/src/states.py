@@ -78,3 +78,8 @@ class Settings(StatesGroup):
 class Abstinence(StatesGroup):
     """Состояния для воздержания."""
     add = State()  # Добавление воздержания
+
+
+class Search(StatesGroup):
+    """Состояния для поиска по истории."""
+    query = State()  # Ввод поискового запроса
@@ -0,0 +1,66 @@
+"""Накопленная статистика настроения: онлайн-алгоритм Уэлфорда."""
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Сколько последних оценок (mood, energy) хранится в кольцевом буфере
+RECENT_MOODS = 14
+
+
+@dataclass
+class MoodStats:
+    """Статистика настроения и энергии пользователя за всю историю.
+
+    Среднее и сумма квадратов отклонений от него (M2) обновляются за O(1)
+    на запись без пересчета по истории. recent - кольцевой буфер последних
+    RECENT_MOODS пар (mood, energy), по байту на значение; следующая пара
+    пишется в позицию count % RECENT_MOODS.
+    """
+    tg_id: int
+    count: int = 0
+    mood_mean: float = 0.0
+    mood_m2: float = 0.0
+    energy_mean: float = 0.0
+    energy_m2: float = 0.0
+    recent: bytes = b""
+
+    def add(self, mood: int, energy: int) -> None:
+        """Учитывает новую оценку."""
+        slot = self.count % RECENT_MOODS * 2
+        self.count += 1
+
+        delta = mood - self.mood_mean
+        self.mood_mean += delta / self.count
+        self.mood_m2 += delta * (mood - self.mood_mean)
+
+        delta = energy - self.energy_mean
+        self.energy_mean += delta / self.count
+        self.energy_m2 += delta * (energy - self.energy_mean)
+
+        self.recent = self.recent[:slot] + bytes((mood, energy)) + self.recent[slot + 2:]
+
+    @property
+    def mood_std(self) -> float:
+        """Выборочное стандартное отклонение настроения."""
+        return math.sqrt(self.mood_m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def energy_std(self) -> float:
+        """Выборочное стандартное отклонение энергии."""
+        return math.sqrt(self.energy_m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def recent_pairs(self) -> List[Tuple[int, int]]:
+        """Последние оценки (mood, energy) от старых к новым."""
+        # Пока буфер не заполнен, самая старая пара лежит в начале
+        head = self.count % RECENT_MOODS * 2 if self.count > RECENT_MOODS else 0
+        ordered = self.recent[head:] + self.recent[:head]
+        return [(ordered[i], ordered[i + 1]) for i in range(0, len(ordered), 2)]
+
+    def recent_mood(self) -> Optional[float]:
+        """Среднее настроение по последним оценкам."""
+        pairs = self.recent_pairs()
+        return sum(mood for mood, _ in pairs) / len(pairs) if pairs else None
+
+    def as_row(self) -> tuple:
+        return (self.tg_id, self.count, self.mood_mean, self.mood_m2,
+                self.energy_mean, self.energy_m2, self.recent)
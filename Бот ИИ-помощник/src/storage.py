@@ -1,12 +1,19 @@
 """Управление базой данных SQLite."""
+import asyncio
 import aiosqlite
 import json
+import re
+from contextlib import asynccontextmanager
 from datetime import datetime, date, timedelta
-from typing import Optional, List, Dict, Any, Tuple
-from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator, Awaitable, Callable, Union
+from dataclasses import dataclass, field
 
+from .cache import TTLCache, MISSING
 from .config import config
 from .logger import get_logger
+from .migrations import run_migrations, rebuild_daily_rollups
+from .stats import MoodStats
+from .services.stemmer import stem
 
 logger = get_logger("storage")
 
@@ -28,25 +35,280 @@ class User:
     ref_count: int = 0
 
 
+@dataclass
+class WeeklySnapshot:
+    """Агрегированные метрики пользователя за неделю."""
+    tg_id: int
+    week_start: date
+    week_end: date
+    entries_count: int = 0
+    active_days: int = 0
+    avg_energy: float = 0
+    avg_mood: float = 5
+    focus_minutes: int = 0
+    habits_count: int = 0
+    daily_activity: Dict[str, int] = field(default_factory=dict)
+    # Обычное настроение пользователя за всю историю (из mood_stats)
+    mood_baseline: Optional[float] = None
+    mood_spread: float = 0
+    
+    def as_metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики в формате словаря для отчетов и GPT."""
+        return {
+            "entries_count": self.entries_count,
+            "avg_energy": self.avg_energy,
+            "daily_activity": self.daily_activity,
+            "focus_minutes": self.focus_minutes,
+            "habits_count": self.habits_count,
+            "avg_mood": self.avg_mood,
+            "active_days": self.active_days,
+            "mood_baseline": self.mood_baseline,
+            "mood_spread": self.mood_spread,
+            "week_start": self.week_start.isoformat(),
+            "week_end": self.week_end.isoformat()
+        }
+
+
+# Операция записи: оператор (sql, params) или корутина над соединением
+WriteOperation = Union[Tuple[str, tuple], Callable[[aiosqlite.Connection], Awaitable[Any]]]
+
+# Маркеры совпадений в сниппетах поиска (заменяются на разметку при выводе)
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+_SEARCH_TERM_RE = re.compile(r"\w+")
+
+# Строка истории настроения числами: день от 1970-01-01, секунды UTC, оценки
+MOOD_NUMBERS = (
+    "CAST(julianday(date) - 2440587.5 AS INTEGER), CAST(strftime('%s', ts) AS INTEGER), mood, energy"
+)
+
+
+def fts_query(text: str, max_terms: int = 8) -> Optional[str]:
+    """Запрос FTS5 из текста пользователя: слова становятся префиксами.
+    
+    Синтаксис FTS5 из ввода не пропускается - берутся только слова. Слово
+    заменяется основой, чтобы «парковкой» находило «парковки»; слишком
+    короткая основа совпала бы со всем подряд, и тогда слово берется целиком.
+    """
+    terms = []
+    for word in _SEARCH_TERM_RE.findall(text.lower())[:max_terms]:
+        root = stem(word)
+        terms.append(f'"{root if len(root) >= 3 else word}"*')
+    return " AND ".join(terms) or None
+
+
+class WriteBatcher:
+    """Group commit: копит операции записи и фиксирует их одной транзакцией.
+    
+    Подряд идущие операторы (sql, params) отправляются в поток aiosqlite без
+    ожидания друг друга, составные операции выполняются последовательно.
+    Если пачка падает, она откатывается и повторяется по одной операции,
+    чтобы ошибка одной операции не затрагивала остальные. Вызывающий получает
+    результат только после COMMIT своей пачки.
+    """
+    
+    def __init__(self, connection: aiosqlite.Connection, max_batch: int = 64,
+                 max_delay: float = 0.002):
+        self.connection = connection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.operations = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Запускает фоновый цикл фиксации."""
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Фиксирует оставшиеся операции и останавливает цикл."""
+        if self._task:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+    
+    async def submit(self, operation: WriteOperation) -> Any:
+        """Ставит операцию в очередь и ждет фиксации ее пачки."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+    
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            if self.max_delay > 0 and self._queue.empty():
+                await asyncio.sleep(self.max_delay)
+            
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._flush(batch)
+            if stopping:
+                return
+    
+    async def _flush(self, batch: List[Tuple[WriteOperation, asyncio.Future]]) -> None:
+        try:
+            results = await self._commit([operation for operation, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Изолируем сбойную операцию: повторяем пачку по одной
+                logger.warning(f"Write batch of {len(batch)} failed, retrying one by one: {e}")
+                for item in batch:
+                    await self._flush([item])
+                return
+            
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.operations += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _commit(self, operations: List[WriteOperation]) -> List[Any]:
+        """Выполняет пачку в одной транзакции; при ошибке откатывает ее целиком."""
+        results: List[Any] = []
+        pending = []
+        try:
+            await self.connection.execute("BEGIN")
+            for operation in operations:
+                if isinstance(operation, tuple):
+                    pending.append(self._statement(*operation))
+                    continue
+                results += await asyncio.gather(*pending)
+                pending = []
+                results.append(await operation(self.connection))
+            results += await asyncio.gather(*pending)
+            await self.connection.commit()
+            return results
+        except Exception:
+            await self.connection.rollback()
+            raise
+    
+    async def _statement(self, sql: str, params: tuple) -> int:
+        cursor = await self.connection.execute(sql, params)
+        return cursor.rowcount
+
+
 class Database:
-    """Класс для работы с базой данных."""
+    """Класс для работы с базой данных.
+    
+    Использует WAL и раздельные полосы: одно соединение для записи
+    (``_connection``) и пул соединений только для чтения.
+    """
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, pool_size: Optional[int] = None,
+                 write_batch_size: Optional[int] = None):
         self.db_path = db_path or config.db_path
+        self.pool_size = config.db_pool_size if pool_size is None else pool_size
+        self.write_batch_size = (
+            config.db_write_batch_size if write_batch_size is None else write_batch_size
+        )
         self._connection: Optional[aiosqlite.Connection] = None
+        self._batcher: Optional[WriteBatcher] = None
+        self.user_cache = TTLCache(maxsize=config.user_cache_size, ttl=config.user_cache_ttl)
+        self._user_writes = 0
+        self._readers: List[aiosqlite.Connection] = []
+        self._read_pool: Optional[asyncio.Queue] = None
+        # Выставляется в конце connect(): миграции применены, пул чтения и батчер запущены
+        self.ready = asyncio.Event()
     
     async def connect(self):
         """Подключается к базе данных."""
-        self._connection = await aiosqlite.connect(self.db_path)
+        self._connection = await self._open_connection()
+        async with self._connection.execute("PRAGMA journal_mode=WAL") as cursor:
+            journal_mode = (await cursor.fetchone())[0]
         await self._create_tables()
-        logger.info("Database connected")
+        
+        # In-memory база не разделяется между соединениями - читаем через writer
+        pool_size = 0 if self.db_path == ":memory:" else self.pool_size
+        self._read_pool = asyncio.Queue()
+        for _ in range(pool_size):
+            reader = await self._open_connection(read_only=True)
+            self._readers.append(reader)
+            self._read_pool.put_nowait(reader)
+        
+        if self.write_batch_size > 1:
+            self._batcher = WriteBatcher(
+                self._connection,
+                max_batch=self.write_batch_size,
+                max_delay=config.db_write_batch_delay_ms / 1000
+            )
+            self._batcher.start()
+        
+        self.ready.set()
+        logger.info(f"Database connected (journal={journal_mode}, readers={len(self._readers)})")
     
     async def close(self):
-        """Закрывает соединение с базой данных."""
+        """Закрывает соединения с базой данных."""
+        self.ready.clear()
+        if self._batcher:
+            await self._batcher.stop()
+            self._batcher = None
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._read_pool = None
         if self._connection:
             await self._connection.close()
+            self._connection = None
             logger.info("Database disconnected")
     
+    async def _open_connection(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Открывает соединение и применяет PRAGMA из конфигурации."""
+        connection = await aiosqlite.connect(self.db_path)
+        await connection.execute(f"PRAGMA synchronous={config.db_synchronous}")
+        await connection.execute(f"PRAGMA cache_size={int(config.db_cache_size)}")
+        await connection.execute(f"PRAGMA mmap_size={int(config.db_mmap_size)}")
+        await connection.execute(f"PRAGMA busy_timeout={int(config.db_busy_timeout)}")
+        if read_only:
+            await connection.execute("PRAGMA query_only=ON")
+        return connection
+    
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Выдает соединение из пула чтения (или writer, если пул пуст)."""
+        if not self._readers:
+            yield self._connection
+            return
+        
+        reader = await self._read_pool.get()
+        try:
+            yield reader
+        finally:
+            self._read_pool.put_nowait(reader)
+    
+    async def _write(self, operation: WriteOperation) -> Any:
+        """Выполняет операцию записи через group commit (или сразу, если он выключен)."""
+        if self._batcher:
+            return await self._batcher.submit(operation)
+        
+        if isinstance(operation, tuple):
+            sql, params = operation
+            cursor = await self._connection.execute(sql, params)
+            result = cursor.rowcount
+        else:
+            result = await operation(self._connection)
+        await self._connection.commit()
+        return result
+    
+    async def execute_write(self, sql: str, params: tuple = ()) -> int:
+        """Выполняет одиночный оператор записи и возвращает rowcount."""
+        return await self._write((sql, params))
+    
     async def _create_tables(self):
         """Создает таблицы в базе данных."""
         async with self._connection.execute("""
@@ -170,11 +432,14 @@ class Database:
         
         await self._connection.commit()
         logger.info("Database tables created/verified")
+        
+        schema_version = await run_migrations(self._connection)
+        logger.info(f"Database schema version: {schema_version}")
     
     # User management
     async def upsert_user(self, user: User) -> None:
         """Создает или обновляет пользователя."""
-        await self._connection.execute("""
+        await self.execute_write("""
             INSERT OR REPLACE INTO users 
             (tg_id, created_at, plan_tier, subscription_until, trial_until, 
              tz, morning_hour, evening_hour, language, persona, ref_code, ref_count)
@@ -184,31 +449,80 @@ class Database:
             user.trial_until, user.tz, user.morning_hour, user.evening_hour,
             user.language, user.persona, user.ref_code, user.ref_count
         ))
-        await self._connection.commit()
+        self._invalidate_user(user.tg_id)
+    
+    def _invalidate_user(self, tg_id: int) -> None:
+        """Сбрасывает пользователя из кэша после изменения."""
+        self._user_writes += 1
+        self.user_cache.invalidate(tg_id)
     
     async def get_user(self, tg_id: int) -> Optional[User]:
-        """Получает пользователя по ID."""
-        async with self._connection.execute(
+        """Получает пользователя по ID (через кэш)."""
+        cached = self.user_cache.get(tg_id)
+        if cached is not MISSING:
+            return cached
+        
+        # Не кэшируем результат, если во время запроса пользователи менялись
+        writes_before = self._user_writes
+        user = None
+        async with self.read() as conn, conn.execute(
             "SELECT * FROM users WHERE tg_id = ?", (tg_id,)
         ) as cursor:
             row = await cursor.fetchone()
             if row:
-                return User(
-                    tg_id=row[0], created_at=datetime.fromisoformat(row[1]),
-                    plan_tier=row[2], subscription_until=datetime.fromisoformat(row[3]) if row[3] else None,
-                    trial_until=datetime.fromisoformat(row[4]) if row[4] else None,
-                    tz=row[5], morning_hour=row[6], evening_hour=row[7],
-                    language=row[8], persona=row[9], ref_code=row[10], ref_count=row[11]
-                )
-        return None
+                user = self._row_to_user(row)
+        
+        if writes_before == self._user_writes:
+            self.user_cache.set(tg_id, user)
+        return user
+    
+    async def get_users(self, tg_ids: List[int]) -> Dict[int, User]:
+        """Получает пользователей пачкой одним запросом (кэш не используется)."""
+        async with self.read() as conn, conn.execute(
+            "SELECT * FROM users WHERE tg_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(tg_ids)),)
+        ) as cursor:
+            return {row[0]: self._row_to_user(row) for row in await cursor.fetchall()}
+    
+    @staticmethod
+    def _row_to_user(row: tuple) -> User:
+        return User(
+            tg_id=row[0], created_at=datetime.fromisoformat(row[1]),
+            plan_tier=row[2], subscription_until=datetime.fromisoformat(row[3]) if row[3] else None,
+            trial_until=datetime.fromisoformat(row[4]) if row[4] else None,
+            tz=row[5], morning_hour=row[6], evening_hour=row[7],
+            language=row[8], persona=row[9], ref_code=row[10], ref_count=row[11]
+        )
+    
+    async def count_users(self) -> int:
+        """Возвращает количество пользователей."""
+        async with self.read() as conn, conn.execute("SELECT COUNT(*) FROM users") as cursor:
+            return (await cursor.fetchone())[0]
+    
+    async def iter_user_schedules(self, chunk_size: int = 1000) -> AsyncIterator[List[Tuple[int, str, int, int]]]:
+        """Потоково отдает (tg_id, tz, morning_hour, evening_hour) с keyset-пагинацией."""
+        last_id = -(2 ** 63)
+        while True:
+            async with self.read() as conn, conn.execute("""
+                SELECT tg_id, tz, morning_hour, evening_hour FROM users
+                WHERE tg_id > ?
+                ORDER BY tg_id
+                LIMIT ?
+            """, (last_id, chunk_size)) as cursor:
+                rows = await cursor.fetchall()
+            
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
     
     async def set_plan(self, tg_id: int, plan_tier: str, expires_at: Optional[datetime] = None) -> None:
         """Устанавливает план пользователя."""
-        await self._connection.execute(
+        await self.execute_write(
             "UPDATE users SET plan_tier = ?, subscription_until = ? WHERE tg_id = ?",
             (plan_tier, expires_at, tg_id)
         )
-        await self._connection.commit()
+        self._invalidate_user(tg_id)
     
     async def is_pro(self, tg_id: int) -> bool:
         """Проверяет, есть ли у пользователя активная подписка."""
@@ -231,16 +545,15 @@ class Database:
     async def save_entry(self, tg_id: int, entry_type: str, data: Dict[str, Any]) -> None:
         """Сохраняет запись утреннего/вечернего опроса."""
         today = date.today().isoformat()
-        await self._connection.execute("""
+        await self.execute_write("""
             INSERT INTO entries (tg_id, date, type, data)
             VALUES (?, ?, ?, ?)
         """, (tg_id, today, entry_type, json.dumps(data)))
-        await self._connection.commit()
     
     async def today_has(self, tg_id: int, entry_type: str) -> bool:
         """Проверяет, есть ли запись за сегодня."""
         today = date.today().isoformat()
-        async with self._connection.execute("""
+        async with self.read() as conn, conn.execute("""
             SELECT COUNT(*) FROM entries 
             WHERE tg_id = ? AND date = ? AND type = ?
         """, (tg_id, today, entry_type)) as cursor:
@@ -252,12 +565,13 @@ class Database:
         """Отмечает привычку и возвращает текущий streak."""
         today = date.today()
         
-        # Получаем текущий streak
-        async with self._connection.execute("""
-            SELECT streak, last_tick FROM habits 
-            WHERE tg_id = ? AND name = ?
-        """, (tg_id, habit_name)) as cursor:
-            row = await cursor.fetchone()
+        async def operation(conn: aiosqlite.Connection) -> int:
+            # Получаем текущий streak
+            async with conn.execute("""
+                SELECT streak, last_tick FROM habits 
+                WHERE tg_id = ? AND name = ?
+            """, (tg_id, habit_name)) as cursor:
+                row = await cursor.fetchone()
             
             if row:
                 current_streak, last_tick = row[0], datetime.fromisoformat(row[1]).date() if row[1] else None
@@ -272,52 +586,141 @@ class Database:
                 else:
                     new_streak = 1
                 
-                await self._connection.execute("""
+                await conn.execute("""
                     UPDATE habits SET streak = ?, last_tick = ? 
                     WHERE tg_id = ? AND name = ?
                 """, (new_streak, today, tg_id, habit_name))
             else:
                 new_streak = 1
-                await self._connection.execute("""
+                await conn.execute("""
                     INSERT INTO habits (tg_id, name, streak, last_tick)
                     VALUES (?, ?, ?, ?)
                 """, (tg_id, habit_name, new_streak, today))
+            
+            return new_streak
         
-        await self._connection.commit()
-        return new_streak
+        return await self._write(operation)
+    
+    async def get_habits(self, tg_id: int) -> List[Tuple[str, int]]:
+        """Возвращает привычки пользователя (название, streak) по убыванию streak."""
+        async with self.read() as conn, conn.execute("""
+            SELECT name, streak FROM habits WHERE tg_id = ? ORDER BY streak DESC
+        """, (tg_id,)) as cursor:
+            return await cursor.fetchall()
+    
+    async def count_habits(self, tg_id: int) -> int:
+        """Возвращает количество привычек пользователя."""
+        async with self.read() as conn, conn.execute("""
+            SELECT COUNT(*) FROM habits WHERE tg_id = ?
+        """, (tg_id,)) as cursor:
+            return (await cursor.fetchone())[0]
+    
+    # Abstinence
+    async def get_abstinence(self, tg_id: int) -> List[Tuple[str, str, int]]:
+        """Возвращает воздержания пользователя (название, дата начала, дней) по убыванию дней."""
+        async with self.read() as conn, conn.execute("""
+            SELECT name, start_date, days_count FROM abstinence WHERE tg_id = ? ORDER BY days_count DESC
+        """, (tg_id,)) as cursor:
+            return await cursor.fetchall()
     
     # Pomodoro
     async def log_pomodoro(self, tg_id: int, started_at: datetime, finished_at: datetime, 
                           duration: int, status: str) -> None:
         """Логирует сессию помодоро."""
-        await self._connection.execute("""
+        await self.execute_write("""
             INSERT INTO pomodoro (tg_id, started_at, finished_at, duration, status)
             VALUES (?, ?, ?, ?, ?)
         """, (tg_id, started_at, finished_at, duration, status))
-        await self._connection.commit()
     
     # Mood
-    async def save_mood(self, tg_id: int, energy: int, mood: int, note: str = "") -> None:
-        """Сохраняет настроение."""
+    async def save_mood(self, tg_id: int, energy: int, mood: int, note: str = "") -> MoodStats:
+        """Сохраняет настроение и возвращает обновленную статистику пользователя.
+        
+        Запись и обновление mood_stats идут одной операцией записи, поэтому
+        статистика не расходится с историей и не требует агрегатов по ней.
+        """
         today = date.today().isoformat()
-        await self._connection.execute("""
-            INSERT INTO mood (tg_id, date, energy, mood, note)
-            VALUES (?, ?, ?, ?, ?)
-        """, (tg_id, today, energy, mood, note))
-        await self._connection.commit()
+        
+        async def operation(conn: aiosqlite.Connection) -> MoodStats:
+            await conn.execute("""
+                INSERT INTO mood (tg_id, date, energy, mood, note, ts)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (tg_id, today, energy, mood, note))
+            async with conn.execute("SELECT * FROM mood_stats WHERE tg_id = ?", (tg_id,)) as cursor:
+                row = await cursor.fetchone()
+            stats = MoodStats(*row) if row else MoodStats(tg_id)
+            stats.add(mood, energy)
+            await conn.execute("INSERT OR REPLACE INTO mood_stats VALUES (?, ?, ?, ?, ?, ?, ?)", stats.as_row())
+            return stats
+        
+        return await self._write(operation)
+    
+    async def get_mood_stats(self, tg_id: int) -> Optional[MoodStats]:
+        """Накопленная статистика настроения пользователя (None, если оценок не было)."""
+        async with self.read() as conn, conn.execute(
+            "SELECT * FROM mood_stats WHERE tg_id = ?", (tg_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return MoodStats(*row) if row else None
+    
+    async def mood_history(self, tg_id: int) -> List[Tuple[int, Optional[int], int, int]]:
+        """Вся история настроения пользователя по времени.
+        
+        Строки (day, seconds, mood, energy): номер дня от 1970-01-01 и время
+        записи в секундах UTC - числа разбирает SQLite, а не Python.
+        """
+        async with self.read() as conn, conn.execute(f"""
+            SELECT {MOOD_NUMBERS} FROM mood
+            WHERE tg_id = ? AND mood IS NOT NULL AND energy IS NOT NULL
+            ORDER BY date, ts
+        """, (tg_id,)) as cursor:
+            return await cursor.fetchall()
+    
+    async def mood_history_batch(self, after_tg_id: int = 0, users: int = 500
+                                 ) -> Tuple[List[Tuple[int, int, Optional[int], int, int]], Dict[int, str]]:
+        """История настроения следующих users пользователей (keyset по tg_id).
+        
+        Возвращает строки (tg_id, day, seconds, mood, energy) как в
+        mood_history, упорядоченные по пользователю и времени, и часовые
+        пояса этих пользователей.
+        """
+        async with self.read() as conn:
+            async with conn.execute("""
+                SELECT MAX(tg_id) FROM (
+                    SELECT DISTINCT tg_id FROM mood WHERE tg_id > ? ORDER BY tg_id LIMIT ?
+                )
+            """, (after_tg_id, users)) as cursor:
+                last_tg_id = (await cursor.fetchone())[0]
+            if last_tg_id is None:
+                return [], {}
+            
+            async with conn.execute(f"""
+                SELECT tg_id, {MOOD_NUMBERS} FROM mood
+                WHERE tg_id > ? AND tg_id <= ? AND mood IS NOT NULL AND energy IS NOT NULL
+                ORDER BY tg_id, date, ts
+            """, (after_tg_id, last_tg_id)) as cursor:
+                rows = await cursor.fetchall()
+            async with conn.execute(
+                "SELECT tg_id, tz FROM users WHERE tg_id > ? AND tg_id <= ?", (after_tg_id, last_tg_id)
+            ) as cursor:
+                timezones = {row[0]: row[1] for row in await cursor.fetchall()}
+        return rows, timezones
     
     # Memories
-    async def add_memory(self, tg_id: int, kind: str, content: str) -> None:
-        """Добавляет запись в память."""
-        await self._connection.execute("""
-            INSERT INTO memories (tg_id, kind, content)
-            VALUES (?, ?, ?)
-        """, (tg_id, kind, content))
-        await self._connection.commit()
+    async def add_memory(self, tg_id: int, kind: str, content: str) -> int:
+        """Добавляет запись в память и возвращает ее id."""
+        async def operation(conn: aiosqlite.Connection) -> int:
+            cursor = await conn.execute("""
+                INSERT INTO memories (tg_id, kind, content)
+                VALUES (?, ?, ?)
+            """, (tg_id, kind, content))
+            return cursor.lastrowid
+        
+        return await self._write(operation)
     
     async def recent_memories(self, tg_id: int, limit: int = 5) -> List[Dict[str, Any]]:
         """Получает последние записи памяти."""
-        async with self._connection.execute("""
+        async with self.read() as conn, conn.execute("""
             SELECT kind, content, ts FROM memories 
             WHERE tg_id = ? 
             ORDER BY ts DESC 
@@ -329,70 +732,369 @@ class Database:
                 for row in rows
             ]
     
-    # Weekly stats
-    async def week_stats(self, tg_id: int) -> Dict[str, Any]:
-        """Получает статистику за неделю."""
-        week_ago = (datetime.now() - timedelta(days=7)).date()
+    async def memories_by_kind(self, tg_id: int, kind: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Последние записи памяти одного типа."""
+        async with self.read() as conn, conn.execute("""
+            SELECT kind, content, ts FROM memories
+            WHERE tg_id = ? AND kind = ?
+            ORDER BY ts DESC
+            LIMIT ?
+        """, (tg_id, kind, limit)) as cursor:
+            return [{"kind": row[0], "content": row[1], "ts": row[2]} for row in await cursor.fetchall()]
+    
+    async def relevance_documents(self, tg_id: int, after_memory: Optional[int] = 0,
+                                  after_entry: int = 0, after_mood: int = 0) -> List[Dict[str, Any]]:
+        """Тексты пользователя для индекса релевантности, с id больше переданных.
         
-        # Количество записей
-        async with self._connection.execute("""
-            SELECT COUNT(*) FROM entries 
-            WHERE tg_id = ? AND date >= ?
-        """, (tg_id, week_ago.isoformat())) as cursor:
-            entries_count = (await cursor.fetchone())[0]
+        Память, записи опросов и заметки к настроению; after_memory=None -
+        без памяти (ее индекс получает сразу при добавлении).
+        """
+        documents: List[Dict[str, Any]] = []
+        async with self.read() as conn:
+            if after_memory is not None:
+                async with conn.execute("""
+                    SELECT id, kind, content, ts FROM memories
+                    WHERE tg_id = ? AND id > ?
+                    ORDER BY id
+                """, (tg_id, after_memory)) as cursor:
+                    documents.extend(
+                        {"source": "memory", "id": row[0], "kind": row[1], "content": row[2], "ts": row[3]}
+                        for row in await cursor.fetchall()
+                    )
+            
+            async with conn.execute("""
+                SELECT id, type, data, created_at FROM entries
+                WHERE tg_id = ? AND id > ?
+                ORDER BY id
+            """, (tg_id, after_entry)) as cursor:
+                for row in await cursor.fetchall():
+                    try:
+                        data = json.loads(row[2] or "{}")
+                    except json.JSONDecodeError:
+                        data = {}
+                    # Текстовые поля опроса: строки и списки строк (цели, дела)
+                    parts: List[str] = []
+                    for value in (data.values() if isinstance(data, dict) else []):
+                        if isinstance(value, str):
+                            parts.append(value)
+                        elif isinstance(value, list):
+                            parts.extend(str(item) for item in value)
+                    content = "\n".join(part for part in parts if part)
+                    documents.append({"source": "entry", "id": row[0], "kind": row[1], "content": content, "ts": row[3]})
+            
+            async with conn.execute("""
+                SELECT id, mood, energy, note, date FROM mood
+                WHERE tg_id = ? AND id > ? AND note != ''
+                ORDER BY id
+            """, (tg_id, after_mood)) as cursor:
+                documents.extend(
+                    {
+                        "source": "mood", "id": row[0], "kind": "mood",
+                        "content": f"Настроение {row[1]}/10, энергия {row[2]}/10: {row[3]}", "ts": row[4]
+                    }
+                    for row in await cursor.fetchall()
+                )
+        return documents
+    
+    async def users_with_old_memories(self, before: str, after_tg_id: int = 0,
+                                      limit: int = 500) -> List[int]:
+        """Пользователи с несвернутыми записями памяти старше before (keyset по tg_id)."""
+        async with self.read() as conn, conn.execute("""
+            SELECT DISTINCT tg_id FROM memories
+            WHERE tg_id > ? AND ts < ? AND kind != 'summary'
+            ORDER BY tg_id
+            LIMIT ?
+        """, (after_tg_id, before, limit)) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+    
+    async def old_memory_weeks(self, tg_id: int, before: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Несвернутые записи памяти старше before, сгруппированные по неделям (с понедельника)."""
+        weeks: Dict[str, List[Dict[str, Any]]] = {}
+        async with self.read() as conn, conn.execute("""
+            SELECT id, kind, content, ts, DATE(ts, '-6 days', 'weekday 1') AS week
+            FROM memories
+            WHERE tg_id = ? AND ts < ? AND kind != 'summary'
+            ORDER BY ts
+        """, (tg_id, before)) as cursor:
+            async for row in cursor:
+                weeks.setdefault(row[4], []).append(
+                    {"id": row[0], "kind": row[1], "content": row[2], "ts": row[3]}
+                )
+        return weeks
+    
+    async def fold_memories(self, tg_id: int, memory_ids: List[int], summary: str, ts: str) -> int:
+        """Заменяет записи памяти итогом: итог вставляется, исходные уходят в архив.
         
-        # Средняя энергия
-        async with self._connection.execute("""
-            SELECT AVG(energy) FROM mood 
-            WHERE tg_id = ? AND date >= ?
-        """, (tg_id, week_ago.isoformat())) as cursor:
-            avg_energy = (await cursor.fetchone())[0] or 0
+        Все изменения - в одной транзакции, поэтому прерванное сворачивание
+        можно просто запустить снова.
+        """
+        ids = json.dumps(memory_ids)
         
-        # Активность по дням
-        async with self._connection.execute("""
-            SELECT date, COUNT(*) FROM entries 
-            WHERE tg_id = ? AND date >= ?
-            GROUP BY date
-        """, (tg_id, week_ago.isoformat())) as cursor:
-            daily_activity = dict(await cursor.fetchall())
+        async def operation(conn: aiosqlite.Connection) -> int:
+            cursor = await conn.execute(
+                "INSERT INTO memories (tg_id, ts, kind, content) VALUES (?, ?, 'summary', ?)",
+                (tg_id, ts, summary)
+            )
+            summary_id = cursor.lastrowid
+            await conn.execute("""
+                INSERT OR IGNORE INTO memories_archive (id, tg_id, ts, kind, content, summary_id)
+                SELECT id, tg_id, ts, kind, content, ? FROM memories
+                WHERE tg_id = ? AND id IN (SELECT value FROM json_each(?))
+            """, (summary_id, tg_id, ids))
+            cursor = await conn.execute(
+                "DELETE FROM memories WHERE tg_id = ? AND id IN (SELECT value FROM json_each(?))",
+                (tg_id, ids)
+            )
+            return cursor.rowcount
         
-        # Фокус-сессии
-        async with self._connection.execute("""
-            SELECT SUM(duration) FROM pomodoro 
-            WHERE tg_id = ? AND started_at >= ?
-        """, (tg_id, week_ago)) as cursor:
-            focus_minutes = (await cursor.fetchone())[0] or 0
+        return await self._write(operation)
+    
+    # Search
+    async def search_history(self, tg_id: int, query: str, limit: int = 5,
+                             offset: int = 0) -> List[Dict[str, Any]]:
+        """Полнотекстовый поиск по памяти, записям опросов и заметкам к настроению.
+        
+        Результаты по убыванию релевантности (bm25), при равенстве - новые
+        выше; в сниппете совпадения обрамлены MATCH_START/MATCH_END.
+        """
+        terms = fts_query(query)
+        if not terms:
+            return []
+        match = f'owner : "u{tg_id}" AND body : ({terms})'
+        
+        async with self.read() as conn:
+            # Сначала только ранжирование: сниппет дорогой, его строим для страницы
+            async with conn.execute("""
+                SELECT source, id FROM (
+                    SELECT 'memories' AS source, rowid AS id, bm25(memories_fts, 1.0, 0.0) AS rank
+                    FROM memories_fts WHERE memories_fts MATCH :match
+                    UNION ALL
+                    SELECT 'entries', rowid, bm25(entries_fts, 1.0, 0.0)
+                    FROM entries_fts WHERE entries_fts MATCH :match
+                    UNION ALL
+                    SELECT 'mood', rowid, bm25(mood_fts, 1.0, 0.0)
+                    FROM mood_fts WHERE mood_fts MATCH :match
+                )
+                ORDER BY rank, id DESC
+                LIMIT :limit OFFSET :offset
+            """, {"match": match, "limit": limit, "offset": offset}) as cursor:
+                hits = await cursor.fetchall()
+            
+            snippets: Dict[Tuple[str, int], Tuple[str, str, str]] = {}
+            details = {
+                "memories": "m.kind, substr(m.ts, 1, 10) FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid",
+                "entries": "e.type, e.date FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid",
+                "mood": "'mood', md.date FROM mood_fts JOIN mood md ON md.id = mood_fts.rowid",
+            }
+            for source, select in details.items():
+                ids = [row_id for hit_source, row_id in hits if hit_source == source]
+                if not ids:
+                    continue
+                async with conn.execute(f"""
+                    SELECT {source}_fts.rowid, snippet({source}_fts, 0, ?, ?, '…', 16), {select}
+                    WHERE {source}_fts MATCH ? AND {source}_fts.rowid IN ({", ".join("?" * len(ids))})
+                """, (MATCH_START, MATCH_END, match, *ids)) as cursor:
+                    for row in await cursor.fetchall():
+                        snippets[(source, row[0])] = (row[1], row[2], row[3])
+        
+        sources = {"memories": "memory", "entries": "entry", "mood": "mood"}
+        return [
+            {
+                "source": sources[source], "kind": snippets[(source, row_id)][1],
+                "day": snippets[(source, row_id)][2], "snippet": snippets[(source, row_id)][0]
+            }
+            for source, row_id in hits if (source, row_id) in snippets
+        ]
+    
+    # Weekly stats
+    async def weekly_snapshot(self, tg_id: int, days: int = 7) -> WeeklySnapshot:
+        """Считает все недельные метрики одним запросом по daily_rollups."""
+        week_start = (datetime.now() - timedelta(days=days)).date()
+        week_end = date.today()
+        
+        async with self.read() as conn, conn.execute("""
+            WITH week AS (
+                SELECT * FROM daily_rollups
+                WHERE tg_id = :tg_id AND day >= :since
+            ),
+            stats AS (
+                SELECT count, mood_mean, mood_m2 FROM mood_stats WHERE tg_id = :tg_id
+            )
+            SELECT
+                COALESCE(SUM(entries_count), 0),
+                COALESCE(SUM(entries_count > 0), 0),
+                CAST(SUM(energy_sum) AS REAL) / NULLIF(SUM(energy_values), 0),
+                CAST(SUM(mood_sum) AS REAL) / NULLIF(SUM(mood_values), 0),
+                SUM(focus_minutes),
+                (SELECT COUNT(*) FROM habits WHERE tg_id = :tg_id),
+                (SELECT json_group_object(day, entries_count) FROM week WHERE entries_count > 0),
+                (SELECT count FROM stats),
+                (SELECT mood_mean FROM stats),
+                (SELECT mood_m2 FROM stats)
+            FROM week
+        """, {"tg_id": tg_id, "since": week_start.isoformat()}) as cursor:
+            row = await cursor.fetchone()
+        stats = MoodStats(tg_id, row[7], row[8], row[9]) if row[7] is not None else None
         
+        return WeeklySnapshot(
+            tg_id=tg_id,
+            week_start=week_start,
+            week_end=week_end,
+            entries_count=row[0],
+            active_days=row[1],
+            avg_energy=round(row[2] or 0, 1),
+            avg_mood=round(row[3] or 5, 1),
+            focus_minutes=row[4] or 0,
+            habits_count=row[5],
+            daily_activity=json.loads(row[6]) if row[6] else {},
+            mood_baseline=round(stats.mood_mean, 1) if stats else None,
+            mood_spread=round(stats.mood_std, 1) if stats else 0
+        )
+    
+    async def weekly_snapshots(self, tg_ids: List[int], days: int = 7) -> Dict[int, WeeklySnapshot]:
+        """Считает недельные метрики для группы пользователей одним запросом."""
+        week_start = (datetime.now() - timedelta(days=days)).date()
+        week_end = date.today()
+        snapshots = {
+            tg_id: WeeklySnapshot(tg_id=tg_id, week_start=week_start, week_end=week_end)
+            for tg_id in tg_ids
+        }
+        
+        async with self.read() as conn, conn.execute("""
+            WITH cohort(tg_id) AS (
+                SELECT value FROM json_each(:ids)
+            ),
+            week AS (
+                SELECT r.* FROM daily_rollups r
+                JOIN cohort c ON c.tg_id = r.tg_id
+                WHERE r.day >= :since
+            ),
+            habit_counts AS (
+                SELECT h.tg_id, COUNT(*) AS habits_count FROM habits h
+                JOIN cohort c ON c.tg_id = h.tg_id
+                GROUP BY h.tg_id
+            ),
+            totals AS (
+                SELECT
+                    tg_id,
+                    SUM(entries_count) AS entries_count,
+                    SUM(entries_count > 0) AS active_days,
+                    CAST(SUM(energy_sum) AS REAL) / NULLIF(SUM(energy_values), 0) AS avg_energy,
+                    CAST(SUM(mood_sum) AS REAL) / NULLIF(SUM(mood_values), 0) AS avg_mood,
+                    SUM(focus_minutes) AS focus_minutes,
+                    json_group_object(day, entries_count) FILTER (WHERE entries_count > 0) AS daily_activity
+                FROM week
+                GROUP BY tg_id
+            )
+            SELECT
+                c.tg_id, t.entries_count, t.active_days, t.avg_energy, t.avg_mood,
+                t.focus_minutes, h.habits_count, t.daily_activity,
+                s.count, s.mood_mean, s.mood_m2
+            FROM cohort c
+            LEFT JOIN totals t ON t.tg_id = c.tg_id
+            LEFT JOIN habit_counts h ON h.tg_id = c.tg_id
+            LEFT JOIN mood_stats s ON s.tg_id = c.tg_id
+            WHERE t.tg_id IS NOT NULL OR h.tg_id IS NOT NULL OR s.tg_id IS NOT NULL
+        """, {"ids": json.dumps(list(tg_ids)), "since": week_start.isoformat()}) as cursor:
+            async for row in cursor:
+                snapshot = snapshots[row[0]]
+                snapshot.entries_count = row[1] or 0
+                snapshot.active_days = row[2] or 0
+                snapshot.avg_energy = round(row[3] or 0, 1)
+                snapshot.avg_mood = round(row[4] or 5, 1)
+                snapshot.focus_minutes = row[5] or 0
+                snapshot.habits_count = row[6] or 0
+                snapshot.daily_activity = json.loads(row[7]) if row[7] else {}
+                if row[8] is not None:
+                    stats = MoodStats(row[0], row[8], row[9], row[10])
+                    snapshot.mood_baseline = round(stats.mood_mean, 1)
+                    snapshot.mood_spread = round(stats.mood_std, 1)
+        
+        return snapshots
+    
+    async def daily_rollups(self, tg_id: int, since: date) -> List[Dict[str, Any]]:
+        """Получает дневные агрегаты пользователя начиная с даты."""
+        async with self.read() as conn, conn.execute("""
+            SELECT * FROM daily_rollups
+            WHERE tg_id = ? AND day >= ?
+            ORDER BY day
+        """, (tg_id, since.isoformat())) as cursor:
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+    
+    async def rebuild_daily_rollups(self, tg_id: Optional[int] = None) -> int:
+        """Пересобирает дневные агрегаты из истории."""
+        return await self._write(lambda conn: rebuild_daily_rollups(conn, tg_id, commit=False))
+    
+    async def week_stats(self, tg_id: int) -> Dict[str, Any]:
+        """Получает статистику за неделю."""
+        snapshot = await self.weekly_snapshot(tg_id)
         return {
-            "entries_count": entries_count,
-            "avg_energy": round(avg_energy, 1),
-            "daily_activity": daily_activity,
-            "focus_minutes": focus_minutes
+            "entries_count": snapshot.entries_count,
+            "avg_energy": snapshot.avg_energy,
+            "daily_activity": snapshot.daily_activity,
+            "focus_minutes": snapshot.focus_minutes
         }
     
     async def set_subscription_until(self, tg_id: int, until: datetime) -> None:
         """Устанавливает дату окончания подписки."""
-        await self._connection.execute(
+        await self.execute_write(
             "UPDATE users SET subscription_until = ? WHERE tg_id = ?",
             (until, tg_id)
         )
-        await self._connection.commit()
+        self._invalidate_user(tg_id)
     
     async def save_profile(self, tg_id: int, profile_data: str) -> None:
         """Сохраняет профиль пользователя."""
-        await self._connection.execute("""
+        await self.execute_write("""
             INSERT OR REPLACE INTO profiles (tg_id, data, created_at)
             VALUES (?, ?, ?)
         """, (tg_id, profile_data, datetime.now()))
-        await self._connection.commit()
-    
+
+    async def get_profile(self, tg_id: int) -> Dict[str, Any]:
+        """Получает профиль пользователя как словарь.
+
+        Профиль, сохраненный готовым текстом, а не JSON, дает пустой словарь.
+        """
+        async with self.read() as conn, conn.execute(
+            "SELECT data FROM profiles WHERE tg_id = ?", (tg_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row:
+            return {}
+        try:
+            profile = json.loads(row[0])
+        except (TypeError, ValueError):
+            return {}
+        return profile if isinstance(profile, dict) else {}
+
     async def update_user_persona(self, tg_id: int, persona: str) -> None:
         """Обновляет персону пользователя."""
-        await self._connection.execute(
+        await self.execute_write(
             "UPDATE users SET persona = ? WHERE tg_id = ?",
             (persona, tg_id)
         )
-        await self._connection.commit()
+        self._invalidate_user(tg_id)
+    
+    async def update_user_tz(self, tg_id: int, tz: str) -> None:
+        """Обновляет часовой пояс пользователя."""
+        await self.execute_write("UPDATE users SET tz = ? WHERE tg_id = ?", (tz, tg_id))
+        self._invalidate_user(tg_id)
+    
+    async def update_user_morning_hour(self, tg_id: int, hour: int) -> None:
+        """Обновляет час утреннего опроса."""
+        await self.execute_write("UPDATE users SET morning_hour = ? WHERE tg_id = ?", (hour, tg_id))
+        self._invalidate_user(tg_id)
+    
+    async def update_user_evening_hour(self, tg_id: int, hour: int) -> None:
+        """Обновляет час вечернего опроса."""
+        await self.execute_write("UPDATE users SET evening_hour = ? WHERE tg_id = ?", (hour, tg_id))
+        self._invalidate_user(tg_id)
+    
+    async def update_user_language(self, tg_id: int, language: str) -> None:
+        """Обновляет язык пользователя."""
+        await self.execute_write("UPDATE users SET language = ? WHERE tg_id = ?", (language, tg_id))
+        self._invalidate_user(tg_id)
 
 
 # Глобальный экземпляр базы данных
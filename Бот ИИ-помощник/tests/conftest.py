@@ -0,0 +1,7 @@
+"""Общая настройка тестов: корень проекта в sys.path и тестовые переменные окружения."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
@@ -0,0 +1,60 @@
+"""Circuit breaker и фоновые пробы GPTService."""
+import asyncio
+
+from benchmarks.fake_openai import FakeOpenAI
+from src.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from src.services.gpt import GPTService
+
+
+def test_changed_fires_on_transition_and_released_probe():
+    async def scenario():
+        breaker = CircuitBreaker("test", open_seconds=0)
+        opened = breaker.changed
+        breaker.trip()
+        assert opened.is_set() and not breaker.changed.is_set()
+
+        permit = breaker.allow()
+        assert breaker.state == HALF_OPEN and permit.probe
+        waiting = breaker.changed
+        breaker.record_cancelled(permit)
+        assert waiting.is_set()
+
+    asyncio.run(scenario())
+
+
+def test_prober_waits_for_outstanding_probe_without_polling():
+    async def scenario():
+        service = GPTService(client=FakeOpenAI(latency=0))
+        service.breaker.trip()
+        service._ensure_prober()
+        await asyncio.sleep(0)
+        # Пауза кончилась, и пробу забрал чужой запрос
+        service.breaker._open_for = 0
+        permit = service.breaker.allow()
+        assert service.breaker.state == HALF_OPEN
+
+        await asyncio.sleep(0.3)
+        assert service.breaker.rejected <= 1
+        assert not service._prober.done()
+
+        service.breaker.record_success(permit, latency=0.01)
+        assert service.breaker.state == CLOSED
+        await asyncio.wait_for(service._prober, timeout=1)
+        assert service.client.calls == 0
+
+    asyncio.run(scenario())
+
+
+def test_prober_closes_breaker_after_open_pause():
+    async def scenario():
+        service = GPTService(client=FakeOpenAI(latency=0))
+        service.breaker.open_seconds = service.breaker._open_for = 0.1
+        service.breaker.trip()
+        assert service.breaker.state == OPEN
+
+        service._ensure_prober()
+        await asyncio.wait_for(service._prober, timeout=2)
+        assert service.breaker.state == CLOSED
+        assert service.client.calls == 1
+
+    asyncio.run(scenario())
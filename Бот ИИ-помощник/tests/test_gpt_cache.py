@@ -0,0 +1,167 @@
+"""Кэш ответов GPT на фейковом клиенте OpenAI."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_openai import FakeOpenAI
+from src import cache as memory_cache
+from src.services import gpt_cache
+from src.services.gpt import CACHE_TTLS, UNAVAILABLE_TEXT, GPTService
+from src.services.gpt_cache import ResponseCache, request_key
+
+MESSAGES = [{"role": "user", "content": "Итоги недели"}]
+
+
+class Clock:
+    """Подменяет часы кэша: время сдвигается вручную, без ожидания."""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(memory_cache, "time", clock)
+    monkeypatch.setattr(gpt_cache, "time", clock)
+    return clock
+
+
+def make_service(error_rate: float = 0.0, cache: ResponseCache = None) -> GPTService:
+    service = GPTService(client=FakeOpenAI(latency=0, error_rate=error_rate))
+    service.cache = cache or ResponseCache(maxsize=100)
+    # Без повторов: неудачный ответ возвращается сразу, без backoff
+    service.retries = 1
+    return service
+
+
+def ask(service: GPTService, method: str = "weekly_report", **kwargs) -> str:
+    return asyncio.run(service._make_request(kwargs.pop("messages", MESSAGES), method=method, **kwargs))
+
+
+def test_hit_returns_same_content_without_upstream_call():
+    service = make_service()
+    first = ask(service)
+    second = ask(service)
+
+    assert first == second
+    assert first != UNAVAILABLE_TEXT
+    assert service.client.calls == 1
+    assert service.cache.hits == 1
+
+
+@pytest.mark.parametrize("changed", [
+    {"model": "gpt-other"},
+    {"messages": [{"role": "user", "content": "Итоги месяца"}]},
+    {"temperature": 0.2},
+    {"max_tokens": 100},
+])
+def test_key_depends_on_every_request_parameter(changed):
+    base = {"model": "gpt-test", "messages": MESSAGES, "temperature": 0.7, "max_tokens": 500}
+    assert request_key(**base) != request_key(**{**base, **changed})
+
+
+@pytest.mark.parametrize("changed", [
+    {"messages": [{"role": "user", "content": "Итоги месяца"}]},
+    {"temperature": 0.2},
+    {"max_tokens": 100},
+])
+def test_changed_request_goes_upstream(changed):
+    service = make_service()
+    ask(service)
+    ask(service, **changed)
+
+    assert service.client.calls == 2
+
+
+def test_changed_model_goes_upstream():
+    service = make_service()
+    ask(service)
+    service.model = "gpt-other"
+    ask(service)
+
+    assert service.client.calls == 2
+
+
+@pytest.mark.parametrize("method,ttl", sorted(CACHE_TTLS.items()))
+def test_method_ttl_expires(clock, method, ttl):
+    service = make_service()
+    first = ask(service, method=method)
+
+    clock.offset = ttl - 1
+    assert ask(service, method=method) == first
+    assert service.client.calls == 1
+
+    clock.offset = ttl + 1
+    assert ask(service, method=method) != first
+    assert service.client.calls == 2
+
+
+def test_method_without_ttl_is_not_cached():
+    service = make_service()
+    ask(service, method="summarize_dialog")
+    ask(service, method="summarize_dialog")
+
+    assert "summarize_dialog" not in CACHE_TTLS
+    assert service.client.calls == 2
+
+
+def test_lru_evicts_least_recently_used_at_maxsize():
+    async def scenario():
+        cache = ResponseCache(maxsize=2)
+        await cache.set("a", "A", ttl=60, latency=0.1)
+        await cache.set("b", "B", ttl=60, latency=0.1)
+        assert await cache.get("a") == "A"  # «a» становится самой свежей
+        await cache.set("c", "C", ttl=60, latency=0.1)
+        return [await cache.get(key) for key in ("a", "b", "c")], cache.stats()["size"]
+
+    values, size = asyncio.run(scenario())
+    assert values == ["A", None, "C"]
+    assert size == 2
+
+
+def test_failed_completion_is_not_cached():
+    service = make_service(error_rate=1.0)
+    assert ask(service) == UNAVAILABLE_TEXT
+    assert len(service.cache.memory) == 0
+
+    service.client.error_rate = 0.0
+    answer = ask(service)
+    assert answer != UNAVAILABLE_TEXT
+    assert service.client.calls == 2
+
+
+def test_empty_upstream_answer_error_is_not_cached(monkeypatch):
+    service = make_service()
+
+    async def broken(**kwargs):
+        service.client.calls += 1
+        return SimpleNamespace(choices=[], usage=None)
+
+    monkeypatch.setattr(service.client.chat.completions, "create", broken)
+    assert ask(service) == UNAVAILABLE_TEXT
+    assert len(service.cache.memory) == 0
+
+
+def test_sqlite_tier_answers_after_new_cache_instance(tmp_path):
+    path = str(tmp_path / "gpt_cache.db")
+
+    first_service = make_service(cache=ResponseCache(maxsize=100, path=path))
+    first = ask(first_service)
+    asyncio.run(first_service.cache.close())
+
+    second_service = make_service(cache=ResponseCache(maxsize=100, path=path))
+    try:
+        assert ask(second_service) == first
+        assert second_service.client.calls == 0
+        assert second_service.cache.persistent_hits == 1
+    finally:
+        asyncio.run(second_service.cache.close())
@@ -0,0 +1,36 @@
+"""Очередь рендеринга PDFService."""
+import asyncio
+
+import pytest
+
+from benchmarks.bench_pdf_offload import sample_report
+from src.services.pdf import PDFQueueFull, PDFService
+
+
+def test_cancelled_render_keeps_slot_until_worker_finishes():
+    async def scenario():
+        service = PDFService(workers=1, queue_limit=0)
+        try:
+            task = asyncio.create_task(service.render(sample_report(0)))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # Рендеринг еще идет в воркере: место в очереди занято
+            assert service.in_flight == 1
+            with pytest.raises(PDFQueueFull):
+                await service.render(sample_report(1))
+
+            pdf = await asyncio.wait_for(service.render(sample_report(2), wait=True), timeout=30)
+            return pdf, service.stats()
+        finally:
+            service.close()
+
+    pdf, stats = asyncio.run(scenario())
+    assert pdf.startswith(b"%PDF")
+    assert stats["in_flight"] == 0
+    assert stats["rendered"] == 2
+    assert stats["rejected"] == 1
+    assert 0 < stats["avg_render_ms"]
+    assert stats["avg_wait_ms"] >= 0
@@ -0,0 +1,31 @@
+"""Недельные метрики из daily_rollups и mood_stats."""
+import asyncio
+
+from src.storage import Database
+
+
+def test_snapshot_reads_mood_baseline_with_week_metrics(tmp_path):
+    async def scenario():
+        db = Database(str(tmp_path / "bot.db"))
+        await db.connect()
+        try:
+            for energy, mood in ((4, 5), (6, 7), (8, 9)):
+                await db.save_mood(1, energy, mood)
+            await db.save_mood(2, 5, 6)
+
+            single = {tg_id: await db.weekly_snapshot(tg_id) for tg_id in (1, 2, 3)}
+            batch = await db.weekly_snapshots([1, 2, 3])
+            stats = await db.get_mood_stats(1)
+            return single, batch, stats
+        finally:
+            await db.close()
+
+    single, batch, stats = asyncio.run(scenario())
+
+    assert single[1].avg_mood == 7.0
+    assert single[1].mood_baseline == round(stats.mood_mean, 1) == 7.0
+    assert single[1].mood_spread == round(stats.mood_std, 1) == 2.0
+    assert (single[2].mood_baseline, single[2].mood_spread) == (6.0, 0)
+    assert (single[3].mood_baseline, single[3].mood_spread) == (None, 0)
+    for tg_id in (1, 2, 3):
+        assert batch[tg_id].as_metrics() == single[tg_id].as_metrics()